@@ -0,0 +1,296 @@
+import argparse
+import contextlib
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from quotation_core.calculations import (  # noqa: E402
+    calculate_design_nesting_layer_pad, calculate_layer_pad, calculate_nesting, calculate_pizza_box,
+    calculate_sample_board, calculate_standard_box
+)
+
+# Usage (from the repository root):
+#   python -m benchmarks.run                    run everything and print a report
+#   python -m benchmarks.run --save-baseline    store the results as the baseline
+#   python -m benchmarks.run --check            exit 1 if anything regressed
+# Baselines are machine specific, so each machine keeps its own file. Each
+# benchmark runs several rounds and keeps its best median latency, which
+# scheduler and GC noise can only make worse; the gate compares that.
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_THRESHOLD = 0.25
+# A slowdown smaller than this is noise whatever the percentage (a 1 us
+# calculator call that takes 1.3 us once is not a regression)
+DEFAULT_FLOOR_US = 1.0
+DEFAULT_ROUNDS = 5
+
+# ==================== WORKLOADS ====================
+GRAMMAGES = (0.6, 0.7, 0.775, 0.84, 0.95, 1.1)
+
+def pricing_args(rng):
+    return (
+        rng.choice(GRAMMAGES),
+        round(rng.uniform(2.3, 3.2), 2),
+        round(rng.uniform(3.0, 4.0), 2),
+        rng.choice((100, 250, 500, 1000, 2000, 5000, 10000)),
+        rng.choice((0.0, 0.0, 2.5, 5.0, -3.0)),
+    )
+
+def carton_specs(rng, count):
+    return [(float(rng.randint(150, 800)), float(rng.randint(100, 600)), float(rng.randint(80, 600))) + pricing_args(rng)
+            for _ in range(count)]
+
+def sheet_specs(rng, count):
+    return [(float(rng.randint(150, 1000)), float(rng.randint(100, 800))) + pricing_args(rng) for _ in range(count)]
+
+def sample_board_specs(rng, count):
+    return [(float(rng.randint(100, 600)), float(rng.randint(100, 500)), rng.randint(1, 8)) + pricing_args(rng)
+            for _ in range(count)]
+
+def nesting_specs(rng, count):
+    return [(float(rng.randint(200, 1200)), float(rng.randint(50, 400)), float(rng.randint(5, 60)), rng.random() < 0.5,
+             3.0, float(rng.choice((30, 40, 50))), rng.randint(1, 3), rng.randint(1, 3), rng.randint(1, 20),
+             3.0, rng.randint(0, 4))
+            for _ in range(count)]
+
+def design_nesting_specs(rng, count):
+    return [(float(rng.randint(400, 1200)), float(rng.randint(300, 800)), float(rng.randint(150, 600)), 3.0,
+             rng.randint(1, 5), float(rng.randint(200, 1000)), float(rng.randint(50, 400)), float(rng.randint(5, 60)),
+             rng.random() < 0.5)
+            for _ in range(count)]
+
+# ==================== MEASUREMENT ====================
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def summarize(latencies, items):
+    latencies = sorted(latencies)
+    total = sum(latencies)
+    return {
+        "throughput": items / total if total else float("inf"),
+        "p50_us": percentile(latencies, 0.50) * 1e6,
+        "p95_us": percentile(latencies, 0.95) * 1e6,
+        "p99_us": percentile(latencies, 0.99) * 1e6,
+        "mean_us": statistics.fmean(latencies) * 1e6,
+    }
+
+def bench_single(func, specs):
+    # Per-call latency of a scalar calculator over generated quotes
+    clock = time.perf_counter
+    latencies = []
+    for spec in specs:
+        start = clock()
+        func(*spec)
+        latencies.append(clock() - start)
+    return summarize(latencies, len(latencies))
+
+def bench_calls(func, repeat, items_per_call):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies, repeat * items_per_call)
+
+def best_of(bench, rounds):
+    # The fastest of rounds runs of bench, metric by metric: highest
+    # throughput and lowest latencies
+    runs = [bench() for _ in range(rounds)]
+    return {key: (max if key == "throughput" else min)(run[key] for run in runs) for key in runs[0]}
+
+# ==================== SUITE ====================
+def single_quote_benchmarks(count):
+    # Each benchmark draws its specs from a generator seeded by its name, so
+    # it prices the same workload in every round, in a full run or --only
+    benchmarks = [
+        ("single.standard_box", calculate_standard_box, carton_specs),
+        ("single.pizza_box", calculate_pizza_box, sheet_specs),
+        ("single.layer_pad", calculate_layer_pad, sheet_specs),
+        ("single.sample_board", calculate_sample_board, sample_board_specs),
+        ("single.nesting", calculate_nesting, nesting_specs),
+        ("single.design_nesting_layer_pad", calculate_design_nesting_layer_pad, design_nesting_specs),
+    ]
+    for name, func, specs in benchmarks:
+        yield name, lambda name=name, func=func, specs=specs: bench_single(func, specs(random.Random(name), count))
+
+def batch_benchmarks(rows, repeat):
+    import numpy as np
+    from quotation_core.batch import (
+        calculate_layer_pad_batch, calculate_pizza_box_batch, calculate_sample_board_batch,
+        calculate_standard_box_batch
+    )
+    gen = np.random.default_rng(7)
+    length = gen.integers(150, 800, rows).astype(float)
+    width = gen.integers(100, 600, rows).astype(float)
+    height = gen.integers(80, 600, rows).astype(float)
+    grammage = gen.choice(GRAMMAGES, rows)
+    costing = gen.uniform(2.3, 3.2, rows).round(2)
+    selling = gen.uniform(3.0, 4.0, rows).round(2)
+    quantity = gen.integers(100, 10000, rows).astype(float)
+    adjustment = gen.choice([0.0, 2.5, 5.0, -3.0], rows)
+    ups = gen.integers(1, 8, rows).astype(float)
+    pricing = (grammage, costing, selling, quantity, adjustment)
+    yield f"batch.standard_box_{rows}", lambda: bench_calls(
+        lambda: calculate_standard_box_batch(length, width, height, *pricing), repeat, rows)
+    yield f"batch.pizza_box_{rows}", lambda: bench_calls(
+        lambda: calculate_pizza_box_batch(length, width, *pricing), repeat, rows)
+    yield f"batch.layer_pad_{rows}", lambda: bench_calls(
+        lambda: calculate_layer_pad_batch(length, width, *pricing), repeat, rows)
+    yield f"batch.sample_board_{rows}", lambda: bench_calls(
+        lambda: calculate_sample_board_batch(length, width, ups, *pricing), repeat, rows)
+
+def sweep_benchmarks(repeat):
+    from quotation_core.sweep import sweep_designs
+    products = [(800.0, 204.0, 10.0, 720), (400.0, 300.0, 50.0, 60), (250.0, 120.0, 80.0, 240)]
+
+    def run():
+        for product_L, product_W, product_H, target in products:
+            sweep_designs(product_L, product_W, product_H, True, 3.0, 40.0, target, 3.0, 0.84, 2.7, 3.4, 0.0, workers=1)
+    yield "sweep.nesting_designs", lambda: bench_calls(run, repeat, len(products))
+
+@contextlib.contextmanager
+def temporary_cache():
+    # Points QUOTATION_CORE_CACHE at a scratch directory, so the app's quote
+    # store and tables are not the user's
+    previous = os.environ.get("QUOTATION_CORE_CACHE")
+    with tempfile.TemporaryDirectory(prefix="quotation_bench_") as cache_dir:
+        os.environ["QUOTATION_CORE_CACHE"] = cache_dir
+        try:
+            yield cache_dir
+        finally:
+            if previous is None:
+                os.environ.pop("QUOTATION_CORE_CACHE", None)
+            else:
+                os.environ["QUOTATION_CORE_CACHE"] = previous
+
+def streamlit_benchmarks(repeat):
+    try:
+        import streamlit as st
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        return
+    app_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "carton_quotation_app.py")
+
+    def run(at):
+        at.run()
+        if at.exception:
+            raise RuntimeError(f"App failed: {at.exception[0].message}")
+
+    def pages(kind):
+        # Per menu page: a plain rerun, as after a widget change, or a click
+        # on each of its Calculate buttons, which prices and stores a quote.
+        # The app's cached store is dropped so it reopens in the scratch cache.
+        with temporary_cache():
+            st.cache_resource.clear()
+            at = AppTest.from_file(app_path, default_timeout=60)
+            run(at)
+            latencies = []
+            for option in at.sidebar.radio[0].options:
+                at.sidebar.radio[0].set_value(option)
+                run(at)
+                labels = [button.label for button in at.button if button.label.startswith("Calculate")]
+                for _ in range(repeat):
+                    for label in labels if kind == "calculate" else [None]:
+                        if label is not None:
+                            next(button for button in at.button if button.label == label).click()
+                        start = time.perf_counter()
+                        run(at)
+                        latencies.append(time.perf_counter() - start)
+            st.cache_resource.clear()
+            return summarize(latencies, len(latencies))
+    yield "streamlit.rerun", lambda: pages("rerun")
+    yield "streamlit.calculate", lambda: pages("calculate")
+
+def run_suite(quick=False, only=None, rounds=DEFAULT_ROUNDS):
+    count = 2000 if quick else 20000
+    rows = 100000 if quick else 1000000
+    repeat = 3 if quick else 5
+    suites = [
+        single_quote_benchmarks(count),
+        batch_benchmarks(rows, repeat),
+        sweep_benchmarks(repeat),
+        streamlit_benchmarks(2 if quick else 5),
+    ]
+    results = {}
+    for suite in suites:
+        for name, bench in suite:
+            if only and not any(pattern in name for pattern in only):
+                continue
+            results[name] = best_of(bench, rounds)
+    return results
+
+# ==================== REGRESSION GATE ====================
+def compare(results, baseline, threshold, floor_us=DEFAULT_FLOOR_US):
+    # A benchmark regresses when its best median latency grows by more than
+    # threshold relative to the stored baseline and by more than floor_us.
+    # Tail latencies are reported but too noisy to gate on.
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if current["p50_us"] > previous["p50_us"] * (1 + threshold) and \
+                current["p50_us"] - previous["p50_us"] > floor_us:
+            regressions.append(f"{name}: p50 {current['p50_us']:.1f} us vs baseline {previous['p50_us']:.1f} us")
+    return regressions
+
+def print_report(results, stream=sys.stdout):
+    print(f"{'benchmark':<40} {'items/s':>14} {'p50 us':>12} {'p95 us':>12} {'p99 us':>12}", file=stream)
+    for name, result in results.items():
+        print(f"{name:<40} {result['throughput']:>14,.0f} {result['p50_us']:>12.1f} {result['p95_us']:>12.1f} {result['p99_us']:>12.1f}",
+              file=stream)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for the quotation calculators")
+    parser.add_argument("--quick", action="store_true", help="smaller workloads")
+    parser.add_argument("--only", action="append", help="run benchmarks whose name contains this (repeatable)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true", help="fail when the baseline regresses")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--floor-us", type=float, default=DEFAULT_FLOOR_US,
+                        help="ignore slowdowns smaller than this many microseconds")
+    parser.add_argument("--rounds", type=int, help=f"runs per benchmark, best kept (default {DEFAULT_ROUNDS}, 3 with --quick)")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.quick, args.only, args.rounds or (3 if args.quick else DEFAULT_ROUNDS))
+    print_report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+
+    if args.check:
+        if not os.path.exists(args.baseline):
+            print(f"No baseline at {args.baseline}; run with --save-baseline first", file=sys.stderr)
+            return 2
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.floor_us)
+        if regressions:
+            print(f"Regressions beyond {args.threshold:.0%}:", file=sys.stderr)
+            for regression in regressions:
+                print(f"  {regression}", file=sys.stderr)
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
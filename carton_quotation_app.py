@@ -1,91 +1,56 @@
-import streamlit as st
-import math
-
-# ==================== CONSTANTS ====================
-TRIM_ALLOWANCE = 28
-MAX_ROLL_WIDTH = 2200
-
-# ==================== CALCULATION FUNCTIONS ====================
-def calculate_standard_box(length, width, height, grammage, costing, selling, quantity, adjustment):
-    paper_length = (length + width) * 2 + 30
-    raw_width = width + height + 4
-    total_paper_length_m = round(paper_length / 1000, 3)
-    pieces_per_roll = math.floor(MAX_ROLL_WIDTH / raw_width)
-    total_used_width = raw_width * pieces_per_roll
-    trimmed_total_width = total_used_width + TRIM_ALLOWANCE
-    rounded_roll_width = math.ceil(trimmed_total_width / 50) * 50
-    effective_width_per_piece_m = round(rounded_roll_width / pieces_per_roll / 1000, 3)
-
-    cost_price = total_paper_length_m * effective_width_per_piece_m * grammage * costing
-    base_unit_price = total_paper_length_m * effective_width_per_piece_m * grammage * selling
-    adjusted_unit_price = base_unit_price * (1 + adjustment / 100)
-    total_price = adjusted_unit_price * quantity
-
-    formula = f"{total_paper_length_m} x {effective_width_per_piece_m} x {grammage} x {selling} x (1 + {adjustment / 100:.2f})"
-
-    return cost_price, adjusted_unit_price, total_price, formula
-
-def calculate_pizza_box(length, width, grammage, costing, selling, quantity, adjustment):
-    paper_length = length + 20
-    paper_width = width + 20
-    ups = math.floor(MAX_ROLL_WIDTH / paper_width)
-    total_used = paper_width * ups
-    roll_width = math.ceil((total_used + TRIM_ALLOWANCE) / 50) * 50
-    actual_width = roll_width / ups
-
-    paper_length_m = paper_length / 1000
-    actual_width_m = actual_width / 1000
-
-    cost = paper_length_m * actual_width_m * grammage * costing
-    price = paper_length_m * actual_width_m * grammage * selling * (1 + adjustment/100)
-
-    return cost, price, price * quantity, paper_length_m, actual_width_m, ups
-
-def calculate_layer_pad(length, width, grammage, costing, selling, quantity, adjustment):
-    return calculate_standard_box(length, width, 0, grammage, costing, selling, quantity, adjustment)
+import datetime
+import io
+import os
 
-def calculate_nesting(product_L, product_W, product_H, bubble, thickness, allowance, qty_L, qty_W, qty_H, layer_thick, layer_qty):
-    adj_L = product_L + 10 if bubble else product_L
-    adj_W = product_W + 10 if bubble else product_W
-    adj_H = product_H + 10 if bubble else product_H
-
-    int_L = allowance + thickness + ((adj_L + thickness) * qty_L) + allowance
-    int_W = allowance + thickness + ((adj_W + thickness) * qty_W) + allowance
-    int_H = adj_H
-
-    ext_L = int_L + 10
-    ext_W = int_W + 10
-    ext_H = int_H + 20 + (layer_thick * layer_qty)
-
-    nesting_long = (int_L, int_H)
-    nesting_short = (int_W, int_H)
-
-    return int_L, int_W, int_H, ext_L, ext_W, ext_H, nesting_long, nesting_short
-
-def calculate_sample_board(length, width, ups, grammage, costing, selling, quantity, adjustment):
-    board_area = (length * width * ups) / 1000000
-    cost_price = board_area * grammage * costing
-    selling_price = board_area * grammage * selling * (1 + adjustment/100)
-    total_price = selling_price * quantity
-    return cost_price, selling_price, total_price
-
-def calculate_design_nesting_layer_pad(ext_L, ext_W, ext_H, layer_thick, layer_qty, product_L, product_W, product_H, bubble):
-    adj_L = product_L + 10 if bubble else product_L
-    adj_W = product_W + 10 if bubble else product_W
-    adj_H = product_H + 10 if bubble else product_H
-
-    int_L = ext_L - 10
-    int_W = ext_W - 10
-    int_H = ext_H - 20 - (layer_thick * layer_qty)
-
-    slot = 3
-    bal_L = (int_L - adj_L - 2 * slot) / 2
-    nesting_long_L = round(bal_L + slot + adj_L + slot + bal_L)
-
-    bal_W = (int_W - adj_W - 2 * slot) / 2
-    nesting_short_L = round(bal_W + slot + adj_W + slot + bal_W)
+import streamlit as st
 
-    return int_L, int_W, int_H, adj_L, adj_W, adj_H, nesting_long_L, int_H, nesting_short_L, int_H
+from quotation_core import metrics
+from quotation_core.calculations import calculate_nesting, calculate_design_nesting_layer_pad
+from quotation_core.export import FORMATS, export_rows
+from quotation_core.money import PRICING_NOTE, format_rm
+from quotation_core.packing import boards_needed, pack_board
+from quotation_core.pallet import plan_pallet
+from quotation_core.stock import default_catalog_path, load_stock_index
+from quotation_core.store import QuoteStore
+from quotation_core.sweep import sweep_designs
+from quotation_core.screens import build_function_graph, build_product_graph, piece_outputs
+
+HISTORY_COLUMNS = ["created_at", "customer", "product", "spec", "quantity", "unit_price_sen", "total_sen"]
+
+# ==================== SESSION GRAPHS ====================
+def session_graph(key, builder):
+    # One recompute graph per page and browser session, so a rerun only
+    # recomputes the values downstream of the widgets that changed
+    if key not in st.session_state:
+        st.session_state[key] = builder()
+    return st.session_state[key]
+
+@st.cache_resource
+def quote_store():
+    # One store per server process, shared by every browser session
+    return QuoteStore()
+
+@st.cache_resource
+def stock_index():
+    # The stock carton catalog, indexed once per server process; None
+    # without a catalog file
+    path = default_catalog_path()
+    return load_stock_index(path) if os.path.exists(path) else None
+
+@st.cache_resource
+def metrics_endpoint():
+    # One /metrics endpoint per server process, on $QUOTATION_CORE_METRICS_PORT
+    # (and $QUOTATION_CORE_METRICS_HOST to serve beyond loopback)
+    return metrics.start_http_server()
+
+def record_quote(command, graph, **values):
+    # Saves the quote with the customer entered in the sidebar and returns its
+    # outputs. The store answers specs it has priced before; a new spec is
+    # priced once, by the page's session graph.
+    def price(inputs):
+        graph.set_inputs(**inputs)
+        return piece_outputs(graph)
+    return quote_store().quote(command, values, customer=customer or None, price=price)
 
 # ==================== UI ====================
 st.set_page_config(page_title="Carton Quotation App", layout="wide")
@@ -94,8 +59,13 @@ st.title("📦 Carton & Packaging Quotation Calculator")
 menu = st.sidebar.radio("Select Calculation Type", [
     "Carton Box", "Pizza Box", "Layer Pad",
     "Nesting Fitting and Carton Design",
-    "Using Sample Board", "Design Nesting and Layer Pad"
+    "Using Sample Board", "Design Nesting and Layer Pad",
+    "Quote History"
 ])
+customer = st.sidebar.text_input("Customer", value="").strip()
+if metrics.enabled():
+    metrics_endpoint()
+render_timer = metrics.page_timer(menu)
 
 if menu == "Carton Box":
     st.header("Carton Box Calculation")
@@ -109,9 +79,13 @@ if menu == "Carton Box":
     A = st.number_input("Adjustment %", value=0.0)
 
     if st.button("Calculate Carton Box"):
-        cp, sp, tp, f = calculate_standard_box(L, W, H, G, C, S, Q, A)
-        st.write(f"Cost: RM {cp:.2f}, Price: RM {sp:.2f}, Total: RM {tp:.2f}")
-        st.write(f"Formula: {f}")
+        graph = session_graph("carton_box_graph", lambda: build_product_graph("carton-box"))
+        quote = record_quote("carton-box", graph, length=L, width=W, height=H, grammage=G, costing=C, selling=S,
+                             quantity=Q, adjustment=A)
+        cp, sp, tp = quote["cost_sen"], quote["unit_price_sen"], quote["total_sen"]
+        st.write(f"Cost: RM {format_rm(cp)}, Price: RM {format_rm(sp)}, Total: RM {format_rm(tp)}")
+        st.caption(PRICING_NOTE)
+        st.write(f"Formula: {quote['formula']}")
 
 elif menu == "Pizza Box":
     st.header("Pizza Box Calculation")
@@ -124,9 +98,14 @@ elif menu == "Pizza Box":
     A = st.number_input("Adjustment %", value=0.0)
 
     if st.button("Calculate Pizza Box"):
-        cp, sp, tp, pl, pw, ups = calculate_pizza_box(L, W, G, C, S, Q, A)
-        st.write(f"Cost: RM {cp:.2f}, Price: RM {sp:.2f}, Total: RM {tp:.2f}")
-        st.write(f"Paper Length: {pl:.3f}m, Actual Width: {pw:.3f}m, UPS: {ups}")
+        graph = session_graph("pizza_box_graph", lambda: build_product_graph("pizza-box"))
+        quote = record_quote("pizza-box", graph, length=L, width=W, grammage=G, costing=C, selling=S, quantity=Q,
+                             adjustment=A)
+        cp, sp, tp = quote["cost_sen"], quote["unit_price_sen"], quote["total_sen"]
+        st.write(f"Cost: RM {format_rm(cp)}, Price: RM {format_rm(sp)}, Total: RM {format_rm(tp)}")
+        st.caption(PRICING_NOTE)
+        st.write(f"Paper Length: {quote['paper_length_m']:.3f}m, Actual Width: {quote['actual_width_m']:.3f}m, "
+                 f"UPS: {quote['ups']}")
 
 elif menu == "Layer Pad":
     st.header("Layer Pad Calculation")
@@ -139,9 +118,13 @@ elif menu == "Layer Pad":
     A = st.number_input("Adjustment %", value=0.0)
 
     if st.button("Calculate Layer Pad"):
-        cp, sp, tp, f = calculate_layer_pad(L, W, G, C, S, Q, A)
-        st.write(f"Cost: RM {cp:.2f}, Price: RM {sp:.2f}, Total: RM {tp:.2f}")
-        st.write(f"Formula: {f}")
+        graph = session_graph("layer_pad_graph", lambda: build_product_graph("layer-pad"))
+        quote = record_quote("layer-pad", graph, length=L, width=W, grammage=G, costing=C, selling=S, quantity=Q,
+                             adjustment=A)
+        cp, sp, tp = quote["cost_sen"], quote["unit_price_sen"], quote["total_sen"]
+        st.write(f"Cost: RM {format_rm(cp)}, Price: RM {format_rm(sp)}, Total: RM {format_rm(tp)}")
+        st.caption(PRICING_NOTE)
+        st.write(f"Formula: {quote['formula']}")
 
 elif menu == "Nesting Fitting and Carton Design":
     st.header("Nesting Fitting and Carton Design")
@@ -158,11 +141,55 @@ elif menu == "Nesting Fitting and Carton Design":
     layerQty = st.number_input("Number of Layer Pads", value=2)
 
     if st.button("Calculate Nesting"):
-        iL, iW, iH, eL, eW, eH, nL, nS = calculate_nesting(PL, PW, PH, bubble, thick, allow, qtyL, qtyW, qtyH, layerT, layerQty)
+        graph = session_graph("nesting_graph", lambda: build_function_graph(calculate_nesting, (
+            "product_L", "product_W", "product_H", "bubble", "thickness", "allowance",
+            "qty_L", "qty_W", "qty_H", "layer_thick", "layer_qty"
+        )))
+        graph.set_inputs(product_L=PL, product_W=PW, product_H=PH, bubble=bubble, thickness=thick, allowance=allow,
+                         qty_L=qtyL, qty_W=qtyW, qty_H=qtyH, layer_thick=layerT, layer_qty=layerQty)
+        iL, iW, iH, eL, eW, eH, nL, nS = graph.get("result")
+        stock = stock_index()
+        if stock is not None:
+            # Stock cartons holding the same nested arrangement, before the custom design
+            fits = stock.fits(iL, iW, iH + layerT * layerQty)
+            if fits:
+                st.subheader("Stock Cartons That Fit")
+                st.dataframe([{
+                    "Code": carton["code"],
+                    "Internal (mm)": f"{carton['length']:g} x {carton['width']:g} x {carton['height']:g}",
+                    "Void %": carton["void_percent"],
+                } for carton in fits])
+            else:
+                st.write("No stock carton fits; custom carton below")
         st.write(f"Internal: {iL:.1f} x {iW:.1f} x {iH:.1f}")
         st.write(f"External: {eL:.1f} x {eW:.1f} x {eH:.1f}")
         st.write(f"Nesting Long: {nL[0]:.1f} x {nL[1]:.1f} mm")
         st.write(f"Nesting Short: {nS[0]:.1f} x {nS[1]:.1f} mm")
+        try:
+            load = plan_pallet(eL, eW, eH, pallet=None)
+        except ValueError as exc:
+            st.write(f"Pallet: {exc}")
+        else:
+            st.write(f"Pallet: {load['pallet']} mm, {load['per_layer']} cartons per layer ({load['pattern']}) x {load['layers']} layers = {load['cartons']} cartons, {load['volume_utilisation_percent']:.1f}% full")
+
+    with st.expander("Find Cheapest Design"):
+        target = st.number_input("Target Quantity per Carton", value=10, min_value=1)
+        G = st.number_input("Grammage (g/m²)", value=0.84)
+        C = st.number_input("Costing Tonnage", value=2.7)
+        S = st.number_input("Selling Tonnage", value=3.4)
+        A = st.number_input("Adjustment %", value=0.0)
+
+        if st.button("Sweep Designs"):
+            # In-process: worker processes don't belong in the Streamlit server
+            designs = sweep_designs(PL, PW, PH, bubble, thick, allow, int(target), layerT, G, C, S, A, workers=1)
+            st.dataframe([{
+                "Product (L x W x H)": " x ".join(f"{d:g}" for d in design["orientation"]),
+                "Qty L x W x H": f"{design['qty_L']} x {design['qty_W']} x {design['qty_H']}",
+                "Layer Pads": design["layer_qty"],
+                "External (mm)": " x ".join(f"{d:.1f}" for d in design["external_size"]),
+                "Cost / Unit (RM)": round(design["cost_per_unit"], 4),
+                "Price / Unit (RM)": round(design["price_per_unit"], 4),
+            } for design in designs])
 
 elif menu == "Using Sample Board":
     st.header("Sample Board Calculation")
@@ -174,10 +201,21 @@ elif menu == "Using Sample Board":
     S = st.number_input("Selling Tonnage", value=3.4)
     Q = st.number_input("Quantity", value=100)
     A = st.number_input("Adjustment %", value=0.0)
+    sheetL = st.number_input("Sample Sheet Length (mm)", value=1050.0)
+    sheetW = st.number_input("Sample Sheet Width (mm)", value=750.0)
 
     if st.button("Calculate Sample Board"):
-        cp, sp, tp = calculate_sample_board(L, W, UPS, G, C, S, Q, A)
-        st.write(f"Cost: RM {cp:.2f}, Price: RM {sp:.2f}, Total: RM {tp:.2f}")
+        graph = session_graph("sample_board_graph", lambda: build_product_graph("sample-board"))
+        quote = record_quote("sample-board", graph, length=L, width=W, ups=UPS, grammage=G, costing=C, selling=S,
+                             quantity=Q, adjustment=A)
+        cp, sp, tp = quote["cost_sen"], quote["unit_price_sen"], quote["total_sen"]
+        st.write(f"Cost: RM {format_rm(cp)}, Price: RM {format_rm(sp)}, Total: RM {format_rm(tp)}")
+        st.caption(PRICING_NOTE)
+        packing = pack_board(L, W, sheetL, sheetW)
+        if packing["ups"]:
+            st.write(f"Fits per Sheet: {packing['ups']} (entered UPS: {UPS}), Sheets Needed: {boards_needed(Q, packing['ups'])}, Waste: {packing['waste_percent']:.1f}%")
+        else:
+            st.write("Board does not fit on the sample sheet")
 
 elif menu == "Design Nesting and Layer Pad":
     st.header("Design Nesting and Layer Pad")
@@ -192,8 +230,46 @@ elif menu == "Design Nesting and Layer Pad":
     bubble = st.checkbox("Add Bubble Wrap (10mm)?", value=False)
 
     if st.button("Calculate Design Nesting"):
-        iL, iW, iH, aL, aW, aH, nLL, nLW, nSL, nSW = calculate_design_nesting_layer_pad(extL, extW, extH, layerT, layerQ, prodL, prodW, prodH, bubble)
+        graph = session_graph("design_nesting_graph", lambda: build_function_graph(calculate_design_nesting_layer_pad, (
+            "ext_L", "ext_W", "ext_H", "layer_thick", "layer_qty", "product_L", "product_W", "product_H", "bubble"
+        )))
+        graph.set_inputs(ext_L=extL, ext_W=extW, ext_H=extH, layer_thick=layerT, layer_qty=layerQ,
+                         product_L=prodL, product_W=prodW, product_H=prodH, bubble=bubble)
+        iL, iW, iH, aL, aW, aH, nLL, nLW, nSL, nSW = graph.get("result")
         st.write(f"Internal Size: {iL} x {iW} x {iH}")
         st.write(f"Adjusted Product: {aL} x {aW} x {aH}")
         st.write(f"Nesting Long: {nLL} x {nLW} mm")
         st.write(f"Nesting Short: {nSL} x {nSW} mm")
+
+elif menu == "Quote History":
+    st.header("Quote History")
+    who = st.text_input("Customer (blank for all)", value=customer)
+    start = st.date_input("From", value=None)
+    end = st.date_input("To", value=None)
+    limit = st.number_input("Show Latest", value=200, min_value=1)
+    # Recorded prices, or the prices of one tonnage repricing
+    repricings = {f"Repriced {r['created_at']} (#{r['id']})": r["id"] for r in reversed(quote_store().repricings())}
+    prices = st.selectbox("Prices", ["As quoted"] + list(repricings))
+
+    quotes = quote_store().history(
+        customer=who.strip() or None, since=start,
+        until=end + datetime.timedelta(days=1) if end else None, limit=int(limit), repricing=repricings.get(prices)
+    )
+    for quote in quotes:
+        quote["spec"] = ", ".join(f"{name}={value:g}" for name, value in quote["inputs"].items())
+    st.dataframe([{
+        "Date (UTC)": quote["created_at"],
+        "Customer": quote["customer"] or "",
+        "Product": quote["product"],
+        "Spec": quote["spec"],
+        "Quantity": quote["quantity"],
+        "Price / Unit (RM)": format_rm(quote["unit_price_sen"]),
+        "Total (RM)": format_rm(quote["total_sen"]),
+    } for quote in quotes])
+
+    fmt = st.selectbox("Export As", FORMATS)
+    export = io.BytesIO()
+    export_rows(quotes, HISTORY_COLUMNS, export, fmt, title="Quote History")
+    st.download_button(f"Download {fmt.upper()}", export.getvalue(), file_name=f"quotes.{fmt}")
+
+render_timer.stop()
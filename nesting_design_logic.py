@@ -1,68 +1,7 @@
 import streamlit as st
-import math
 
-def calculate_nesting_design(product_L, product_W, product_H, include_bubble, nesting_thickness, allowance, qty_per_box, carton_ext_L, carton_ext_W, carton_ext_H, product_weight):
-    # Adjust product dimensions with bubble wrap
-    adj_L = product_L + 10 if include_bubble else product_L
-    adj_W = product_W + 10 if include_bubble else product_W
-    adj_H = product_H + 10 if include_bubble else product_H
-
-    # Keep original orientation
-    packed_L = adj_L
-    packed_W = adj_W
-    packed_H = adj_H
-
-    # Convert carton external to internal dimensions
-    carton_int_L = carton_ext_L - 10
-    carton_int_W = carton_ext_W - 10
-    carton_int_H = carton_ext_H - 20
-
-    # Calculate how many units fit
-    fit_L = math.floor(carton_int_L / packed_L)
-    fit_W = math.floor(carton_int_W / packed_W)
-    fit_H = math.floor(carton_int_H / packed_H)
-    total_fit = fit_L * fit_W * fit_H
-
-    # Nesting Long Calculation
-    balance_L = (carton_int_L - packed_L - 2 * nesting_thickness) / 2
-    nesting_long_length = balance_L + nesting_thickness + packed_L + nesting_thickness + balance_L
-
-    if fit_H > 0:
-        nesting_each_height = (carton_int_H - (fit_H + 1) * nesting_thickness) / fit_H
-        nesting_long_width = nesting_each_height
-        layer_pad_quantity = fit_H + 1
-    else:
-        nesting_long_width = packed_H
-        nesting_each_height = 0
-        layer_pad_quantity = 2
-
-    long_formula = f"{balance_L:.1f} + {nesting_thickness} + {packed_L} + {nesting_thickness} + {balance_L:.1f} = {nesting_long_length:.1f}"
-
-    # Nesting Short Calculation
-    nesting_short_length = carton_int_W
-    nesting_short_width = nesting_long_width
-    short_formula = f"Same width as long nesting: {nesting_short_width:.1f}"
-
-    # Layer pad size
-    layer_pad_length = carton_int_L
-    layer_pad_width = carton_int_W
-
-    total_carton_weight = total_fit * product_weight
-
-    return (
-        round(nesting_long_length, 2),
-        round(nesting_long_width, 2),
-        round(nesting_short_length, 2),
-        round(nesting_short_width, 2),
-        round(layer_pad_length, 2),
-        round(layer_pad_width, 2),
-        round(nesting_each_height, 2),
-        layer_pad_quantity,
-        fit_L, fit_W, fit_H, total_fit,
-        carton_int_L, carton_int_W, carton_int_H,
-        long_formula, short_formula,
-        round(total_carton_weight, 2)
-    )
+from quotation_core.nesting_design import calculate_nesting_design, nesting_layer_plan
+from quotation_core.pallet import PALLETS, plan_pallet
 
 # -------------------- Streamlit UI --------------------
 st.set_page_config(page_title="Nesting Design Calculator", layout="wide")
@@ -84,6 +23,8 @@ nesting_thickness = st.number_input("Nesting Thickness (mm)", value=3.0)
 allowance = st.number_input("Balance Allowance (mm)", value=30.0)
 qty_per_box = st.number_input("Product Quantity in One Box", value=10)
 product_weight = st.number_input("Product Weight (kg)", value=1.0)
+search_orientation = st.checkbox("Search rotations and mixed-orientation layers", value=False)
+pallet = st.selectbox("Pallet (mm)", ["Best fit"] + list(PALLETS))
 
 if st.button("Calculate Nesting Design"):
     long_L, long_W, short_L, short_W, pad_L, pad_W, nest_H, pad_qty, fit_L, fit_W, fit_H, total_fit, int_L, int_W, int_H, long_formula, short_formula, total_carton_weight = calculate_nesting_design(
@@ -91,7 +32,7 @@ if st.button("Calculate Nesting Design"):
         include_bubble, nesting_thickness,
         allowance, qty_per_box,
         carton_ext_L, carton_ext_W, carton_ext_H,
-        product_weight
+        product_weight, search_orientation
     )
 
     st.subheader("📏 Nesting Output")
@@ -107,5 +48,24 @@ if st.button("Calculate Nesting Design"):
 
     st.subheader("📦 Fitment Info")
     st.write(f"Internal Carton Size: {int_L} x {int_W} x {int_H} mm")
-    st.write(f"Units that fit (L×W×H): {fit_L} × {fit_W} × {fit_H} = {total_fit} units")
+    if search_orientation and total_fit != fit_L * fit_W * fit_H:
+        for layer in nesting_layer_plan(product_L, product_W, product_H, include_bubble, nesting_thickness,
+                                        carton_ext_L, carton_ext_W, carton_ext_H, search_orientation):
+            packed_L, packed_W, packed_H = layer["packed"]
+            st.write(f"{layer['layers']} layer(s) of {layer['per_layer']} units standing {packed_H} mm high ({packed_L} × {packed_W} footprint), nesting {layer['nesting_height']} mm high")
+        st.write(f"Units that fit: {total_fit} units")
+    else:
+        st.write(f"Units that fit (L×W×H): {fit_L} × {fit_W} × {fit_H} = {total_fit} units")
     st.write(f"Total Carton Weight: {total_carton_weight:.2f} kg")
+
+    st.subheader("🚚 Pallet Load")
+    try:
+        load = plan_pallet(carton_ext_L, carton_ext_W, carton_ext_H, total_carton_weight,
+                           pallet=None if pallet == "Best fit" else pallet)
+    except ValueError as exc:
+        st.write(str(exc))
+    else:
+        st.write(f"Pallet: {load['pallet']} mm, {load['pattern']} pattern")
+        st.write(f"Cartons per Layer: {load['per_layer']}, Layers: {load['layers']}, Cartons per Pallet: {load['cartons']} (limited by {load['limited_by']})")
+        st.write(f"Load: {load['load_height']:.0f} mm high, {load['load_weight']:.1f} kg")
+        st.write(f"Utilisation: {load['area_utilisation_percent']:.1f}% of the deck, {load['volume_utilisation_percent']:.1f}% of the load volume")
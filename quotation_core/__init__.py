@@ -0,0 +1,14 @@
+# Streamlit-free pricing and nesting logic shared by the quotation pages,
+# batch jobs and the command line (python -m quotation_core).
+# Modules that need NumPy (batch) are not imported here to keep startup cheap.
+from .calculations import (
+    MAX_ROLL_WIDTH, TRIM_ALLOWANCE,
+    calculate_standard_box, calculate_pizza_box, calculate_layer_pad, calculate_nesting,
+    calculate_sample_board, calculate_nesting_piece, calculate_design_nesting_layer_pad
+)
+from .carton_box import calculate_carton_box_price
+from .layer_pad import calculate_layer_pad_price
+from .nesting_design import calculate_nesting_design, nesting_layer_plan
+from .nesting_fitting import calculate_nesting_fitting
+from .pizza_box import calculate_pizza_box_price
+from .products import PRODUCT_TYPES, ProductType
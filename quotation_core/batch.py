@@ -0,0 +1,99 @@
+import numpy as np
+
+from .calculations import MAX_ROLL_WIDTH
+from .metrics import instrument
+from .money import SEN_PER_RM, UM2_PER_M2
+from .products import PRODUCT_TYPES
+
+# ==================== HELPERS ====================
+def _as_array(value):
+    return np.asarray(value, dtype=np.float64)
+
+def _as_whole_array(value):
+    # Integers stay int64 (exact sen totals); anything else is float64
+    values = np.asarray(value)
+    return values.astype(np.int64) if values.dtype.kind in "iu" else values.astype(np.float64)
+
+def _int(values):
+    # int() of every value: truncated towards zero, as int64
+    return np.asarray(values).astype(np.int64)
+
+def _two_product_error(a, b, product):
+    # Dekker's error-free product: a * b == product + error exactly
+    split = 134217729.0
+    a_big = split * a
+    a_hi = a_big - (a_big - a)
+    a_lo = a - a_hi
+    b_big = split * b
+    b_hi = b_big - (b_big - b)
+    b_lo = b - b_hi
+    return ((a_hi * b_hi - product) + a_hi * b_lo + a_lo * b_hi) + a_lo * b_lo
+
+def _round(values, ndigits):
+    # Same result as Python's round(value, ndigits). np.round rounds the scaled
+    # value, so when the scaling lands exactly on .5 the rounding error of the
+    # multiply decides which way the true value goes.
+    values = np.asarray(values, dtype=np.float64)
+    shape = values.shape
+    values = values.reshape(-1)
+    scale = 10.0 ** ndigits
+    scaled = values * scale
+    rounded = np.rint(scaled)
+    half = (scaled - np.floor(scaled)) == 0.5
+    if half.any():
+        half_scaled = scaled[half]
+        error = _two_product_error(values[half], scale, half_scaled)
+        lower = np.floor(half_scaled)
+        rounded[half] = np.where(error > 0, lower + 1, np.where(error < 0, lower, rounded[half]))
+    return (rounded / scale).reshape(shape)
+
+def _roll_fit(raw_width, trim_allowance):
+    if np.any(raw_width <= 0):
+        row = int(np.flatnonzero(np.ravel(raw_width <= 0))[0])
+        raise ValueError(f"Raw width must be positive, got {np.ravel(raw_width)[row]:g} mm in row {row}")
+    pieces_per_roll = np.floor(MAX_ROLL_WIDTH / raw_width)
+    if np.any(pieces_per_roll == 0):
+        row = int(np.flatnonzero(np.ravel(pieces_per_roll) == 0)[0])
+        raise ValueError(f"Raw width is wider than the {MAX_ROLL_WIDTH} mm roll (zero UPS) in row {row}")
+    total_used_width = raw_width * pieces_per_roll
+    rounded_roll_width = np.ceil((total_used_width + trim_allowance) / 50) * 50
+    return pieces_per_roll, rounded_roll_width
+
+def _round_sen(rm):
+    return np.floor(rm * SEN_PER_RM + 0.5).astype(np.int64)
+
+# money.prices_sen for arrays of areas, used by reprice.py
+def prices_sen_batch(area_um2, grammage, costing, selling, quantity, adjustment):
+    area_m2 = area_um2 / UM2_PER_M2
+    cost_sen = _round_sen(area_m2 * grammage * costing)
+    unit_price_sen = _round_sen(area_m2 * grammage * selling * (1 + adjustment / 100))
+    return cost_sen, unit_price_sen, unit_price_sen * quantity.astype(np.int64)
+
+# ==================== BATCH CALCULATIONS ====================
+# Array-in/array-out versions of the calculators, compiled from the product
+# definitions in products.py. Every argument may be a scalar or an array;
+# arrays are broadcast together. The box types return (cost, unit_price,
+# total, paper_length_m, effective_width_m, ups) as arrays, sample board the
+# three prices. product type name: batch calculator
+BATCH_CALCULATORS = {
+    name: instrument(product.vector(product.batch_outputs, product.calculator + "_batch", __name__))
+    for name, product in PRODUCT_TYPES.items()
+}
+calculate_standard_box_batch = BATCH_CALCULATORS["carton-box"]
+calculate_pizza_box_batch = BATCH_CALCULATORS["pizza-box"]
+calculate_layer_pad_batch = BATCH_CALCULATORS["layer-pad"]
+calculate_sample_board_batch = BATCH_CALCULATORS["sample-board"]
+calculate_nesting_piece_batch = BATCH_CALCULATORS["nesting-piece"]
+
+# ==================== FIXED-POINT BATCH CALCULATIONS ====================
+# Array versions of the money.py calculators, with the same rounding policy
+# and operations: prices and totals as int64 sen, geometry as int64 um.
+MONEY_BATCH_CALCULATORS = {
+    name: instrument(product.vector(product.money_outputs, product.calculator + "_sen_batch", __name__))
+    for name, product in PRODUCT_TYPES.items()
+}
+calculate_standard_box_sen_batch = MONEY_BATCH_CALCULATORS["carton-box"]
+calculate_pizza_box_sen_batch = MONEY_BATCH_CALCULATORS["pizza-box"]
+calculate_layer_pad_sen_batch = MONEY_BATCH_CALCULATORS["layer-pad"]
+calculate_sample_board_sen_batch = MONEY_BATCH_CALCULATORS["sample-board"]
+calculate_nesting_piece_sen_batch = MONEY_BATCH_CALCULATORS["nesting-piece"]
@@ -0,0 +1,54 @@
+from .metrics import instrument
+from .products import PRODUCT_TYPES, TRIM_ALLOWANCE, standard_box_formula
+from .roll_fit import MAX_ROLL_WIDTH
+
+# ==================== CALCULATION FUNCTIONS ====================
+# The priced calculators are compiled from the product definitions in
+# products.py. product type name: calculator
+CALCULATORS = {
+    name: instrument(product.scalar(product.outputs, product.calculator, __name__))
+    for name, product in PRODUCT_TYPES.items()
+}
+calculate_standard_box = CALCULATORS["carton-box"]
+calculate_pizza_box = CALCULATORS["pizza-box"]
+calculate_layer_pad = CALCULATORS["layer-pad"]
+calculate_sample_board = CALCULATORS["sample-board"]
+calculate_nesting_piece = CALCULATORS["nesting-piece"]
+
+@instrument
+def calculate_nesting(product_L, product_W, product_H, bubble, thickness, allowance, qty_L, qty_W, qty_H, layer_thick, layer_qty):
+    adj_L = product_L + 10 if bubble else product_L
+    adj_W = product_W + 10 if bubble else product_W
+    adj_H = product_H + 10 if bubble else product_H
+
+    int_L = allowance + thickness + ((adj_L + thickness) * qty_L) + allowance
+    int_W = allowance + thickness + ((adj_W + thickness) * qty_W) + allowance
+    int_H = adj_H
+
+    ext_L = int_L + 10
+    ext_W = int_W + 10
+    ext_H = int_H + 20 + (layer_thick * layer_qty)
+
+    nesting_long = (int_L, int_H)
+    nesting_short = (int_W, int_H)
+
+    return int_L, int_W, int_H, ext_L, ext_W, ext_H, nesting_long, nesting_short
+
+@instrument
+def calculate_design_nesting_layer_pad(ext_L, ext_W, ext_H, layer_thick, layer_qty, product_L, product_W, product_H, bubble):
+    adj_L = product_L + 10 if bubble else product_L
+    adj_W = product_W + 10 if bubble else product_W
+    adj_H = product_H + 10 if bubble else product_H
+
+    int_L = ext_L - 10
+    int_W = ext_W - 10
+    int_H = ext_H - 20 - (layer_thick * layer_qty)
+
+    slot = 3
+    bal_L = (int_L - adj_L - 2 * slot) / 2
+    nesting_long_L = round(bal_L + slot + adj_L + slot + bal_L)
+
+    bal_W = (int_W - adj_W - 2 * slot) / 2
+    nesting_short_L = round(bal_W + slot + adj_W + slot + bal_W)
+
+    return int_L, int_W, int_H, adj_L, adj_W, adj_H, nesting_long_L, int_H, nesting_short_L, int_H
@@ -0,0 +1,25 @@
+from .metrics import instrument
+from .money import UM_PER_M, calculate_carton_box_price_sen, sen_to_rm
+from .products import standard_box_formula
+
+@instrument
+def calculate_carton_box_price(length, width, height, grammage, costing_tonnage, selling_tonnage, quantity, adjustment_percent):
+    # Trim allowance 25 up to 0.77 grammage, else 28 (see products.py). The
+    # prices are calculate_carton_box_price_sen's in RM: each rounded once to
+    # the sen, the total the rounded unit price x quantity.
+    cost_sen, unit_price_sen, total_sen, paper_length_um, effective_width_um, pieces_per_roll = \
+        calculate_carton_box_price_sen(length, width, height, grammage, costing_tonnage, selling_tonnage, quantity,
+                                       adjustment_percent)
+    total_paper_length_m = paper_length_um / UM_PER_M
+    effective_width_per_piece_m = effective_width_um / UM_PER_M
+
+    return (
+        sen_to_rm(cost_sen),
+        sen_to_rm(unit_price_sen),
+        sen_to_rm(total_sen),
+        total_paper_length_m,
+        effective_width_per_piece_m,
+        pieces_per_roll,
+        standard_box_formula(total_paper_length_m, effective_width_per_piece_m, grammage, selling_tonnage,
+                             adjustment_percent)
+    )
@@ -0,0 +1,264 @@
+import argparse
+import csv
+import json
+
+from .calculations import CALCULATORS, calculate_nesting, calculate_design_nesting_layer_pad
+from .money import MONEY_CALCULATORS
+from .products import PRICING_ARGUMENTS, PRODUCT_TYPES
+
+# ==================== COMMANDS ====================
+# command: (function, [(argument, type), ...], [output names])
+PRICING_ARGS = list(PRICING_ARGUMENTS)
+
+# One command per product type (products.py), then the nesting calculators
+COMMANDS = {
+    name: (CALCULATORS[name], list(product.arguments) + PRICING_ARGS, list(product.outputs))
+    for name, product in PRODUCT_TYPES.items()
+}
+COMMANDS.update({
+    "nesting": (
+        calculate_nesting,
+        [("product_L", float), ("product_W", float), ("product_H", float), ("bubble", bool),
+         ("thickness", float), ("allowance", float), ("qty_L", int), ("qty_W", int), ("qty_H", int),
+         ("layer_thick", float), ("layer_qty", int)],
+        ["int_L", "int_W", "int_H", "ext_L", "ext_W", "ext_H", "nesting_long", "nesting_short"],
+    ),
+    "design-nesting": (
+        calculate_design_nesting_layer_pad,
+        [("ext_L", float), ("ext_W", float), ("ext_H", float), ("layer_thick", float), ("layer_qty", int),
+         ("product_L", float), ("product_W", float), ("product_H", float), ("bubble", bool)],
+        ["int_L", "int_W", "int_H", "adj_L", "adj_W", "adj_H",
+         "nesting_long_L", "nesting_long_W", "nesting_short_L", "nesting_short_W"],
+    ),
+})
+
+# Priced commands also report fixed-point prices (see money.py), from the
+# same arguments
+MONEY_COMMANDS = dict(MONEY_CALCULATORS)
+MONEY_OUTPUTS = ["cost_sen", "unit_price_sen", "total_sen"]
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="quotation_core", description="Carton and packaging quotation calculators")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, (func, arguments, _) in COMMANDS.items():
+        sub = subparsers.add_parser(name, help=func.__name__)
+        for argument, kind in arguments:
+            option = "--" + argument.replace("_", "-")
+            if kind is bool:
+                sub.add_argument(option, dest=argument, action="store_true")
+            else:
+                sub.add_argument(option, dest=argument, type=kind, required=True)
+    serve = subparsers.add_parser("serve", help="run the JSON quoting service")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8080)
+    reprice = subparsers.add_parser("reprice", help="apply a new tonnage table to the stored quotes")
+    reprice.add_argument("--tonnage", required=True, help="CSV with grammage, costing and selling columns")
+    reprice.add_argument("--store", help="quote store file (default: the shared store)")
+    reprice.add_argument("--report", help="write the old vs new prices of each quote to this CSV")
+    reprice.add_argument("--dry-run", action="store_true", help="report without changing the store")
+    export = subparsers.add_parser("export", help="price a CSV of specs into a CSV, XLSX or PDF quotation")
+    export.add_argument("product", choices=list(COMMANDS))
+    export.add_argument("--specs", required=True, help="CSV with one column per calculator argument")
+    export.add_argument("--output", required=True, help="file to write; .csv, .xlsx or .pdf")
+    export.add_argument("--format", choices=["csv", "xlsx", "pdf"], help="default: from the output extension")
+    export.add_argument("--columns", help="comma separated columns (default: all arguments and outputs)")
+    export.add_argument("--title", help="sheet name or PDF page heading")
+    materials = subparsers.add_parser("materials", help="total the paper an order book needs by grammage and roll width")
+    materials.add_argument("--orders", required=True,
+                           help="CSV with product, quantity, grammage and each product's size columns")
+    materials.add_argument("--output", help="write the totals to this CSV (default: print them as JSON)")
+    pallet = subparsers.add_parser("pallet", help="plan the cartons per layer and per pallet of a carton")
+    pallet.add_argument("--length", type=float, required=True, help="carton external length (mm)")
+    pallet.add_argument("--width", type=float, required=True, help="carton external width (mm)")
+    pallet.add_argument("--height", type=float, required=True, help="carton external height (mm)")
+    pallet.add_argument("--weight", type=float, default=0, help="gross carton weight (kg)")
+    pallet.add_argument("--pallet", help="pallet size, e.g. 1200x1000 (default: the best standard pallet)")
+    pallet.add_argument("--max-height", type=float, help="load height limit (mm)")
+    pallet.add_argument("--max-weight", type=float, help="load weight limit (kg)")
+    pallet.add_argument("--any-face-down", action="store_true", help="allow cartons on their sides")
+    simulate = subparsers.add_parser("simulate", help="simulate a contract's margin as the costing tonnage moves")
+    simulate.add_argument("--contract", required=True,
+                          help="CSV with product, each product's size columns and the pricing columns")
+    simulate.add_argument("--scenarios", type=int, help="tonnage paths to simulate (default: 100000)")
+    simulate.add_argument("--months", type=int, help="contract length (default: 12)")
+    simulate.add_argument("--volatility", type=float, help="annual costing tonnage volatility (default: 0.25)")
+    simulate.add_argument("--drift", type=float, default=0.0, help="annual costing tonnage drift")
+    simulate.add_argument("--correlation", type=float, help="between grammages (default: 0.8)")
+    simulate.add_argument("--seed", type=int, help="for repeatable results")
+    simulate.add_argument("--workers", type=int, help="processes (default: all cores)")
+    stock = subparsers.add_parser("stock", help="find the stock cartons with the least void that hold a size")
+    stock.add_argument("--length", type=float, required=True, help="required internal length (mm)")
+    stock.add_argument("--width", type=float, required=True, help="required internal width (mm)")
+    stock.add_argument("--height", type=float, required=True, help="required internal height (mm)")
+    stock.add_argument("--catalog", help="CSV with code, length, width and height columns (default: the shared catalog)")
+    stock.add_argument("--limit", type=int, default=5)
+    stock.add_argument("--upright", action="store_true", help="keep the height vertical")
+    stock.add_argument("--max-void", type=float, help="largest void percent to suggest")
+    rfq = subparsers.add_parser("rfq", help="price every line of a CSV or Parquet RFQ file across all cores")
+    rfq.add_argument("--input", required=True,
+                     help="CSV or Parquet with product, each product's size columns and the pricing columns")
+    rfq.add_argument("--output", required=True, help="file to write; .csv or .parquet")
+    rfq.add_argument("--workers", type=int, help="processes (default: all cores)")
+    rfq.add_argument("--chunk-size", type=int, default=10000, help="lines per worker task")
+    return parser
+
+def run_command(name, values):
+    func, arguments, outputs = COMMANDS[name]
+    args = [values[argument] for argument, _ in arguments]
+    result = dict(zip(outputs, func(*args)))
+    if name in MONEY_COMMANDS:
+        result.update(zip(MONEY_OUTPUTS, MONEY_COMMANDS[name](*args)))
+    return result
+
+def reprice_store(args):
+    from .reprice import read_tonnage_table, reprice_quotes
+    from .store import QuoteStore
+    store = QuoteStore(args.store)
+    try:
+        tonnage = read_tonnage_table(args.tonnage)
+        if args.report:
+            with open(args.report, "w", newline="") as report:
+                summary = reprice_quotes(store, tonnage, report=report, dry_run=args.dry_run)
+        else:
+            summary = reprice_quotes(store, tonnage, dry_run=args.dry_run)
+    except (OSError, KeyError, ValueError) as exc:
+        print(json.dumps({"error": str(exc) or type(exc).__name__}))
+        return 1
+    finally:
+        store.close()
+    print(json.dumps(summary))
+    return 0
+
+def parse_row(row, arguments, line):
+    # Typed argument dict from a CSV row (text values) read at line
+    spec = {}
+    for argument, kind in arguments:
+        value = (row.get(argument) or "").strip()
+        if kind is bool:
+            spec[argument] = value.lower() in ("1", "true", "yes", "y")
+        elif not value:
+            raise ValueError(f"Line {line}: missing {argument}")
+        else:
+            try:
+                spec[argument] = kind(value)
+            except ValueError:
+                raise ValueError(f"Line {line}: bad {argument} {value!r}") from None
+    return spec
+
+def read_specs(f, command):
+    # Typed argument dicts from a CSV with one column per argument
+    _, arguments, _ = COMMANDS[command]
+    for line, row in enumerate(csv.DictReader(f), 2):
+        yield parse_row(row, arguments, line)
+
+def export_specs(args):
+    from .export import export_quotes
+    columns = [column.strip() for column in args.columns.split(",")] if args.columns else None
+    try:
+        with open(args.specs, newline="") as f:
+            count = export_quotes(args.product, read_specs(f, args.product), args.output, columns, args.format,
+                                  args.title)
+    except (OSError, KeyError, ValueError, ZeroDivisionError) as exc:
+        print(json.dumps({"error": str(exc) or type(exc).__name__}))
+        return 1
+    print(json.dumps({"rows": count, "output": args.output}))
+    return 0
+
+def material_totals(args):
+    from .materials import aggregate_materials, grammage_totals, read_orders, write_materials
+    try:
+        with open(args.orders, newline="") as f:
+            rows = aggregate_materials(read_orders(f))
+        if args.output:
+            with open(args.output, "w", newline="") as f:
+                write_materials(rows, f)
+    except (OSError, KeyError, ValueError, ZeroDivisionError) as exc:
+        print(json.dumps({"error": str(exc) or type(exc).__name__}))
+        return 1
+    if args.output:
+        print(json.dumps({"rows": len(rows), "output": args.output}))
+    else:
+        print(json.dumps({"materials": rows, "by_grammage": grammage_totals(rows)}))
+    return 0
+
+def pallet_load(args):
+    from .pallet import MAX_LOAD_HEIGHT, MAX_LOAD_WEIGHT, plan_pallet
+    try:
+        load = plan_pallet(args.length, args.width, args.height, args.weight, args.pallet,
+                           args.max_height or MAX_LOAD_HEIGHT, args.max_weight or MAX_LOAD_WEIGHT,
+                           upright=not args.any_face_down)
+    except ValueError as exc:
+        print(json.dumps({"error": str(exc)}))
+        return 1
+    load.pop("layout")
+    print(json.dumps(load))
+    return 0
+
+def simulate_margin(args):
+    from .simulation import CORRELATION, MONTHS, SCENARIOS, VOLATILITY, read_contract, simulate_contract
+    try:
+        with open(args.contract, newline="") as f:
+            lines = list(read_contract(f))
+        summary = simulate_contract(lines, args.scenarios or SCENARIOS, args.months or MONTHS,
+                                    VOLATILITY if args.volatility is None else args.volatility, args.drift,
+                                    CORRELATION if args.correlation is None else args.correlation,
+                                    args.seed, args.workers)
+    except (OSError, KeyError, ValueError) as exc:
+        print(json.dumps({"error": str(exc) or type(exc).__name__}))
+        return 1
+    print(json.dumps(summary))
+    return 0
+
+def stock_cartons(args):
+    from .stock import load_stock_index
+    try:
+        index = load_stock_index(args.catalog)
+        fits = index.fits(args.length, args.width, args.height, args.limit, args.upright, args.max_void)
+    except (OSError, ValueError) as exc:
+        print(json.dumps({"error": str(exc) or type(exc).__name__}))
+        return 1
+    print(json.dumps({"cartons": fits}))
+    return 0
+
+def quote_rfq(args):
+    from .rfq import quote_file
+    try:
+        summary = quote_file(args.input, args.output, chunk_size=args.chunk_size, workers=args.workers)
+    except (OSError, ValueError, csv.Error) as exc:
+        print(json.dumps({"error": str(exc) or type(exc).__name__}))
+        return 1
+    print(json.dumps(dict(summary, output=args.output)))
+    return 0
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == "serve":
+        # Imported here so the calculators don't pay for NumPy and asyncio
+        import asyncio
+        from .service import serve
+        try:
+            asyncio.run(serve(args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+        return 0
+    if args.command == "reprice":
+        return reprice_store(args)
+    if args.command == "export":
+        return export_specs(args)
+    if args.command == "materials":
+        return material_totals(args)
+    if args.command == "pallet":
+        return pallet_load(args)
+    if args.command == "simulate":
+        return simulate_margin(args)
+    if args.command == "stock":
+        return stock_cartons(args)
+    if args.command == "rfq":
+        return quote_rfq(args)
+    try:
+        result = run_command(args.command, vars(args))
+    except (ValueError, ZeroDivisionError) as exc:
+        print(json.dumps({"error": str(exc) or type(exc).__name__}))
+        return 1
+    print(json.dumps(result))
+    return 0
@@ -0,0 +1,132 @@
+import math
+
+from .calculations import MAX_ROLL_WIDTH, TRIM_ALLOWANCE
+from .roll_fit import ROLL_WIDTH_STEP, roll_fit
+
+# ==================== SINGLE ORDERS ====================
+def single_order_effective_width(raw_width, trim_allowance=TRIM_ALLOWANCE):
+    # Effective width per piece when the order runs alone, as in calculate_standard_box
+    try:
+        pieces_per_roll, rounded_roll_width, _ = roll_fit(raw_width, trim_allowance)
+    except ValueError:
+        return None
+    return rounded_roll_width / pieces_per_roll
+
+# ==================== PATTERN SEARCH ====================
+def _best_pattern(widths, caps, trim_allowance):
+    # Unbounded knapsack over slit widths as a bitset subset-sum: bit c of
+    # reach is set when some combination of lanes uses exactly c mm.
+    # widths are ordered by remaining demand, and the reconstruction only
+    # takes a later width when it can't be avoided, so long orders run first.
+    max_cap = caps[-1]
+    mask = (1 << (max_cap + 1)) - 1
+    reach = 1
+    prefixes = [reach]
+    for width in widths:
+        shift = width
+        while shift <= max_cap:
+            reach |= (reach << shift) & mask
+            shift <<= 1
+        prefixes.append(reach)
+        if (reach >> max_cap) & 1:
+            break
+
+    best = None
+    for cap in caps:
+        used = (reach & ((1 << (cap + 1)) - 1)).bit_length() - 1
+        if used <= 0:
+            continue
+        roll_width = cap + trim_allowance
+        waste_ratio = (roll_width - used) / roll_width
+        if best is None or waste_ratio < best[0]:
+            best = (waste_ratio, roll_width, used)
+    if best is None:
+        return None
+
+    _, roll_width, used = best
+    lanes = {}
+    i = len(prefixes) - 1
+    remaining = used
+    while remaining > 0:
+        if (prefixes[i - 1] >> remaining) & 1:
+            i -= 1
+        else:
+            width = widths[i - 1]
+            lanes[width] = lanes.get(width, 0) + 1
+            remaining -= width
+    return roll_width, used, lanes
+
+# ==================== PLANNER ====================
+def plan_deckle(orders, roll_widths=None, trim_allowance=TRIM_ALLOWANCE):
+    # orders: iterable of (order_id, raw_width_mm, paper_length_mm, quantity).
+    # Each order needs quantity * paper_length of lane running length at its
+    # raw width. Orders with the same slit width are interchangeable on the
+    # corrugator, so they are pooled and planned together.
+    if roll_widths is None:
+        roll_widths = range(ROLL_WIDTH_STEP, MAX_ROLL_WIDTH + ROLL_WIDTH_STEP, ROLL_WIDTH_STEP)
+    # Usable slitting width of each roll
+    caps = sorted(r - trim_allowance for r in set(roll_widths) if r > trim_allowance)
+    if not caps:
+        raise ValueError("No roll width is wider than the trim allowance")
+
+    order_lanes = {}
+    demand = {}
+    unplaced = []
+    for order_id, raw_width, paper_length, quantity in orders:
+        # Negative lane metres would cancel other orders' demand
+        if quantity <= 0:
+            raise ValueError(f"Order {order_id}: quantity must be positive, got {quantity}")
+        if paper_length <= 0:
+            raise ValueError(f"Order {order_id}: paper length must be positive, got {paper_length} mm")
+        lane_width = math.ceil(raw_width)
+        lane_metres = quantity * paper_length / 1000
+        if lane_width <= 0 or lane_width > caps[-1]:
+            unplaced.append(order_id)
+            continue
+        order_lanes[order_id] = (lane_width, lane_metres, raw_width)
+        demand[lane_width] = demand.get(lane_width, 0) + lane_metres
+
+    remaining = {w: d for w, d in demand.items() if d > 0}
+    runs = []
+    width_share = {w: 0.0 for w in demand}
+    while remaining:
+        widths = sorted(remaining, key=lambda w: (-remaining[w], w))
+        roll_width, used, lanes = _best_pattern(widths, caps, trim_allowance)
+        run_length = min(remaining[w] / n for w, n in lanes.items())
+        for w, n in lanes.items():
+            # Each lane carries its share of the roll, trim included
+            width_share[w] += n * run_length * w * roll_width / used
+            left = remaining[w] - n * run_length
+            if left <= 1e-9 * demand[w]:
+                del remaining[w]
+            else:
+                remaining[w] = left
+        runs.append({
+            "roll_width": roll_width,
+            "used_width": used,
+            "lanes": sorted(lanes.items(), reverse=True),
+            "run_length_m": run_length,
+            "trim_m2": (roll_width - used) * run_length / 1000,
+        })
+
+    results = {}
+    for order_id, (lane_width, lane_metres, raw_width) in order_lanes.items():
+        effective_width = width_share[lane_width] / demand[lane_width] if demand[lane_width] > 0 else lane_width
+        single = single_order_effective_width(raw_width, trim_allowance)
+        results[order_id] = {
+            "raw_width": raw_width,
+            "lane_metres": lane_metres,
+            "effective_width_m": round(effective_width / 1000, 3),
+            "single_effective_width_m": round(single / 1000, 3) if single else None,
+        }
+
+    total_area = sum(run["roll_width"] * run["run_length_m"] / 1000 for run in runs)
+    trim_area = sum(run["trim_m2"] for run in runs)
+    return {
+        "runs": runs,
+        "orders": results,
+        "unplaced": unplaced,
+        "total_area_m2": total_area,
+        "trim_area_m2": trim_area,
+        "trim_percent": trim_area / total_area * 100 if total_area else 0.0,
+    }
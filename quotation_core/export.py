@@ -0,0 +1,361 @@
+import csv
+import io
+import itertools
+import math
+import os
+import stat
+import tempfile
+import zlib
+
+import numpy as np
+
+from .batch import BATCH_CALCULATORS, MONEY_BATCH_CALCULATORS
+from .calculations import MAX_ROLL_WIDTH, standard_box_formula
+from .cli import COMMANDS, MONEY_COMMANDS, MONEY_OUTPUTS, run_command
+from .money import format_rm
+from .products import PRODUCT_TYPES
+
+# ==================== CONSTANTS ====================
+CHUNK_SIZE = 10000  # specs priced per NumPy pass
+WRITE_ROWS = 1000  # rows buffered per write to the output
+FORMATS = ("csv", "xlsx", "pdf")
+
+# ==================== QUOTE ROWS ====================
+# command: (batch function, fixed-point batch function, batch outputs, raw roll
+# width kernel or None), for every product type
+def _batch_command(product):
+    raw_width = None
+    if "raw_width" in dict(product.steps):
+        raw_width = product.vector(("raw_width",))
+    return (BATCH_CALCULATORS[product.name], MONEY_BATCH_CALCULATORS[product.name], product.batch_outputs,
+            raw_width)
+
+BATCH_COMMANDS = {name: _batch_command(product) for name, product in PRODUCT_TYPES.items()}
+
+def default_columns(command):
+    # The arguments and outputs run_command gives for command
+    _, arguments, outputs = COMMANDS[command]
+    money = MONEY_OUTPUTS if command in MONEY_COMMANDS else []
+    return [argument for argument, _ in arguments] + outputs + money
+
+def _check_columns(command, columns):
+    known = set(default_columns(command))
+    if command in BATCH_COMMANDS:
+        known.update(BATCH_COMMANDS[command][2])
+    unknown = [column for column in columns if column not in known]
+    if unknown:
+        raise ValueError(f"Unknown column(s) for {command}: {', '.join(unknown)}")
+
+def _chunks(specs, arguments, chunk_size):
+    # {argument: [values]} per chunk of specs; specs is an iterable of dicts,
+    # or a dict of argument arrays (broadcast together) from a batch run
+    if isinstance(specs, dict):
+        arrays = np.broadcast_arrays(*(np.asarray(specs[argument]) for argument, _ in arguments))
+        arrays = [array.ravel() for array in arrays]
+        for start in range(0, arrays[0].size if arrays else 0, chunk_size):
+            yield {argument: array[start:start + chunk_size].astype(kind).tolist()
+                   for (argument, kind), array in zip(arguments, arrays)}
+        return
+    specs = iter(specs)
+    while True:
+        chunk = list(itertools.islice(specs, chunk_size))
+        if not chunk:
+            return
+        yield {argument: [spec[argument] for spec in chunk] for argument, _ in arguments}
+
+def quote_rows(command, specs, columns=None, chunk_size=CHUNK_SIZE):
+    # Prices specs with command and yields one tuple per spec, in columns
+    # order (default_columns by default), holding one chunk at a time. A chunk
+    # is priced whole before any of its rows is yielded, so a bad spec raises
+    # ValueError before its chunk is written. Priced products run through the
+    # NumPy kernels, which give the same values as run_command; the formula
+    # text is only built when columns include it.
+    columns = list(columns or default_columns(command))
+    _check_columns(command, columns)
+    _, arguments, _ = COMMANDS[command]
+    if command not in BATCH_COMMANDS:
+        for chunk in _chunks(specs, arguments, chunk_size):
+            rows = []
+            for values in zip(*chunk.values()):
+                spec = dict(zip(chunk, values))
+                result = run_command(command, spec)
+                rows.append(tuple(spec[column] if column in spec else result[column] for column in columns))
+            yield from rows
+        return
+
+    func, sen_func, outputs, raw_width = BATCH_COMMANDS[command]
+    length, width, _ = PRODUCT_TYPES[command].geometry
+    wants_money = any(column in MONEY_OUTPUTS for column in columns)
+    offset = 0
+    for chunk in _chunks(specs, arguments, chunk_size):
+        args = [np.array(chunk[argument], dtype=np.float64) for argument, _ in arguments]
+        if raw_width:
+            # The kernels don't raise on a zero-UPS width the way roll_fit does
+            widths, = raw_width(*args)
+            bad = np.flatnonzero(~((widths > 0) & (widths <= MAX_ROLL_WIDTH)))
+            if len(bad):
+                raise ValueError(f"Spec {offset + int(bad[0]) + 1}: raw width {widths[bad[0]]:g} mm does not fit "
+                                 f"the {MAX_ROLL_WIDTH} mm roll")
+        results = dict(zip(outputs, func(*args)))
+        if wants_money:
+            results.update(zip(MONEY_OUTPUTS, sen_func(*args)))
+
+        columns_out = []
+        for column in columns:
+            if column in chunk:
+                columns_out.append(chunk[column])
+            elif column == "formula":
+                columns_out.append([
+                    standard_box_formula(*row) for row in zip(
+                        results[length].tolist(), results[width].tolist(),
+                        chunk["grammage"], chunk["selling"], chunk["adjustment"]
+                    )
+                ])
+            else:
+                columns_out.append(results[column].tolist())
+        yield from zip(*columns_out)
+        offset += len(chunk[arguments[0][0]])
+
+def _tuples(rows, columns):
+    for row in rows:
+        yield tuple(row.get(column) for column in columns) if isinstance(row, dict) else row
+
+def _batches(rows, size=WRITE_ROWS):
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+# ==================== CSV ====================
+def write_csv(stream, columns, rows, title=None):
+    text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    writer = csv.writer(text)
+    writer.writerow(columns)
+    count = 0
+    for batch in _batches(rows):
+        writer.writerows(batch)
+        count += len(batch)
+    text.flush()
+    text.detach()
+    return count
+
+# ==================== XLSX ====================
+# A single-sheet workbook in openpyxl's write-only mode, which streams the rows
+# to disk, so memory does not grow with the number of rows.
+def _openpyxl():
+    # openpyxl is only needed for XLSX files
+    try:
+        import openpyxl
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+        from openpyxl.styles import Font
+    except ImportError:
+        raise ValueError("XLSX files need openpyxl (pip install openpyxl)") from None
+    return openpyxl, WriteOnlyCell, ILLEGAL_CHARACTERS_RE, Font
+
+def _sheet_name(title):
+    name = "".join(char for char in title or "Quotation" if char not in '[]:*?/\\')[:31].strip()
+    return name or "Quotation"
+
+def write_xlsx(stream, columns, rows, title=None):
+    openpyxl, WriteOnlyCell, illegal, Font = _openpyxl()
+
+    def value(cell):
+        # Excel has no NaN or infinity, and no control characters in text
+        if isinstance(cell, float) and not math.isfinite(cell):
+            return str(cell)
+        if isinstance(cell, str):
+            return illegal.sub("", cell)
+        return cell
+
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet(_sheet_name(title))
+    sheet.freeze_panes = "A2"
+    bold = Font(bold=True)
+    header = []
+    for column in columns:
+        cell = WriteOnlyCell(sheet, value=value(column))
+        cell.font = bold
+        header.append(cell)
+    sheet.append(header)
+    count = 0
+    try:
+        for batch in _batches(rows):
+            for row in batch:
+                sheet.append([value(cell) for cell in row])
+            count += len(batch)
+    except BaseException:
+        # Finish the sheet's temporary part, which openpyxl would otherwise
+        # try to write after its file is gone
+        sheet.close()
+        raise
+    workbook.save(stream)
+    return count
+
+# ==================== PDF ====================
+# A plain landscape A4 listing in Courier, written page by page: each page's
+# content stream is flushed as soon as it is full, and only the byte offsets
+# of the objects are kept for the cross-reference table.
+PAGE_WIDTH = 842
+PAGE_HEIGHT = 595
+MARGIN = 36
+FONT_SIZE = 7.0
+CHAR_WIDTH = 0.6  # Courier advance, in ems
+LINE_SPACING = 1.3
+MIN_COLUMN = 6
+MAX_COLUMN = 48
+WIDTH_SAMPLE = 200  # rows read ahead to size the columns
+SEN_SUFFIX = "_sen"
+
+def _pdf_text(value, column):
+    if value is None:
+        return ""
+    if column.endswith(SEN_SUFFIX) and isinstance(value, int):
+        return format_rm(value)
+    if isinstance(value, bool):
+        return "Yes" if value else "No"
+    if isinstance(value, float):
+        return f"{value:,.4f}".rstrip("0").rstrip(".") if math.isfinite(value) else str(value)
+    if isinstance(value, int):
+        return f"{value:,}"
+    return str(value)
+
+def _pdf_heading(column):
+    return column[:-len(SEN_SUFFIX)] + " (RM)" if column.endswith(SEN_SUFFIX) else column
+
+def _pdf_string(text):
+    text = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return "(" + text + ")"
+
+class _PdfWriter:
+    def __init__(self, stream):
+        self.stream = stream
+        self.offsets = {}
+        self.position = 0
+        self.next_id = 1
+
+    def write(self, data):
+        self.stream.write(data)
+        self.position += len(data)
+
+    def reserve(self):
+        self.next_id += 1
+        return self.next_id - 1
+
+    def write_object(self, object_id, body, content=None):
+        self.offsets[object_id] = self.position
+        if content is None:
+            self.write(f"{object_id} 0 obj\n{body}\nendobj\n".encode("latin-1"))
+        else:
+            self.write(f"{object_id} 0 obj\n{body}\nstream\n".encode("latin-1"))
+            self.write(content)
+            self.write(b"\nendstream\nendobj\n")
+
+    def finish(self, root_id):
+        xref = self.position
+        size = self.next_id
+        lines = [f"xref\n0 {size}\n", "0000000000 65535 f \n"]
+        lines += [f"{self.offsets[object_id]:010d} 00000 n \n" for object_id in range(1, size)]
+        lines.append(f"trailer\n<< /Size {size} /Root {root_id} 0 R >>\nstartxref\n{xref}\n%%EOF\n")
+        self.write("".join(lines).encode("latin-1"))
+
+def write_pdf(stream, columns, rows, title=None):
+    title = title or "Quotation"
+    headings = [_pdf_heading(column) for column in columns]
+    cells = ([(_pdf_text(value, column), isinstance(value, (int, float)))
+              for value, column in zip(row, columns)] for row in rows)
+    # Column widths come from the headings and the first rows
+    sample = list(itertools.islice(cells, WIDTH_SAMPLE))
+    widths = [min(MAX_COLUMN, max([MIN_COLUMN, len(heading)] + [len(row[index][0]) for row in sample]))
+              for index, heading in enumerate(headings)]
+    line_chars = sum(widths) + 2 * (len(widths) - 1)
+    usable = PAGE_WIDTH - 2 * MARGIN
+    font_size = min(FONT_SIZE, usable / (max(line_chars, 1) * CHAR_WIDTH))
+    leading = font_size * LINE_SPACING
+    lines_per_page = max(1, int((PAGE_HEIGHT - 2 * MARGIN) / leading) - 3)
+
+    def fit(text, width, right):
+        text = text if len(text) <= width else text[:width - 1] + "~"
+        return text.rjust(width) if right else text.ljust(width)
+
+    def page_content(number, lines):
+        header = "  ".join(fit(heading, width, False) for heading, width in zip(headings, widths))
+        top = PAGE_HEIGHT - MARGIN - font_size
+        rule = top - leading - font_size * 0.4
+        text = [f"BT /F1 {font_size:.2f} Tf {leading:.2f} TL {MARGIN} {top:.2f} Td",
+                _pdf_string(f"{title}  -  page {number}") + " Tj T*", _pdf_string(header) + " Tj T* T*"]
+        text += [_pdf_string(line) + " Tj T*" for line in lines]
+        text.append(f"ET {MARGIN} {rule:.2f} m {PAGE_WIDTH - MARGIN} {rule:.2f} l 0.5 w S")
+        return zlib.compress("\n".join(text).encode("cp1252", "replace"))
+
+    pdf = _PdfWriter(stream)
+    pdf.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    catalog_id, pages_id, font_id = pdf.reserve(), pdf.reserve(), pdf.reserve()
+    pdf.write_object(font_id, "<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>")
+    page_ids = []
+
+    def write_page(lines):
+        content = page_content(len(page_ids) + 1, lines)
+        content_id, page_id = pdf.reserve(), pdf.reserve()
+        pdf.write_object(content_id, f"<< /Length {len(content)} /Filter /FlateDecode >>", content)
+        pdf.write_object(page_id, f"<< /Type /Page /Parent {pages_id} 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+                                  f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {content_id} 0 R >>")
+        page_ids.append(page_id)
+
+    count = 0
+    for batch in _batches(itertools.chain(sample, cells), lines_per_page):
+        write_page(["  ".join(fit(text, width, right) for (text, right), width in zip(row, widths)) for row in batch])
+        count += len(batch)
+    if not page_ids:
+        write_page([])
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    pdf.write_object(pages_id, f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>")
+    pdf.write_object(catalog_id, f"<< /Type /Catalog /Pages {pages_id} 0 R >>")
+    pdf.finish(catalog_id)
+    return count
+
+# ==================== EXPORT ====================
+WRITERS = {"csv": write_csv, "xlsx": write_xlsx, "pdf": write_pdf}
+
+def _file_mode(path):
+    # Permission bits for an export to path: the file's own when it exists,
+    # else what open() would give a new file under the umask
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+def export_rows(rows, columns, target, fmt=None, title=None):
+    # Streams rows (tuples in columns order, or dicts keyed by column) to
+    # target, a path or a binary file, as CSV, XLSX or PDF (fmt, or the
+    # path's extension). Returns the number of rows written.
+    if fmt is None:
+        fmt = os.path.splitext(os.fspath(target))[1].lstrip(".").lower()
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown export format {fmt!r} (expected one of {', '.join(FORMATS)})")
+    rows = _tuples(rows, columns)
+    if not isinstance(target, (str, os.PathLike)):
+        return WRITERS[fmt](target, list(columns), rows, title)
+    # Written beside target and renamed over it once complete, so an export
+    # that fails part way (a bad spec, a full disk) leaves target as it was
+    # (mkstemp makes it 0600, which would leave other users unable to read it)
+    mode = _file_mode(target)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(target)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as stream:
+            count = WRITERS[fmt](stream, list(columns), rows, title)
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, target)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return count
+
+def export_quotes(command, specs, target, columns=None, fmt=None, title=None, chunk_size=CHUNK_SIZE):
+    # Prices specs (see quote_rows) and streams the quotation to target
+    columns = list(columns or default_columns(command))
+    return export_rows(quote_rows(command, specs, columns, chunk_size), columns, target, fmt, title)
@@ -0,0 +1,76 @@
+import math
+
+# ==================== LAYER PLANS ====================
+def _layer_plan(length, width, a, b):
+    # Most a x b footprints in a length x width layer. One guillotine cut may
+    # split the layer into two blocks, the second rotated 90 degrees, which
+    # also covers the plain single-orientation layouts (one block empty).
+    best = (0, [])
+    for p, q in ((a, b), (b, a)):
+        rows = math.floor(width / q)
+        cols = math.floor(length / p)
+        # Cut across the length: k columns of p x q, the rest rotated
+        for k in range(cols + 1):
+            first = k * rows
+            second = math.floor((length - k * p) / q) * math.floor(width / p)
+            if first + second > best[0]:
+                best = (first + second, [(p, q, first), (q, p, second)])
+        # Cut across the width: k rows of p x q, the rest rotated
+        for k in range(rows + 1):
+            first = k * cols
+            second = math.floor((width - k * q) / p) * math.floor(length / q)
+            if first + second > best[0]:
+                best = (first + second, [(p, q, first), (q, p, second)])
+    count, blocks = best
+    return count, [block for block in blocks if block[2] > 0]
+
+def layer_options(int_L, int_W, item_L, item_W, item_H):
+    # Best layer for each of the three item dimensions standing upright;
+    # together with the rotated footprints that is all six orientations.
+    # packed is the (length, width, height) of the items in the layer's first
+    # block, i.e. the way round the layer actually uses.
+    options = {}
+    for height, a, b in ((item_H, item_L, item_W), (item_W, item_L, item_H), (item_L, item_W, item_H)):
+        if height <= 0:
+            continue
+        count, blocks = _layer_plan(int_L, int_W, a, b)
+        if count > 0 and count > options.get(height, (0,))[0]:
+            options[height] = (count, blocks, (blocks[0][0], blocks[0][1], height))
+    return options
+
+# ==================== FIT SEARCH ====================
+def search_fit(int_L, int_W, int_H, item_L, item_W, item_H):
+    # Stacks layers of possibly different orientations up the carton height.
+    # Branch and bound over layer counts, densest layer first, pruned by the
+    # remaining height and by the volume bound of the carton.
+    options = layer_options(int_L, int_W, item_L, item_W, item_H)
+    items = sorted(((height, count) for height, (count, _, _) in options.items()),
+                   key=lambda item: item[1] / item[0], reverse=True)
+    volume_bound = math.floor(int_L * int_W * int_H / (item_L * item_W * item_H)) if item_L * item_W * item_H > 0 else 0
+
+    best = [0, ()]
+
+    def search(i, remaining, current, stack):
+        if best[0] >= volume_bound:
+            return
+        if i == len(items):
+            if current > best[0]:
+                best[0], best[1] = current, stack
+            return
+        height, count = items[i]
+        if current + math.floor(remaining * count / height + 1e-9) <= best[0]:
+            return
+        for n in range(math.floor(remaining / height), -1, -1):
+            search(i + 1, remaining - n * height, current + n * count, stack + ((height, n),) if n else stack)
+
+    search(0, int_H, 0, ())
+
+    layers = []
+    for height, n in best[1]:
+        count, blocks, packed = options[height]
+        layers.append({"packed": packed, "per_layer": count, "layers": n, "blocks": blocks})
+    return {
+        "total_fit": best[0],
+        "layers": layers,
+        "volume_bound": volume_bound,
+    }
@@ -0,0 +1,69 @@
+from . import metrics
+
+_MISSING = object()
+
+class Graph:
+    # Inputs are set with set_inputs(); every other node is computed on demand
+    # from its dependencies and cached until one of the inputs it depends on
+    # changes, so a change only reruns the nodes downstream of it.
+    def __init__(self):
+        self._funcs = {}
+        self._deps = {}
+        self._dependents = {}
+        self._values = {}
+        self.recomputed = 0
+        self.reused = 0
+        if metrics.enabled():
+            metrics.register_cache("graph", lambda graph: (graph.reused, graph.recomputed), owner=self)
+
+    def add_input(self, name, value=_MISSING):
+        self._funcs[name] = None
+        self._deps[name] = ()
+        self._dependents.setdefault(name, [])
+        if value is not _MISSING:
+            self._values[name] = value
+        return self
+
+    def add_node(self, name, deps, func):
+        for dep in deps:
+            if dep not in self._funcs:
+                raise KeyError(f"Unknown dependency {dep!r} for node {name!r}")
+        self._funcs[name] = func
+        self._deps[name] = tuple(deps)
+        self._dependents.setdefault(name, [])
+        for dep in deps:
+            self._dependents[dep].append(name)
+        return self
+
+    def set_inputs(self, **values):
+        for name, value in values.items():
+            if name not in self._funcs or self._funcs[name] is not None:
+                raise KeyError(f"{name!r} is not an input")
+            old = self._values.get(name, _MISSING)
+            if old is not _MISSING and type(old) is type(value) and old == value:
+                continue
+            self._values[name] = value
+            self._invalidate(name)
+        return self
+
+    def _invalidate(self, name):
+        for dependent in self._dependents[name]:
+            if self._values.pop(dependent, _MISSING) is not _MISSING:
+                self._invalidate(dependent)
+
+    def get(self, name):
+        value = self._values.get(name, _MISSING)
+        if value is not _MISSING:
+            if self._funcs[name] is not None:
+                self.reused += 1
+            return value
+        func = self._funcs[name]
+        if func is None:
+            raise KeyError(f"Input {name!r} has not been set")
+        value = func(*(self.get(dep) for dep in self._deps[name]))
+        self.recomputed += 1
+        self._values[name] = value
+        return value
+
+    def get_many(self, *names):
+        return tuple(self.get(name) for name in names)
@@ -0,0 +1,13 @@
+from .metrics import instrument
+from .money import UM_PER_M, calculate_layer_pad_price_sen, sen_to_rm
+from .products import standard_box_formula
+
+@instrument
+def calculate_layer_pad_price(length, width, grammage, costing_tonnage, selling_tonnage, quantity, adjustment_percent):
+    # calculate_layer_pad_price_sen's prices in RM
+    cost_sen, price_sen, total_sen, paper_length_um, effective_width_um, _ = \
+        calculate_layer_pad_price_sen(length, width, grammage, costing_tonnage, selling_tonnage, quantity,
+                                      adjustment_percent)
+    formula = standard_box_formula(paper_length_um / UM_PER_M, effective_width_um / UM_PER_M, grammage,
+                                   selling_tonnage, adjustment_percent)
+    return sen_to_rm(cost_sen), sen_to_rm(price_sen), sen_to_rm(total_sen), formula
@@ -0,0 +1,164 @@
+import csv
+import itertools
+
+import numpy as np
+
+from .calculations import MAX_ROLL_WIDTH, calculate_design_nesting_layer_pad, calculate_nesting
+from .cli import COMMANDS, parse_row
+from .products import PRODUCT_TYPES
+
+# ==================== CONSTANTS ====================
+CHUNK_SIZE = 10000  # order lines expanded and measured per NumPy pass
+# Summed per (grammage, roll width), in this order
+SUM_FIELDS = ("lines", "pieces", "sheets", "roll_metres", "area_m2", "net_area_m2")
+FIELDS = ("grammage", "roll_width_mm") + SUM_FIELDS + ("tonnes",)
+ORDER_ARGUMENTS = [("grammage", float), ("quantity", int)]
+
+# ==================== ORDER LINES ====================
+# An order line is a dict with "product", "quantity" (pieces, or cartons for
+# the nesting products), "grammage" and the product's size arguments as the
+# CLI takes them. Nesting lines expand into the carton, its partitions and
+# layer pads, all in the line's grammage:
+#  - nesting: the carton on its internal size (height including the layer
+#    pads), qty_W + 1 long and qty_L + 1 short partitions (a divider each
+#    side of every row) and layer_qty layer pads
+#  - design-nesting: the carton, two long and two short partitions around
+#    the product and layer_qty layer pads
+ROLL_PRODUCTS = tuple(name for name, product in PRODUCT_TYPES.items() if "roll_width_mm" in dict(product.steps))
+ORDER_PRODUCTS = ROLL_PRODUCTS + ("nesting", "design-nesting")
+
+def _order_arguments(product):
+    if product in ROLL_PRODUCTS:
+        return list(PRODUCT_TYPES[product].arguments) + ORDER_ARGUMENTS
+    return COMMANDS[product][1] + ORDER_ARGUMENTS
+
+def read_orders(f):
+    # Typed order lines from a CSV with a product column and each product's
+    # argument columns (blank where a product doesn't use one)
+    for line, row in enumerate(csv.DictReader(f), 2):
+        product = (row.get("product") or "").strip()
+        if product not in ORDER_PRODUCTS:
+            raise ValueError(f"Line {line}: unknown product {product!r}")
+        order = dict(parse_row(row, _order_arguments(product), line), product=product)
+        if order["quantity"] <= 0:
+            raise ValueError(f"Line {line}: quantity must be positive")
+        yield order
+
+def _carton(int_L, int_W, carton_H, quantity):
+    return ("carton-box", (int_L, int_W, carton_H), quantity)
+
+def _components(order):
+    # [(product type, size arguments, pieces)] of one order line
+    product = order["product"]
+    quantity = order["quantity"]
+    if product in ROLL_PRODUCTS:
+        return [(product, tuple(order[argument] for argument, _ in PRODUCT_TYPES[product].arguments), quantity)]
+    if product not in ("nesting", "design-nesting"):
+        raise ValueError(f"{product!r} is not made from roll stock")
+    args = [order[argument] for argument, _ in COMMANDS[product][1]]
+    pad_height = order["layer_thick"] * order["layer_qty"]
+    if product == "nesting":
+        int_L, int_W, int_H, _, _, _, long_piece, short_piece = calculate_nesting(*args)
+        components = [_carton(int_L, int_W, int_H + pad_height, quantity),
+                      ("nesting-piece", long_piece, quantity * (order["qty_W"] + 1)),
+                      ("nesting-piece", short_piece, quantity * (order["qty_L"] + 1))]
+    else:
+        int_L, int_W, int_H, _, _, _, long_L, long_H, short_L, short_H = calculate_design_nesting_layer_pad(*args)
+        components = [_carton(int_L, int_W, int_H + pad_height, quantity),
+                      ("nesting-piece", (long_L, long_H), quantity * 2),
+                      ("nesting-piece", (short_L, short_H), quantity * 2)]
+    components.append(("layer-pad", (int_L, int_W), quantity * order["layer_qty"]))
+    return [component for component in components if component[2] > 0]
+
+# ==================== MEASURING ====================
+# product type: (kernel giving the raw widths, kernel giving (ups,
+# paper_length_m, roll_width_mm, area_m2)), both from the size arguments
+def _kernels(product):
+    arguments = [argument for argument, _ in product.arguments]
+    return (product.vector(("raw_width",), arguments=arguments),
+            product.vector(("ups", "paper_length_m", "roll_width_mm", "area_m2"), arguments=arguments))
+
+MEASURES = {name: _kernels(PRODUCT_TYPES[name]) for name in ROLL_PRODUCTS}
+
+def _measure(product, numbers, sizes, pieces, grammage):
+    # (grammage, roll width, sums) arrays for one product type's components;
+    # numbers are the 1-based order numbers, for errors
+    sizes = np.array(sizes, dtype=np.float64).reshape(len(pieces), -1)
+    pieces = np.array(pieces, dtype=np.float64)
+    raw_widths, measure = MEASURES[product]
+    raw_width, = raw_widths(*sizes.T)
+    bad = np.flatnonzero(~((raw_width > 0) & (raw_width <= MAX_ROLL_WIDTH)))
+    if len(bad):
+        raise ValueError(f"Order {numbers[bad[0]]}: {product} raw width {raw_width[bad[0]]:g} mm does not fit "
+                         f"the {MAX_ROLL_WIDTH} mm roll")
+    ups, paper_length_m, roll_width, area_m2 = measure(*sizes.T)
+    # Pieces sit ups across the roll, so a sheet (one blank length) yields ups
+    sheets = np.ceil(pieces / ups)
+    roll_metres = sheets * paper_length_m
+    sums = (np.ones(len(pieces)), pieces, sheets, roll_metres, roll_metres * roll_width / 1000, pieces * area_m2)
+    return np.array(grammage, dtype=np.float64), roll_width, sums
+
+def _add_chunk(totals, orders, start):
+    groups = {}
+    for number, order in enumerate(orders, start):
+        # A negative quantity would take paper off the other lines' totals
+        if order["quantity"] <= 0:
+            raise ValueError(f"Order {number}: quantity must be positive, got {order['quantity']}")
+        for product, size, pieces in _components(order):
+            group = groups.setdefault(product, ([], [], [], []))
+            group[0].append(number)
+            group[1].append(size)
+            group[2].append(pieces)
+            group[3].append(order["grammage"])
+    for product, (numbers, sizes, pieces, grammage) in groups.items():
+        grammage, roll_width, sums = _measure(product, numbers, sizes, pieces, grammage)
+        keys, slots = np.unique(np.column_stack((grammage, roll_width)), axis=0, return_inverse=True)
+        slots = slots.ravel()
+        columns = [np.bincount(slots, weights=values, minlength=len(keys)) for values in sums]
+        for (g, width), row in zip(keys.tolist(), zip(*(column.tolist() for column in columns))):
+            total = totals.setdefault((g, int(width)), [0.0] * len(SUM_FIELDS))
+            for i, value in enumerate(row):
+                total[i] += value
+
+def aggregate_materials(orders, chunk_size=CHUNK_SIZE):
+    # Paper needed by an order book (an iterable of order lines), as one dict
+    # per grammage and roll width with the FIELDS keys: component lines,
+    # pieces, sheets cut, roll metres, gross area off the roll (m2), piece
+    # area (m2, trim share included) and tonnes. One pass, holding a chunk of
+    # lines and the running totals.
+    totals = {}
+    orders = iter(orders)
+    start = 1
+    while True:
+        chunk = list(itertools.islice(orders, chunk_size))
+        if not chunk:
+            break
+        _add_chunk(totals, chunk, start)
+        start += len(chunk)
+    rows = []
+    for (grammage, roll_width), sums in sorted(totals.items()):
+        row = {"grammage": grammage, "roll_width_mm": roll_width}
+        row.update(zip(SUM_FIELDS, sums))
+        for field in ("lines", "pieces", "sheets"):
+            row[field] = int(row[field])
+        for field in ("roll_metres", "area_m2", "net_area_m2"):
+            row[field] = round(row[field], 3)
+        # Grammage is in kg/m2
+        row["tonnes"] = round(sums[4] * grammage / 1000, 3)
+        rows.append(row)
+    return rows
+
+def grammage_totals(rows):
+    # aggregate_materials rows summed over roll widths, one per grammage
+    totals = {}
+    for row in rows:
+        total = totals.setdefault(row["grammage"], dict.fromkeys(SUM_FIELDS + ("tonnes",), 0))
+        for field in total:
+            total[field] += row[field]
+    return [dict(grammage=grammage, **{field: round(value, 3) for field, value in total.items()})
+            for grammage, total in sorted(totals.items())]
+
+def write_materials(rows, f):
+    writer = csv.DictWriter(f, FIELDS)
+    writer.writeheader()
+    writer.writerows(rows)
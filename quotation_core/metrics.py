@@ -0,0 +1,310 @@
+import bisect
+import collections
+import functools
+import os
+import sys
+import threading
+import time
+import weakref
+
+# ==================== SETTINGS ====================
+# Instrumentation starts on when QUOTATION_CORE_METRICS is set (not 0) and can
+# be switched with set_enabled(). Counters, page timers and the endpoint
+# follow the current setting. The instrument decorator only wraps functions
+# decorated while it is on, so with metrics off at import the calculators run
+# exactly as before; a wrapped function records only while it is on.
+_enabled = os.environ.get("QUOTATION_CORE_METRICS", "") not in ("", "0")
+DEFAULT_PORT = 9108
+DEFAULT_HOST = "127.0.0.1"
+PROFILE_INTERVAL = 0.01  # seconds between profiler samples
+MAX_STACK = 64
+
+# Latency buckets in seconds, from a table lookup to a slow page render
+BUCKETS = (1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+CALL_SECONDS = "quotation_call_seconds"
+CALL_ERRORS = "quotation_call_errors_total"
+PAGE_SECONDS = "quotation_page_render_seconds"
+CACHE_REQUESTS = "quotation_cache_requests_total"
+CACHE_HIT_RATIO = "quotation_cache_hit_ratio"
+SERVICE_REQUESTS = "quotation_service_requests_total"
+
+# name: (type, help)
+METRICS = {
+    CALL_SECONDS: ("histogram", "Latency of calculate_* calls; _count is the number of calls"),
+    CALL_ERRORS: ("counter", "calculate_* calls that raised, by exception type"),
+    PAGE_SECONDS: ("histogram", "Streamlit page render time (script reruns that finished)"),
+    CACHE_REQUESTS: ("counter", "Cache lookups by result (hit or miss)"),
+    CACHE_HIT_RATIO: ("gauge", "Cache hits / lookups since start"),
+    SERVICE_REQUESTS: ("counter", "Quoting service requests by path and status"),
+}
+
+def enabled():
+    return _enabled
+
+def set_enabled(flag):
+    global _enabled
+    _enabled = bool(flag)
+
+# ==================== REGISTRY ====================
+_lock = threading.Lock()
+_counters = collections.defaultdict(int)  # (name, labels) -> count
+_histograms = {}  # (name, labels) -> [bucket counts..., +Inf count, sum]
+_caches = []  # (cache name, callable returning (hits, misses) or None when gone)
+
+def inc(name, labels=(), amount=1):
+    with _lock:
+        _counters[name, labels] += amount
+
+def observe(name, labels, value):
+    slot = bisect.bisect_left(BUCKETS, value)
+    with _lock:
+        histogram = _histograms.get((name, labels))
+        if histogram is None:
+            histogram = _histograms[name, labels] = [0] * (len(BUCKETS) + 2)
+        histogram[slot] += 1
+        histogram[-1] += value
+
+def register_cache(name, info, owner=None):
+    # info() returns (hits, misses) so far. With owner, info is called with the
+    # owner and the cache drops out once the owner is garbage collected.
+    if owner is not None:
+        ref = weakref.ref(owner)
+        method = info
+
+        def owned_info():
+            target = ref()
+            return None if target is None else method(target)
+        info = owned_info
+    with _lock:
+        _caches.append((name, info))
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+# ==================== INSTRUMENTATION ====================
+def instrument(func):
+    # Records the latency of every call and the type of any exception raised
+    if not _enabled:
+        return func
+    labels = (("function", f"{func.__module__.rpartition('.')[2]}.{func.__name__}"),)
+    clock = time.perf_counter
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return func(*args, **kwargs)
+        start = clock()
+        try:
+            return func(*args, **kwargs)
+        except Exception as exc:
+            inc(CALL_ERRORS, labels + (("error", type(exc).__name__),))
+            raise
+        finally:
+            observe(CALL_SECONDS, labels, clock() - start)
+    return wrapper
+
+class _PageTimer:
+    __slots__ = ("labels", "start")
+
+    def __init__(self, page):
+        self.labels = (("page", page),)
+        self.start = time.perf_counter()
+
+    def stop(self):
+        observe(PAGE_SECONDS, self.labels, time.perf_counter() - self.start)
+
+class _NoTimer:
+    __slots__ = ()
+
+    def stop(self):
+        pass
+
+_NO_TIMER = _NoTimer()
+
+def page_timer(page):
+    # Call stop() on the result at the end of the page's render
+    return _PageTimer(page) if _enabled else _NO_TIMER
+
+# ==================== PROMETHEUS TEXT FORMAT ====================
+def _label_text(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+def _cache_totals():
+    totals = {}
+    with _lock:
+        caches = list(_caches)
+    live = []
+    for name, info in caches:
+        counts = info()
+        if counts is None:
+            continue
+        live.append((name, info))
+        hits, misses = totals.get(name, (0, 0))
+        totals[name] = (hits + counts[0], misses + counts[1])
+    with _lock:
+        _caches[:] = live + _caches[len(caches):]
+    return totals
+
+def render():
+    # All metrics in the Prometheus text exposition format (version 0.0.4)
+    caches = _cache_totals()
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: list(value) for key, value in _histograms.items()}
+    for name, (hits, misses) in caches.items():
+        counters[CACHE_REQUESTS, (("cache", name), ("result", "hit"))] = hits
+        counters[CACHE_REQUESTS, (("cache", name), ("result", "miss"))] = misses
+
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == "counter":
+            lines += [f"{name}{_label_text(labels)} {value}"
+                      for (metric, labels), value in sorted(counters.items()) if metric == name]
+        elif kind == "histogram":
+            for (metric, labels), histogram in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ("+Inf",), histogram):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_label_text(labels + (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{name}_sum{_label_text(labels)} {histogram[-1]!r}")
+                lines.append(f"{name}_count{_label_text(labels)} {cumulative}")
+        elif name == CACHE_HIT_RATIO:
+            lines += [f"{name}{_label_text((('cache', cache),))} {hits / (hits + misses)!r}"
+                      for cache, (hits, misses) in sorted(caches.items()) if hits + misses]
+    return "\n".join(lines) + "\n"
+
+# ==================== SAMPLING PROFILER ====================
+class SamplingProfiler:
+    # Samples the stack of every other thread each interval seconds and counts
+    # identical stacks; collapsed() gives them in the folded format used by
+    # flame graph tools ("outer;inner count" per line).
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self.samples = 0
+        self._stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if not self.running:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="quotation-profiler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        return self
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self._stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        stacks = self._stacks.copy()
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+_profiler = None
+
+def start_profiler(interval=PROFILE_INTERVAL):
+    global _profiler
+    if _profiler is None or not _profiler.running:
+        _profiler = SamplingProfiler(interval).start()
+    return _profiler
+
+def stop_profiler():
+    if _profiler is not None:
+        _profiler.stop()
+    return _profiler
+
+# ==================== ENDPOINT ====================
+# GET /metrics, GET /profile (folded stacks), POST /profile/start and
+# POST /profile/stop. Served by the quoting service and, for the Streamlit
+# app, by start_http_server.
+def handle_request(method, path):
+    # (status, text) for a metrics path, or None when path isn't one
+    path = path.partition("?")[0]
+    if path not in ("/metrics", "/profile", "/profile/start", "/profile/stop"):
+        return None
+    if not _enabled:
+        return 404, "Metrics are off; set QUOTATION_CORE_METRICS=1\n"
+    expected = "GET" if path in ("/metrics", "/profile") else "POST"
+    if method != expected:
+        return 405, f"Use {expected}\n"
+    if path == "/metrics":
+        return 200, render()
+    if path == "/profile/start":
+        start_profiler()
+        return 200, "Profiler started\n"
+    if path == "/profile/stop":
+        stop_profiler()
+        return 200, "Profiler stopped\n"
+    if _profiler is None:
+        return 404, "Profiler has not run; POST /profile/start first\n"
+    return 200, _profiler.collapsed()
+
+def start_http_server(port=None, host=None):
+    # Serves the endpoint from a daemon thread; port defaults to
+    # $QUOTATION_CORE_METRICS_PORT or DEFAULT_PORT, host to
+    # $QUOTATION_CORE_METRICS_HOST or DEFAULT_HOST (loopback only: the
+    # profiler endpoints must not reach other machines unless asked for).
+    # Starts the profiler when QUOTATION_CORE_PROFILE is set.
+    # Imported here: the HTTP stack would double the CLI's start-up time
+    import http.server
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def _respond(self):
+            status, text = handle_request(self.command, self.path) or (404, f"Unknown path {self.path}\n")
+            data = text.encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        do_GET = do_POST = _respond
+
+        def log_message(self, format, *args):
+            pass
+
+    if port is None:
+        port = int(os.environ.get("QUOTATION_CORE_METRICS_PORT") or DEFAULT_PORT)
+    if host is None:
+        host = os.environ.get("QUOTATION_CORE_METRICS_HOST") or DEFAULT_HOST
+    server = http.server.ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="quotation-metrics", daemon=True).start()
+    profile_from_env()
+    return server
+
+def profile_from_env():
+    # Starts the profiler when QUOTATION_CORE_PROFILE is set (with metrics on)
+    if _enabled and os.environ.get("QUOTATION_CORE_PROFILE", "") not in ("", "0"):
+        start_profiler()
@@ -0,0 +1,89 @@
+import math
+
+from .metrics import instrument
+from .products import CARTON_BOX, CARTON_BOX_PAGE, LAYER_PAD_PAGE, PIZZA_BOX, PIZZA_BOX_PAGE, PRODUCT_TYPES
+
+# ==================== ROUNDING POLICY ====================
+# Money is held as integer sen and geometry as integer micrometres (um).
+#  - Geometry is rounded where the calculators round it (box paper length and
+#    effective width to the mm) and otherwise to the nearest um, then is exact.
+#  - Each unit cost or price is computed once in float64 from that geometry and
+#    the entered grammage, tonnage and adjustment, in the calculators' operation
+#    order, and rounded once to the nearest sen, halves up (round_sen).
+#  - A total is the unit price in sen times the quantity, so it is exact.
+#    This is pricing policy: the customer pays the quoted per-piece price on
+#    every piece, so a total can differ from price x quantity at full
+#    precision by up to half a sen per piece. The pages say so (PRICING_NOTE).
+# The calculators below and the *_sen_batch functions in batch.py are
+# compiled from the same product definitions (products.py), so a quote gives
+# the same sen singly, in batch and through the service.
+UM_PER_MM = 1000
+UM_PER_M = 1000000
+UM2_PER_M2 = 1000000000000
+SEN_PER_RM = 100
+PRICING_NOTE = ("Prices are rounded to the sen per piece; the total is the rounded selling price per piece "
+                "x quantity.")
+
+def round_sen(rm):
+    return math.floor(rm * SEN_PER_RM + 0.5)
+
+def mm_to_um(mm):
+    return math.floor(mm * UM_PER_MM + 0.5)
+
+def m_to_um(m):
+    return math.floor(m * UM_PER_M + 0.5)
+
+def format_rm(sen):
+    # 123456 -> "1,234.56"
+    sign = "-" if sen < 0 else ""
+    whole, cents = divmod(abs(int(sen)), SEN_PER_RM)
+    return f"{sign}{whole:,}.{cents:02d}"
+
+def sen_to_rm(sen):
+    return sen / SEN_PER_RM
+
+def unit_prices_sen(area_um2, grammage, costing, selling, adjustment):
+    # (cost_sen, unit_price_sen) of a piece of area_um2
+    area_m2 = area_um2 / UM2_PER_M2
+    return round_sen(area_m2 * grammage * costing), round_sen(area_m2 * grammage * selling * (1 + adjustment / 100))
+
+def prices_sen(area_um2, grammage, costing, selling, quantity, adjustment):
+    # (cost_sen, unit_price_sen, total_sen) of a piece of area_um2
+    cost_sen, unit_price_sen = unit_prices_sen(area_um2, grammage, costing, selling, adjustment)
+    return cost_sen, unit_price_sen, unit_price_sen * int(quantity)
+
+# ==================== GEOMETRY ====================
+# (paper_length_um, effective_width_um, ups) of calculate_standard_box
+standard_box_geometry_um = CARTON_BOX.scalar(
+    ("paper_length_um", "effective_width_um", "ups"), "standard_box_geometry_um", __name__, ("length", "width", "height")
+)
+# (paper_length_um, actual_width_um, ups) of calculate_pizza_box, with
+# roll_width / ups mm taken to the nearest um, halves up
+pizza_box_geometry_um = PIZZA_BOX.scalar(
+    ("paper_length_um", "actual_width_um", "ups"), "pizza_box_geometry_um", __name__, ("length", "width")
+)
+
+def sample_board_area_um2(length, width, ups):
+    return mm_to_um(length) * mm_to_um(width) * int(ups)
+
+# ==================== FIXED-POINT CALCULATIONS ====================
+# Fixed-point versions of the calculators in calculations.py, compiled from
+# the same product definitions. The box-type ones return (cost_sen,
+# unit_price_sen, total_sen, paper_length_um, effective_width_um, ups);
+# sample board returns the three prices. product type name: calculator
+MONEY_CALCULATORS = {
+    name: instrument(product.scalar(product.money_outputs, product.calculator + "_sen", __name__))
+    for name, product in PRODUCT_TYPES.items()
+}
+calculate_standard_box_sen = MONEY_CALCULATORS["carton-box"]
+calculate_pizza_box_sen = MONEY_CALCULATORS["pizza-box"]
+calculate_layer_pad_sen = MONEY_CALCULATORS["layer-pad"]
+calculate_sample_board_sen = MONEY_CALCULATORS["sample-board"]
+calculate_nesting_piece_sen = MONEY_CALCULATORS["nesting-piece"]
+
+# The standalone pages (carton_box.py, pizza_box.py, layer_pad.py) show these
+# in RM, from their own product variants
+calculate_carton_box_price_sen, calculate_pizza_box_price_sen, calculate_layer_pad_price_sen = (
+    instrument(product.scalar(product.money_outputs, product.calculator + "_sen", __name__))
+    for product in (CARTON_BOX_PAGE, PIZZA_BOX_PAGE, LAYER_PAD_PAGE)
+)
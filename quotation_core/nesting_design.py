@@ -0,0 +1,122 @@
+import math
+
+from .fit_search import search_fit
+from .metrics import instrument
+
+def _fit(product_L, product_W, product_H, include_bubble, carton_ext_L, carton_ext_W, carton_ext_H, search_orientation):
+    # (carton internal size, packed size the nesting is designed around,
+    # (fit_L, fit_W, fit_H), total fit, [(packed size, units per layer,
+    # layer count)]) of the product in the carton
+    # Adjust product dimensions with bubble wrap
+    adj_L = product_L + 10 if include_bubble else product_L
+    adj_W = product_W + 10 if include_bubble else product_W
+    adj_H = product_H + 10 if include_bubble else product_H
+
+    # Keep original orientation
+    packed_L = adj_L
+    packed_W = adj_W
+    packed_H = adj_H
+
+    # Convert carton external to internal dimensions
+    carton_int_L = carton_ext_L - 10
+    carton_int_W = carton_ext_W - 10
+    carton_int_H = carton_ext_H - 20
+
+    # Calculate how many units fit
+    fit_L = math.floor(carton_int_L / packed_L)
+    fit_W = math.floor(carton_int_W / packed_W)
+    fit_H = math.floor(carton_int_H / packed_H)
+    total_fit = fit_L * fit_W * fit_H
+
+    # Layer groups: (packed size, units per layer, layer count)
+    layers = [((packed_L, packed_W, packed_H), fit_L * fit_W, fit_H)] if fit_H > 0 else []
+
+    # Optionally try all orientations and mixed layers; the long nesting is
+    # then designed around the orientation used by most layers, one slot per
+    # layer, each slot as high as its own layer
+    if search_orientation:
+        search = search_fit(carton_int_L, carton_int_W, carton_int_H, adj_L, adj_W, adj_H)
+        if search["total_fit"] > total_fit:
+            layers = [(layer["packed"], layer["per_layer"], layer["layers"]) for layer in search["layers"]]
+            packed_L, packed_W, packed_H = max(layers, key=lambda layer: layer[2])[0]
+            fit_L = math.floor(carton_int_L / packed_L)
+            fit_W = math.floor(carton_int_W / packed_W)
+            fit_H = sum(count for _, _, count in layers)
+            total_fit = search["total_fit"]
+
+    return ((carton_int_L, carton_int_W, carton_int_H), (packed_L, packed_W, packed_H), (fit_L, fit_W, fit_H),
+            total_fit, layers)
+
+def _spare_each(carton_int_H, layers, fit_H, nesting_thickness):
+    # The height left over after the layers and the fit_H + 1 pads is shared
+    # equally between the layers
+    return (carton_int_H - sum(packed[2] * count for packed, _, count in layers) -
+            (fit_H + 1) * nesting_thickness) / fit_H
+
+@instrument
+def calculate_nesting_design(product_L, product_W, product_H, include_bubble, nesting_thickness, allowance, qty_per_box, carton_ext_L, carton_ext_W, carton_ext_H, product_weight, search_orientation=False):
+    (carton_int_L, carton_int_W, carton_int_H), (packed_L, packed_W, packed_H), (fit_L, fit_W, fit_H), total_fit, \
+        layers = _fit(product_L, product_W, product_H, include_bubble, carton_ext_L, carton_ext_W, carton_ext_H,
+                      search_orientation)
+
+    # Nesting Long Calculation
+    balance_L = (carton_int_L - packed_L - 2 * nesting_thickness) / 2
+    nesting_long_length = balance_L + nesting_thickness + packed_L + nesting_thickness + balance_L
+
+    if fit_H > 0:
+        if len(layers) == 1:
+            nesting_each_height = (carton_int_H - (fit_H + 1) * nesting_thickness) / fit_H
+        else:
+            nesting_each_height = packed_H + _spare_each(carton_int_H, layers, fit_H, nesting_thickness)
+        nesting_long_width = nesting_each_height
+        layer_pad_quantity = fit_H + 1
+    else:
+        nesting_long_width = packed_H
+        nesting_each_height = 0
+        layer_pad_quantity = 2
+
+    long_formula = f"{balance_L:.1f} + {nesting_thickness} + {packed_L} + {nesting_thickness} + {balance_L:.1f} = {nesting_long_length:.1f}"
+
+    # Nesting Short Calculation
+    nesting_short_length = carton_int_W
+    nesting_short_width = nesting_long_width
+    short_formula = f"Same width as long nesting: {nesting_short_width:.1f}"
+
+    # Layer pad size
+    layer_pad_length = carton_int_L
+    layer_pad_width = carton_int_W
+
+    total_carton_weight = total_fit * product_weight
+
+    return (
+        round(nesting_long_length, 2),
+        round(nesting_long_width, 2),
+        round(nesting_short_length, 2),
+        round(nesting_short_width, 2),
+        round(layer_pad_length, 2),
+        round(layer_pad_width, 2),
+        round(nesting_each_height, 2),
+        layer_pad_quantity,
+        fit_L, fit_W, fit_H, total_fit,
+        carton_int_L, carton_int_W, carton_int_H,
+        long_formula, short_formula,
+        round(total_carton_weight, 2)
+    )
+
+@instrument
+def nesting_layer_plan(product_L, product_W, product_H, include_bubble, nesting_thickness, carton_ext_L, carton_ext_W, carton_ext_H, search_orientation=False):
+    # The layers calculate_nesting_design packs for the same arguments, bottom
+    # up: dicts with the packed size, units per layer, layer count and the
+    # nesting height of each of those layers (mm)
+    (_, _, carton_int_H), _, (_, _, fit_H), _, layers = _fit(
+        product_L, product_W, product_H, include_bubble, carton_ext_L, carton_ext_W, carton_ext_H, search_orientation
+    )
+    if not layers:
+        return []
+    spare_each = _spare_each(carton_int_H, layers, fit_H, nesting_thickness)
+    return [{
+        "packed": packed,
+        "per_layer": per_layer,
+        "layers": count,
+        "nesting_height": round(packed[2] + spare_each, 2),
+    } for packed, per_layer, count in layers]
@@ -0,0 +1,26 @@
+from .metrics import instrument
+
+@instrument
+def calculate_nesting_fitting(product_L, product_W, product_H, include_bubble, thickness, allowance,
+                              qty_L, qty_W, qty_H, layer_thick, layer_qty):
+    adj_L = product_L + 10 if include_bubble else product_L
+    adj_W = product_W + 10 if include_bubble else product_W
+    adj_H = product_H + 10 if include_bubble else product_H
+
+    int_L = allowance + thickness + ((adj_L + thickness) * qty_L) + allowance
+    int_W = allowance + thickness + ((adj_W + thickness) * qty_W) + allowance
+    int_H = adj_H
+
+    ext_L = int_L + 10
+    ext_W = int_W + 10
+    ext_H = int_H + 20 + (layer_thick * layer_qty)
+
+    nesting_long = (int_L, int_H)
+    nesting_short = (int_W, int_H)
+
+    return {
+        "Internal Size": (int_L, int_W, int_H),
+        "External Size": (ext_L, ext_W, ext_H),
+        "Nesting Long": nesting_long,
+        "Nesting Short": nesting_short
+    }
@@ -0,0 +1,137 @@
+import bisect
+import functools
+import math
+
+from . import metrics
+
+# ==================== CONSTANTS ====================
+# Default sample board size (mm), as in sample_board_logic.py
+BOARD_LENGTH = 1050
+BOARD_WIDTH = 750
+# Above this many raster sub-rectangles (small pieces on a big board) the exact
+# guillotine search is too slow for a live quote and the two-block layout is used
+MAX_RASTER_STATES = 2500
+
+# ==================== RASTER POINTS ====================
+def _raster_points(size, a, b):
+    # Every i*a + j*b <= size: a guillotine packing of identical pieces can be
+    # normalised so all its cuts fall on these positions
+    points = set()
+    for i in range(math.floor(size / a) + 1):
+        base = i * a
+        for j in range(math.floor((size - base) / b) + 1):
+            points.add(base + j * b)
+    return sorted(points)
+
+# ==================== TWO-BLOCK PACKING ====================
+def _grid(left, bottom, length, width, cols, rows):
+    return [(left + i * length, bottom + j * width, length, width) for i in range(cols) for j in range(rows)]
+
+def _two_block(piece_L, piece_W, board_L, board_W):
+    # One guillotine cut splits the board into two blocks of opposite
+    # orientation; with small pieces this is within a row of the optimum
+    best = (0, [])
+    for p, q in ((piece_L, piece_W), (piece_W, piece_L)):
+        cols = math.floor(board_L / p + 1e-9)
+        rows = math.floor(board_W / q + 1e-9)
+        for k in range(cols + 1):
+            rest_cols = math.floor((board_L - k * p) / q + 1e-9)
+            rest_rows = math.floor(board_W / p + 1e-9)
+            if k * rows + rest_cols * rest_rows > best[0]:
+                best = (k * rows + rest_cols * rest_rows,
+                        _grid(0, 0, p, q, k, rows) + _grid(k * p, 0, q, p, rest_cols, rest_rows))
+        for k in range(rows + 1):
+            rest_rows = math.floor((board_W - k * q) / p + 1e-9)
+            rest_cols = math.floor(board_L / q + 1e-9)
+            if k * cols + rest_cols * rest_rows > best[0]:
+                best = (k * cols + rest_cols * rest_rows,
+                        _grid(0, 0, p, q, cols, k) + _grid(0, k * q, q, p, rest_cols, rest_rows))
+    return best[0], tuple(best[1])
+
+# ==================== GUILLOTINE PACKING ====================
+@functools.lru_cache(maxsize=4096)
+def _pack(piece_L, piece_W, board_L, board_W):
+    xs = _raster_points(board_L, piece_L, piece_W)
+    ys = _raster_points(board_W, piece_L, piece_W)
+    if len(xs) * len(ys) > MAX_RASTER_STATES:
+        return _two_block(piece_L, piece_W, board_L, board_W)
+    piece_area = piece_L * piece_W
+    best = {}
+    choice = {}
+
+    def floor_point(points, value):
+        return points[bisect.bisect_right(points, value + 1e-9) - 1]
+
+    # Bottom-up over sub-rectangles x by y on the raster; each is filled by a
+    # single block in one orientation, or split by one vertical or horizontal
+    # cut into two sub-rectangles solved earlier.
+    for x in xs:
+        for y in ys:
+            upright = math.floor(x / piece_L + 1e-9) * math.floor(y / piece_W + 1e-9)
+            turned = math.floor(x / piece_W + 1e-9) * math.floor(y / piece_L + 1e-9)
+            if upright >= turned:
+                value, how = upright, ("block", piece_L, piece_W)
+            else:
+                value, how = turned, ("block", piece_W, piece_L)
+            bound = math.floor(x * y / piece_area + 1e-9)
+            if value < bound:
+                for cut in xs:
+                    if cut > x / 2 or value >= bound:
+                        break
+                    if cut == 0:
+                        continue
+                    total = best[cut, y] + best[floor_point(xs, x - cut), y]
+                    if total > value:
+                        value, how = total, ("x", cut)
+                for cut in ys:
+                    if cut > y / 2 or value >= bound:
+                        break
+                    if cut == 0:
+                        continue
+                    total = best[x, cut] + best[x, floor_point(ys, y - cut)]
+                    if total > value:
+                        value, how = total, ("y", cut)
+            best[x, y] = value
+            choice[x, y] = how
+
+    def layout(x, y, left, bottom, placements):
+        how = choice[x, y]
+        if how[0] == "block":
+            _, length, width = how
+            for i in range(math.floor(x / length + 1e-9)):
+                for j in range(math.floor(y / width + 1e-9)):
+                    placements.append((left + i * length, bottom + j * width, length, width))
+        elif how[0] == "x":
+            cut = how[1]
+            layout(cut, y, left, bottom, placements)
+            layout(floor_point(xs, x - cut), y, left + cut, bottom, placements)
+        else:
+            cut = how[1]
+            layout(x, cut, left, bottom, placements)
+            layout(x, floor_point(ys, y - cut), left, bottom + cut, placements)
+        return placements
+
+    x, y = xs[-1], ys[-1]
+    return best[x, y], tuple(layout(x, y, 0, 0, []))
+
+def pack_board(piece_L, piece_W, board_L=BOARD_LENGTH, board_W=BOARD_WIDTH):
+    # Most piece_L x piece_W pieces (rotation allowed) cut from one board with
+    # guillotine cuts, with the layout as (x, y, length, width) placements.
+    # Layouts are cached per (piece, board), so repeated quotes are a lookup.
+    if piece_L <= 0 or piece_W <= 0:
+        raise ValueError("Piece dimensions must be positive")
+    ups, placements = _pack(max(piece_L, piece_W), min(piece_L, piece_W), board_L, board_W)
+    used_area = ups * piece_L * piece_W
+    return {
+        "ups": ups,
+        "layout": placements,
+        "board_size": (board_L, board_W),
+        "waste_percent": (1 - used_area / (board_L * board_W)) * 100,
+    }
+
+metrics.register_cache("pack_layout", lambda: _pack.cache_info()[:2])
+
+def boards_needed(quantity, ups):
+    if ups <= 0:
+        raise ValueError("Piece does not fit on the board")
+    return math.ceil(quantity / ups)
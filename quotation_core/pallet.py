@@ -0,0 +1,165 @@
+import functools
+import math
+
+from . import metrics
+from .packing import _grid, pack_board
+
+# ==================== CONSTANTS ====================
+# Standard pallets, (length, width) in mm
+PALLETS = {
+    "1200x1000": (1200, 1000),  # ISO / industrial
+    "1100x1100": (1100, 1100),  # ISO / Asia
+    "1200x800": (1200, 800),  # EUR
+    "1219x1016": (1219, 1016),  # US 48 x 40 in
+}
+DEFAULT_PALLET = "1200x1000"
+MAX_LOAD_HEIGHT = 1500  # mm of cartons above the pallet deck
+MAX_LOAD_WEIGHT = 1000  # kg of cartons per pallet
+# Above this many pinwheel block combinations (small cartons on a big pallet)
+# the guillotine layers are as good in practice and the search is skipped
+MAX_PINWHEEL_STATES = 50000
+# Tie-break between patterns with the same count: simplest first
+PATTERNS = ("block", "guillotine", "pinwheel")
+
+# ==================== LAYER PATTERNS ====================
+def _block(a, b, pallet_L, pallet_W):
+    # Every carton the same way round
+    best = (0, ())
+    for p, q in ((a, b), (b, a)):
+        cols, rows = math.floor(pallet_L / p + 1e-9), math.floor(pallet_W / q + 1e-9)
+        if cols * rows > best[0]:
+            best = (cols * rows, tuple(_grid(0, 0, p, q, cols, rows)))
+    return best
+
+def _pinwheel(a, b, pallet_L, pallet_W, bound):
+    # Four blocks turning around the centre: 1 bottom left and 3 top right
+    # with a along the length, 2 bottom right and 4 top left turned. Counts
+    # are columns n and rows m; blocks that share a side must not cross it
+    # and the diagonal pairs (1-3, 2-4) must not overlap.
+    cols_a, rows_b = math.floor(pallet_L / a + 1e-9), math.floor(pallet_W / b + 1e-9)
+    if ((cols_a + 1) * (rows_b + 1)) ** 2 > MAX_PINWHEEL_STATES:
+        return 0, ()
+
+    def fits(size, space):
+        return math.floor(space / size + 1e-9) if space > 0 else 0
+
+    def search():
+        best = (0, None)
+        for n1 in range(cols_a + 1):
+            for m1 in range(rows_b + 1 if n1 else 1):
+                n2, m4 = fits(b, pallet_L - n1 * a), fits(a, pallet_W - m1 * b)
+                for n3 in range(cols_a + 1):
+                    for m3 in range(rows_b + 1 if n3 else 1):
+                        if (n1 + n3) * a > pallet_L + 1e-9 and (m1 + m3) * b > pallet_W + 1e-9:
+                            continue
+                        m2, n4 = fits(a, pallet_W - m3 * b), fits(b, pallet_L - n3 * a)
+                        candidates = [(n2, m2, n4, m4)]
+                        if (n2 + n4) * b > pallet_L + 1e-9 and (m2 + m4) * a > pallet_W + 1e-9:
+                            # Blocks 2 and 4 overlap: shrink one of them
+                            candidates = [(n2, m2, fits(b, pallet_L - n2 * b), m4),
+                                          (n2, m2, n4, fits(a, pallet_W - m2 * a)),
+                                          (fits(b, pallet_L - n4 * b), m2, n4, m4),
+                                          (n2, fits(a, pallet_W - m4 * a), n4, m4)]
+                        for c2, r2, c4, r4 in candidates:
+                            total = n1 * m1 + c2 * r2 + n3 * m3 + c4 * r4
+                            if total > best[0]:
+                                best = (total, (n1, m1, c2, r2, n3, m3, c4, r4))
+                                if total >= bound:
+                                    return best
+        return best
+
+    count, counts = search()
+    if not count:
+        return 0, ()
+    n1, m1, n2, m2, n3, m3, n4, m4 = counts
+    placements = (_grid(0, 0, a, b, n1, m1) + _grid(pallet_L - n2 * b, 0, b, a, n2, m2) +
+                  _grid(pallet_L - n3 * a, pallet_W - m3 * b, a, b, n3, m3) + _grid(0, pallet_W - m4 * a, b, a, n4, m4))
+    return count, tuple(placements)
+
+@functools.lru_cache(maxsize=4096)
+def _layer_pattern(a, b, pallet_L, pallet_W):
+    # (pattern, cartons, placements) of the fullest layer of a x b cartons
+    bound = math.floor(pallet_L * pallet_W / (a * b) + 1e-9)
+    count, placements = _block(a, b, pallet_L, pallet_W)
+    best = ("block", count, placements)
+    if count < bound:
+        packed = pack_board(a, b, pallet_L, pallet_W)
+        if packed["ups"] > best[1]:
+            best = ("guillotine", packed["ups"], packed["layout"])
+    if best[1] < bound:
+        for p, q in ((a, b), (b, a)):
+            count, placements = _pinwheel(p, q, pallet_L, pallet_W, bound)
+            if count > best[1]:
+                best = ("pinwheel", count, placements)
+    return best
+
+metrics.register_cache("pallet_pattern", lambda: _layer_pattern.cache_info()[:2])
+
+def layer_pattern(carton_L, carton_W, pallet_L, pallet_W):
+    # Fullest layer of carton_L x carton_W footprints on the pallet from the
+    # block, guillotine (two or more blocks, mixed orientation) and pinwheel
+    # patterns, no overhang. Cached per footprint and pallet.
+    if carton_L <= 0 or carton_W <= 0:
+        raise ValueError("Carton dimensions must be positive")
+    pattern, count, placements = _layer_pattern(max(carton_L, carton_W), min(carton_L, carton_W), pallet_L, pallet_W)
+    return {"pattern": pattern, "per_layer": count, "layout": placements}
+
+# ==================== PALLET LOADS ====================
+def _load(carton, carton_weight, pallet, max_height, max_weight):
+    length, width, height = carton
+    pallet_L, pallet_W = PALLETS[pallet] if isinstance(pallet, str) else pallet
+    layer = layer_pattern(length, width, pallet_L, pallet_W)
+    per_layer = layer["per_layer"]
+    cartons = per_layer * math.floor(max_height / height + 1e-9)
+    limited_by = "height"
+    if carton_weight > 0 and cartons * carton_weight > max_weight:
+        cartons = math.floor(max_weight / carton_weight + 1e-9)
+        limited_by = "weight"
+    layers = math.ceil(cartons / per_layer) if per_layer else 0
+    return {
+        "pallet": pallet if isinstance(pallet, str) else f"{pallet_L}x{pallet_W}",
+        "pallet_size": (pallet_L, pallet_W),
+        "carton_size": (length, width, height),
+        "pattern": layer["pattern"],
+        "per_layer": per_layer,
+        "layers": layers,
+        "cartons": cartons,
+        "limited_by": limited_by,
+        "load_height": layers * height,
+        "load_weight": cartons * carton_weight,
+        "area_utilisation_percent": per_layer * length * width / (pallet_L * pallet_W) * 100,
+        "volume_utilisation_percent": cartons * length * width * height / (pallet_L * pallet_W * max_height) * 100,
+        "layout": layer["layout"],
+    }
+
+def plan_pallet(carton_L, carton_W, carton_H, carton_weight=0, pallet=DEFAULT_PALLET, max_height=MAX_LOAD_HEIGHT,
+                max_weight=MAX_LOAD_WEIGHT, upright=True):
+    # Most cartons (external size in mm, gross weight in kg) on one pallet
+    # under the height and weight limits. pallet is a PALLETS name, a
+    # (length, width) or None to try every standard pallet. Cartons stand
+    # upright unless upright is False, when any face may be the base. The
+    # top layer is partial when the weight limit ends the load.
+    if carton_H <= 0:
+        raise ValueError("Carton dimensions must be positive")
+    if pallet is not None and isinstance(pallet, str) and pallet not in PALLETS:
+        raise ValueError(f"Unknown pallet {pallet!r}; use one of {', '.join(PALLETS)}")
+    pallets = list(PALLETS) if pallet is None else [pallet]
+    cartons = [(carton_L, carton_W, carton_H)]
+    if not upright:
+        cartons += [(carton_L, carton_H, carton_W), (carton_W, carton_H, carton_L)]
+    best = None
+    for candidate in pallets:
+        for carton in cartons:
+            if carton[2] > max_height:
+                continue
+            load = _load(carton, carton_weight, candidate, max_height, max_weight)
+            key = (load["cartons"], load["volume_utilisation_percent"], -PATTERNS.index(load["pattern"]))
+            if best is None or key > best[0]:
+                best = (key, load)
+    if best is None:
+        raise ValueError(f"Carton is taller than the {max_height} mm load height")
+    if not best[1]["per_layer"]:
+        raise ValueError("Carton does not fit on the pallet")
+    if not best[1]["cartons"]:
+        raise ValueError(f"Carton is heavier than the {max_weight} kg load weight")
+    return best[1]
@@ -0,0 +1,20 @@
+from .metrics import instrument
+from .money import UM_PER_M, calculate_pizza_box_price_sen, sen_to_rm
+from .products import standard_box_formula
+
+@instrument
+def calculate_pizza_box_price(length, width, grammage, costing_tonnage, selling_tonnage, quantity, adjustment_percent):
+    # calculate_pizza_box_price_sen's prices in RM
+    cost_sen, unit_price_sen, total_sen, paper_length_um, paper_width_um, ups = \
+        calculate_pizza_box_price_sen(length, width, grammage, costing_tonnage, selling_tonnage, quantity,
+                                      adjustment_percent)
+    paper_length_m, paper_width_m = paper_length_um / UM_PER_M, paper_width_um / UM_PER_M
+    return (
+        sen_to_rm(cost_sen),
+        sen_to_rm(unit_price_sen),
+        sen_to_rm(total_sen),
+        paper_length_m,
+        paper_width_m,
+        ups,
+        standard_box_formula(paper_length_m, paper_width_m, grammage, selling_tonnage, adjustment_percent)
+    )
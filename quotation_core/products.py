@@ -0,0 +1,414 @@
+import ast
+import keyword
+import linecache
+import math
+
+from .roll_fit import MAX_ROLL_WIDTH, roll_fit
+
+# ==================== CONSTANTS ====================
+TRIM_ALLOWANCE = 28
+# Names an expression may use besides the product's arguments and steps
+CONSTANTS = {"TRIM_ALLOWANCE": TRIM_ALLOWANCE, "MAX_ROLL_WIDTH": MAX_ROLL_WIDTH}
+PRICING_ARGUMENTS = (("grammage", float), ("costing", float), ("selling", float), ("quantity", int),
+                     ("adjustment", float))
+
+def standard_box_formula(total_paper_length_m, effective_width_per_piece_m, grammage, selling, adjustment):
+    return f"{total_paper_length_m} x {effective_width_per_piece_m} x {grammage} x {selling} x (1 + {adjustment / 100:.2f})"
+
+# ==================== EXPRESSIONS ====================
+# A product is a list of named steps, each one arithmetic expression over the
+# arguments, constants and earlier steps, in the calculators' operation order.
+# Allowed: numbers, + - * / // %, unary minus, one comparison, "a if test
+# else b" and the functions below.
+#
+# function: (argument count, result kind, scalar code, vector code). A kind of
+# None means the kind of the first argument, "join" float unless all are int.
+# {roll} is the (ups, rounded roll width) fit shared by every call with the
+# same raw width and trim.
+FUNCTIONS = {
+    "round": (2, None, "round({0}, {1})", "_round({0}, {1})"),
+    "floor": (1, "int", "_floor({0})", "np.floor({0})"),
+    "ceil": (1, "int", "_ceil({0})", "np.ceil({0})"),
+    "int": (1, "int", "int({0})", "_int({0})"),
+    "min": (2, "join", "min({0}, {1})", "np.minimum({0}, {1})"),
+    "max": (2, "join", "max({0}, {1})", "np.maximum({0}, {1})"),
+    # Rounding policy of money.py: nearest sen / um, halves up
+    "round_sen": (1, "int", "_floor({0} * 100 + 0.5)", "_round_sen({0})"),
+    "mm_to_um": (1, "int", "_floor({0} * 1000 + 0.5)", "np.floor({0} * 1000 + 0.5)"),
+    "m_to_um": (1, "int", "_floor({0} * 1000000 + 0.5)", "np.floor({0} * 1000000 + 0.5)"),
+    # Roll fit of a raw width (mm) with a trim allowance, as roll_fit.py
+    "roll_ups": (2, "int", "{roll}[0]", "{roll}[0]"),
+    "roll_width": (2, "int", "{roll}[1]", "{roll}[1]"),
+    "roll_piece_width_m": (2, "float", "{roll}[2]", "_round({roll}[1] / {roll}[0] / 1000, 3)"),
+    "formula_text": (5, "str", "_formula({0}, {1}, {2}, {3}, {4})", None),
+}
+ROLL_FUNCTIONS = ("roll_ups", "roll_width", "roll_piece_width_m")
+OPERATORS = {ast.Add: "+", ast.Sub: "-", ast.Mult: "*", ast.Div: "/", ast.FloorDiv: "//", ast.Mod: "%"}
+COMPARISONS = {ast.Lt: "<", ast.LtE: "<=", ast.Gt: ">", ast.GtE: ">=", ast.Eq: "==", ast.NotEq: "!="}
+
+def _join(kinds):
+    return "int" if all(kind == "int" for kind in kinds) else "float"
+
+class _Emitter:
+    # Turns one step's expression into code for one kernel mode, noting the
+    # names it reads and the roll fits it needs
+    def __init__(self, product, step, vector, kinds, rolls):
+        self.product = product
+        self.step = step
+        self.vector = vector
+        self.kinds = kinds
+        self.rolls = rolls
+        self.names = set()
+        self.fits = []
+
+    def error(self, message):
+        return ValueError(f"{self.product} step {self.step!r}: {message}")
+
+    def emit(self, node):
+        # (code, kind)
+        if isinstance(node, ast.Constant):
+            if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+                raise self.error(f"unsupported constant {node.value!r}")
+            return repr(node.value), "int" if isinstance(node.value, int) else "float"
+        if isinstance(node, ast.Name):
+            if node.id in CONSTANTS:
+                value = CONSTANTS[node.id]
+                return repr(value), "int" if isinstance(value, int) else "float"
+            if node.id not in self.kinds:
+                raise self.error(f"unknown name {node.id!r}")
+            self.names.add(node.id)
+            return node.id, self.kinds[node.id]
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            code, kind = self.emit(node.operand)
+            return f"({'-' if isinstance(node.op, ast.USub) else '+'}{code})", kind
+        if isinstance(node, ast.BinOp) and type(node.op) in OPERATORS:
+            (left, left_kind), (right, right_kind) = self.emit(node.left), self.emit(node.right)
+            kind = "float" if isinstance(node.op, ast.Div) else _join((left_kind, right_kind))
+            return f"({left} {OPERATORS[type(node.op)]} {right})", kind
+        if isinstance(node, ast.Compare) and len(node.ops) == 1 and type(node.ops[0]) in COMPARISONS:
+            left, _ = self.emit(node.left)
+            right, _ = self.emit(node.comparators[0])
+            return f"({left} {COMPARISONS[type(node.ops[0])]} {right})", "bool"
+        if isinstance(node, ast.IfExp):
+            test, _ = self.emit(node.test)
+            (body, body_kind), (orelse, orelse_kind) = self.emit(node.body), self.emit(node.orelse)
+            if self.vector:
+                return f"np.where({test}, {body}, {orelse})", _join((body_kind, orelse_kind))
+            return f"({body} if {test} else {orelse})", _join((body_kind, orelse_kind))
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS:
+            return self.emit_call(node.func.id, node)
+        raise self.error(f"unsupported expression {ast.unparse(node)!r}")
+
+    def emit_call(self, name, node):
+        count, kind, scalar_code, vector_code = FUNCTIONS[name]
+        if node.keywords or len(node.args) != count:
+            raise self.error(f"{name}() takes {count} positional argument(s)")
+        code = vector_code if self.vector else scalar_code
+        if code is None:
+            raise self.error(f"{name}() has no vector form")
+        if name == "round" and not (isinstance(node.args[1], ast.Constant) and type(node.args[1].value) is int):
+            raise self.error("round() needs a whole number of digits")
+        args = [self.emit(arg) for arg in node.args]
+        roll = None
+        if name in ROLL_FUNCTIONS:
+            key = tuple(code for code, _ in args)
+            roll = self.rolls.setdefault(key, f"_roll{len(self.rolls)}")
+            self.fits.append((key, roll))
+        return code.format(*(code for code, _ in args), roll=roll), kind or args[0][1]
+
+# ==================== PRODUCT TYPES ====================
+# Shared by every product: the float prices of calculations.py and the sen
+# prices of money.py, from the product's area_m2 and area_um2 steps
+PRICING_STEPS = (
+    ("cost", "area_m2 * grammage * costing"),
+    ("unit_price", "area_m2 * grammage * selling * (1 + adjustment / 100)"),
+    ("total", "unit_price * quantity"),
+    ("cost_sen", "round_sen(area_um2 / 1000000000000 * grammage * costing)"),
+    ("unit_price_sen", "round_sen(area_um2 / 1000000000000 * grammage * selling * (1 + adjustment / 100))"),
+    ("total_sen", "unit_price_sen * int(quantity)"),
+)
+
+class ProductType:
+    # A priced product defined by its blank size and area expressions.
+    #  arguments: [(name, type)] before the pricing arguments
+    #  steps: [(name, expression)], ending with area_m2 and area_um2
+    #  outputs, batch_outputs, money_outputs: what the calculator, its NumPy
+    #    version and its fixed-point versions return
+    #  geometry: (length_m, width_m, ups) step names the quote store keeps
+    # scalar() and vector() compile kernels for any list of steps.
+    def __init__(self, name, description, calculator, arguments, steps, outputs, batch_outputs, money_outputs,
+                 geometry):
+        self.name = name
+        self.description = description
+        self.calculator = calculator
+        self.arguments = tuple(arguments)
+        self.steps = tuple(steps)
+        self.outputs = tuple(outputs)
+        self.batch_outputs = tuple(batch_outputs)
+        self.money_outputs = tuple(money_outputs)
+        self.geometry = tuple(geometry)
+        self._kernels = {}
+        self._check()
+
+    def __repr__(self):
+        return f"ProductType({self.name!r})"
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def argument_names(self):
+        # Kernel arguments, in calculator order
+        return tuple(name for name, _ in self.arguments + PRICING_ARGUMENTS)
+
+    def variant(self, name, description, calculator, **steps):
+        # The same product with some step expressions replaced
+        unknown = set(steps) - {step for step, _ in self.steps}
+        if unknown:
+            raise ValueError(f"{self.name} has no step(s) {', '.join(sorted(unknown))}")
+        return ProductType(name, description, calculator, self.arguments,
+                           [(step, steps.get(step, expression)) for step, expression in self.steps],
+                           self.outputs, self.batch_outputs, self.money_outputs, self.geometry)
+
+    def _check(self):
+        names = set(self.argument_names)
+        for step, expression in self.steps + PRICING_STEPS:
+            if not step.isidentifier() or keyword.iskeyword(step) or step.startswith("_") or \
+                    step in names or step in CONSTANTS or step in FUNCTIONS:
+                raise ValueError(f"{self.name}: bad or repeated step name {step!r}")
+            names.add(step)
+        missing = {"area_m2", "area_um2"} - names
+        if missing:
+            raise ValueError(f"{self.name}: missing step(s) {', '.join(sorted(missing))}")
+        for output in self.outputs + self.batch_outputs + self.money_outputs + self.geometry:
+            if output not in names:
+                raise ValueError(f"{self.name}: unknown output {output!r}")
+        # The expressions themselves are checked when a kernel is first called
+        self._names = names
+
+    def _source(self, outputs, name, vector, arguments):
+        # Python source of a kernel computing outputs, with only the steps they need
+        kinds = {argument: "int" if kind is int else "float" for argument, kind in self.arguments + PRICING_ARGUMENTS}
+        rolls = {}
+        emitted = {}
+        for step, expression in self.steps + PRICING_STEPS:
+            emitter = _Emitter(self.name, step, vector, kinds, rolls)
+            try:
+                tree = ast.parse(expression, mode="eval")
+            except SyntaxError as exc:
+                raise emitter.error(f"syntax error in {expression!r}") from exc
+            try:
+                code, kinds[step] = emitter.emit(tree.body)
+            except ValueError as exc:
+                # Only an error if an output needs this step (formula text in
+                # a vector kernel); scalar kernels check every step
+                if not vector:
+                    raise
+                code, kinds[step] = exc, "float"
+            if step in arguments:
+                # Passed in (another kernel's output) rather than recomputed
+                continue
+            emitted[step] = (code, emitter.names, emitter.fits)
+
+        unknown = [output for output in outputs if output not in kinds]
+        if unknown:
+            raise ValueError(f"{self.name}: unknown output(s) {', '.join(unknown)}")
+        needed = set()
+        pending = [output for output in outputs if output in emitted]
+        while pending:
+            step = pending.pop()
+            if step not in needed:
+                needed.add(step)
+                pending += [name for name in emitted[step][1] if name in emitted]
+        used = set(outputs).union(*(emitted[step][1] for step in needed)) - set(emitted)
+        missing = used - set(arguments)
+        if missing:
+            raise ValueError(f"{self.name}: {name} needs argument(s) {', '.join(sorted(missing))}")
+
+        lines = [f"def {name}({', '.join(arguments)}):"]
+        if vector:
+            # Whole-number arguments given as integers stay int64, so sen
+            # totals are exact past 2 ** 53 as in the scalar kernels
+            lines += [f"    {argument} = {'_as_whole_array' if kinds[argument] == 'int' else '_as_array'}({argument})"
+                      for argument in arguments if argument in used]
+        fitted = set()
+        for step, _ in self.steps + PRICING_STEPS:
+            if step not in needed:
+                continue
+            code, _, fits = emitted[step]
+            if isinstance(code, ValueError):
+                raise code
+            for (raw_width, trim), roll in fits:
+                if roll not in fitted:
+                    fitted.add(roll)
+                    lines.append(f"    {roll} = {'_roll_fit' if vector else 'roll_fit'}({raw_width}, {trim})")
+            lines.append(f"    {step} = {code}")
+        if vector:
+            results = [f"np.asarray({output}, dtype=np.int64)" if kinds[output] == "int" else output
+                       for output in outputs]
+        else:
+            results = list(outputs)
+        lines.append(f"    return ({', '.join(results)}{',' if len(results) == 1 else ''})")
+        return "\n".join(lines) + "\n"
+
+    def _compile(self, outputs, name, module, arguments, vector):
+        # The kernel is a stub until its first call, which generates and
+        # compiles the real code and swaps it into the stub, so importing the
+        # package compiles nothing and later calls run the real code directly
+        outputs = tuple(outputs)
+        arguments = self.argument_names if arguments is None else tuple(arguments)
+        name = name or f"{self.name.replace('-', '_')}_{'vector' if vector else 'scalar'}"
+        key = (outputs, name, module, arguments, vector)
+        kernel = self._kernels.get(key)
+        if kernel is not None:
+            return kernel
+        unknown = [output for output in outputs if output not in self._names]
+        if unknown:
+            raise ValueError(f"{self.name}: unknown output(s) {', '.join(unknown)}")
+        namespace = {"roll_fit": roll_fit, "_floor": math.floor, "_ceil": math.ceil, "_formula": standard_box_formula}
+
+        def load():
+            source = self._source(outputs, name, vector, arguments)
+            filename = f"<{self.name} {name}>"
+            if vector:
+                # Imported here so the scalar calculators don't need NumPy
+                import numpy as np
+                from .batch import _as_array, _as_whole_array, _int, _roll_fit, _round, _round_sen
+                namespace.update(np=np, _as_array=_as_array, _as_whole_array=_as_whole_array, _int=_int,
+                                 _roll_fit=_roll_fit, _round=_round, _round_sen=_round_sen)
+            exec(compile(source, filename, "exec"), namespace)
+            # Keep the source for tracebacks and inspect.getsource
+            linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+            kernel.__code__ = namespace[name].__code__
+            return kernel
+
+        namespace["_load"] = load
+        exec(f"def {name}({', '.join(arguments)}):\n    return _load()({', '.join(arguments)})\n", namespace)
+        kernel = namespace[name]
+        if module:
+            kernel.__module__ = module
+        self._kernels[key] = kernel
+        return kernel
+
+    def check(self):
+        # Raises ValueError for a step expression the calculators can't use;
+        # kernels only generate their code (and find such errors) on first call
+        self._source(self.outputs, self.calculator, False, self.argument_names)
+        self._source(self.batch_outputs + self.money_outputs, self.calculator, True, self.argument_names)
+
+    def scalar(self, outputs, name=None, module=None, arguments=None):
+        # Function of argument_names (or arguments) returning the tuple of
+        # outputs as the Python calculators compute them. arguments may name
+        # steps, which are then taken as given. name and module make it
+        # importable (for pickling) under that name.
+        return self._compile(outputs, name, module, arguments, False)
+
+    def vector(self, outputs, name=None, module=None, arguments=None):
+        # Array-in/array-out version of scalar(): arguments may be scalars or
+        # arrays, broadcast together, and integer outputs come back as int64.
+        # Gives the same values as scalar() element by element.
+        return self._compile(outputs, name, module, arguments, True)
+
+# Geometry steps of a box blank: paper length, roll fit of the raw width and
+# the areas the float and sen prices use
+BOX_STEPS = (
+    ("paper_length_m", "round(((length + width) * 2 + 30) / 1000, 3)"),
+    ("raw_width", "width + height + 4"),
+    ("trim", "TRIM_ALLOWANCE"),
+    ("ups", "roll_ups(raw_width, trim)"),
+    ("roll_width_mm", "roll_width(raw_width, trim)"),
+    ("effective_width_m", "roll_piece_width_m(raw_width, trim)"),
+    ("area_m2", "paper_length_m * effective_width_m"),
+    ("paper_length_um", "m_to_um(paper_length_m)"),
+    ("effective_width_um", "m_to_um(effective_width_m)"),
+    ("area_um2", "paper_length_um * effective_width_um"),
+    ("formula", "formula_text(paper_length_m, effective_width_m, grammage, selling, adjustment)"),
+)
+BOX_OUTPUTS = ("cost", "unit_price", "total", "formula")
+BOX_BATCH_OUTPUTS = ("cost", "unit_price", "total", "paper_length_m", "effective_width_m", "ups")
+BOX_MONEY_OUTPUTS = ("cost_sen", "unit_price_sen", "total_sen", "paper_length_um", "effective_width_um", "ups")
+BOX_GEOMETRY = ("paper_length_m", "effective_width_m", "ups")
+
+CARTON_BOX = ProductType(
+    "carton-box", "RSC carton, priced on its blank", "calculate_standard_box",
+    [("length", float), ("width", float), ("height", float)], BOX_STEPS,
+    BOX_OUTPUTS, BOX_BATCH_OUTPUTS, BOX_MONEY_OUTPUTS, BOX_GEOMETRY,
+)
+
+PIZZA_BOX = ProductType(
+    "pizza-box", "Pizza box, 20 mm added to each side", "calculate_pizza_box",
+    [("length", float), ("width", float)],
+    [
+        ("paper_length_m", "(length + 20) / 1000"),
+        ("raw_width", "width + 20"),
+        ("trim", "TRIM_ALLOWANCE"),
+        ("ups", "roll_ups(raw_width, trim)"),
+        ("roll_width_mm", "roll_width(raw_width, trim)"),
+        ("actual_width_m", "roll_width(raw_width, trim) / ups / 1000"),
+        ("area_m2", "paper_length_m * actual_width_m"),
+        ("paper_length_um", "mm_to_um(length + 20)"),
+        # roll width / ups mm to the nearest um, halves up
+        ("actual_width_um", "(2000 * roll_width(raw_width, trim) + ups) // (2 * ups)"),
+        ("area_um2", "paper_length_um * actual_width_um"),
+        ("formula", "formula_text(paper_length_m, actual_width_m, grammage, selling, adjustment)"),
+    ],
+    ("cost", "unit_price", "total", "paper_length_m", "actual_width_m", "ups"),
+    ("cost", "unit_price", "total", "paper_length_m", "actual_width_m", "ups"),
+    ("cost_sen", "unit_price_sen", "total_sen", "paper_length_um", "actual_width_um", "ups"),
+    ("paper_length_m", "actual_width_m", "ups"),
+)
+
+LAYER_PAD = ProductType(
+    "layer-pad", "Layer pad, priced as a box blank with no height", "calculate_layer_pad",
+    [("length", float), ("width", float)],
+    [(step, "width + 4" if step == "raw_width" else expression) for step, expression in BOX_STEPS],
+    BOX_OUTPUTS, BOX_BATCH_OUTPUTS, BOX_MONEY_OUTPUTS, BOX_GEOMETRY,
+)
+
+NESTING_PIECE = ProductType(
+    "nesting-piece", "Nesting divider strip (length x height), cut across the roll like a layer pad",
+    "calculate_nesting_piece",
+    [("length", float), ("height", float)],
+    [(step, {"paper_length_m": "round(length / 1000, 3)", "raw_width": "height + 4"}.get(step, expression))
+     for step, expression in BOX_STEPS],
+    BOX_OUTPUTS, BOX_BATCH_OUTPUTS, BOX_MONEY_OUTPUTS, BOX_GEOMETRY,
+)
+
+SAMPLE_BOARD = ProductType(
+    "sample-board", "Sample board, ups pieces per board", "calculate_sample_board",
+    [("length", float), ("width", float), ("ups", int)],
+    [
+        ("length_m", "length / 1000"),
+        ("width_m", "width / 1000"),
+        ("area_m2", "length * width * ups / 1000000"),
+        ("area_um2", "mm_to_um(length) * mm_to_um(width) * int(ups)"),
+    ],
+    ("cost", "unit_price", "total"),
+    ("cost", "unit_price", "total"),
+    ("cost_sen", "unit_price_sen", "total_sen"),
+    ("length_m", "width_m", "ups"),
+)
+
+# name: product type, in command order. A product added here gets a
+# calculator, CLI command, service endpoint, export and quote storage.
+PRODUCT_TYPES = {product.name: product for product in (CARTON_BOX, PIZZA_BOX, LAYER_PAD, SAMPLE_BOARD, NESTING_PIECE)}
+
+# ==================== PAGE VARIANTS ====================
+# The standalone pages' own rules (carton_box.py, pizza_box.py, layer_pad.py)
+CARTON_BOX_PAGE = CARTON_BOX.variant(
+    "carton-box-page", "RSC carton with the trim graded by grammage", "calculate_carton_box_price",
+    trim="28 if grammage > 0.77 else 25",
+)
+PIZZA_BOX_PAGE = PIZZA_BOX.variant(
+    "pizza-box-page", "Pizza box with the blank rounded to the mm", "calculate_pizza_box_price",
+    paper_length_m="round((length + 20) / 1000, 3)",
+    actual_width_m="roll_piece_width_m(raw_width, trim)",
+    # Sen prices from the same rounded blank
+    paper_length_um="m_to_um(paper_length_m)",
+    actual_width_um="m_to_um(actual_width_m)",
+)
+LAYER_PAD_PAGE = LAYER_PAD.variant(
+    "layer-pad-page", "Layer pad priced on its own length and width", "calculate_layer_pad_price",
+    paper_length_m="round(length / 1000, 3)",
+    effective_width_m="round(width / 1000, 3)",
+)
@@ -0,0 +1,39 @@
+import csv
+
+import numpy as np
+
+from .batch import prices_sen_batch
+from .store import REPRICE_CHUNK
+from .store import REPRICE_FIELDS as REPORT_FIELDS
+
+# ==================== TONNAGE TABLE ====================
+def read_tonnage_table(path):
+    # CSV with grammage, costing and selling columns (tonnage per grammage)
+    with open(path, newline="") as f:
+        return {float(row["grammage"]): (float(row["costing"]), float(row["selling"])) for row in csv.DictReader(f)}
+
+# ==================== REPRICING ====================
+def _price(area_m2, area_um2, grammage, costing, selling, adjustment):
+    # Prices of a chunk of specs from their stored areas, as one NumPy pass in
+    # the calculators' operation order, so the prices (sen included) are
+    # exactly what a fresh quote would give
+    area_m2 = np.array(area_m2, dtype=np.float64)
+    grammage = np.array(grammage, dtype=np.float64)
+    costing = np.array(costing, dtype=np.float64)
+    selling = np.array(selling, dtype=np.float64)
+    adjustment = np.array(adjustment, dtype=np.float64)
+    cost = area_m2 * grammage * costing
+    unit_price = area_m2 * grammage * selling * (1 + adjustment / 100)
+    cost_sen, unit_price_sen, _ = prices_sen_batch(np.array(area_um2, dtype=np.int64), grammage, costing, selling,
+                                                   np.ones(len(area_m2)), adjustment)
+    return cost.tolist(), unit_price.tolist(), cost_sen.tolist(), unit_price_sen.tolist()
+
+def reprice_quotes(store, tonnage, chunk_size=REPRICE_CHUNK, report=None, dry_run=False):
+    # Applies tonnage ({grammage: (costing, selling)}) to every recorded quote
+    # whose grammage is in the table, as a new repricing of the store
+    # (QuoteStore.reprice). One diff row per changed quote is written to
+    # report (a text file) when given.
+    writer = csv.writer(report) if report is not None else None
+    if writer:
+        writer.writerow(REPORT_FIELDS)
+    return store.reprice(tonnage, _price, chunk_size, writer.writerows if writer else None, dry_run)
@@ -0,0 +1,275 @@
+import collections
+import contextlib
+import csv
+import itertools
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .calculations import MAX_ROLL_WIDTH
+from .cli import parse_row
+from .products import PRICING_ARGUMENTS, PRODUCT_TYPES
+
+# ==================== CONSTANTS ====================
+CHUNK_SIZE = 10000  # RFQ lines parsed and priced per worker task
+FORMATS = ("csv", "parquet")
+QUOTE_FIELDS = ("cost", "unit_price", "total", "cost_sen", "unit_price_sen", "total_sen")
+# Appended to the input columns of every output row; a bad line has no
+# prices and says why in error
+RESULT_FIELDS = ("line",) + QUOTE_FIELDS + ("error",)
+# Largest price (RM) whose sen fit the int64 sen columns
+MAX_PRICE = np.iinfo(np.int64).max / 100 / 2
+# Whole-number columns are priced as int64
+MAX_INT = 2 ** 63
+# Every size and pricing column must be above 0, adjustment above -100%
+LOWER_BOUNDS = {"adjustment": -100}
+
+# ==================== PRICING ====================
+# An RFQ line has a product column (a product type name), the product's size
+# columns and the pricing columns; other columns pass through. Each product
+# type is priced by the NumPy twin of its calculate_* function, which gives
+# the same values. product type: (arguments, lower bounds, raw roll width
+# kernel or None, quote kernel)
+def _kernels(product):
+    arguments = list(product.arguments + PRICING_ARGUMENTS)
+    bounds = [LOWER_BOUNDS.get(argument, 0) for argument, _ in arguments]
+    raw_width = product.vector(("raw_width",)) if "raw_width" in dict(product.steps) else None
+    return arguments, bounds, raw_width, product.vector(QUOTE_FIELDS)
+
+KERNELS = {name: _kernels(product) for name, product in PRODUCT_TYPES.items()}
+
+def _parse_line(row, line):
+    # (product, typed arguments) of one line; ValueError says what is wrong
+    product = (row.get("product") or "").strip()
+    if product not in KERNELS:
+        raise ValueError(f"Line {line}: unknown product {product!r}")
+    arguments, bounds, _, _ = KERNELS[product]
+    spec = parse_row(row, arguments, line)
+    for (argument, kind), bound in zip(arguments, bounds):
+        value = spec[argument]
+        try:
+            finite = math.isfinite(value)
+        except OverflowError:  # a whole number too big for a float
+            finite = None
+        if finite is None or (kind is int and not -MAX_INT <= value < MAX_INT):
+            raise ValueError(f"Line {line}: {argument} is too large")
+        if not finite:
+            raise ValueError(f"Line {line}: {argument} must be a finite number")
+        if value <= bound:
+            raise ValueError(f"Line {line}: {argument} must be " + (f"above {bound:g}" if bound else "positive"))
+    return product, [spec[argument] for argument, _ in arguments]
+
+def _error(line, message):
+    return (line,) + (None,) * len(QUOTE_FIELDS) + (message,)
+
+def _convert(values, kind):
+    # (array, mask of the values that converted) of one text column, int64
+    # for whole numbers so sen totals stay exact and float64 otherwise;
+    # NumPy converts a clean column at once, otherwise value by value. Whole
+    # numbers too big for int64 or a float don't convert.
+    dtype = np.int64 if kind is int else np.float64
+    try:
+        return np.array(values).astype(dtype), np.ones(len(values), dtype=bool)
+    except (ValueError, OverflowError):
+        pass
+    converted = np.zeros(len(values), dtype=dtype)
+    ok = np.ones(len(values), dtype=bool)
+    for j, value in enumerate(values):
+        try:
+            converted[j] = kind(value)
+        except (ValueError, OverflowError):
+            ok[j] = False
+    return converted, ok
+
+def _parse_group(columns, rows, indexes, product, start, results):
+    # (indexes, argument arrays) of the good lines of one product type; the
+    # others get the error _parse_line gives them
+    arguments, bounds, _, _ = KERNELS[product]
+    positions = {column: i for i, column in enumerate(columns)}
+    indexes = np.array(indexes, dtype=np.intp)
+    args = []
+    ok = np.ones(len(indexes), dtype=bool)
+    for n, (argument, kind) in enumerate(arguments):
+        if argument not in positions:
+            values, ok = np.zeros(len(indexes)), np.zeros(len(indexes), dtype=bool)
+        else:
+            column = positions[argument]
+            values, converted = _convert([rows[i][column] for i in indexes.tolist()], kind)
+            ok &= converted & np.isfinite(values) & ~(values <= bounds[n])
+        args.append(values)
+    for i in indexes[~ok].tolist():
+        try:
+            _parse_line(dict(zip(columns, rows[i])), start + i)
+        except ValueError as exc:
+            results[i] = _error(start + i, str(exc))
+        else:
+            results[i] = _error(start + i, f"Line {start + i}: bad {product} line")
+    return indexes[ok], [arg[ok] for arg in args]
+
+def quote_chunk(columns, start, rows):
+    # RESULT_FIELDS tuples for rows (lists of text values in columns order)
+    # read from line start on, priced one NumPy pass per product type; a bad
+    # line gets its error instead of prices.
+    results = [None] * len(rows)
+    groups = collections.defaultdict(list)
+    product_column = columns.index("product")
+    for i, values in enumerate(rows):
+        product = values[product_column].strip()
+        if product in KERNELS:
+            groups[product].append(i)
+        else:
+            results[i] = _error(start + i, f"Line {start + i}: unknown product {product!r}")
+    for product, indexes in groups.items():
+        _, _, raw_width, quote = KERNELS[product]
+        indexes, args = _parse_group(columns, rows, indexes, product, start, results)
+        if raw_width and len(indexes):
+            # The kernels don't raise on a zero-UPS width the way roll_fit does
+            widths, = raw_width(*args)
+            bad = ~((widths > 0) & (widths <= MAX_ROLL_WIDTH))
+            for i, width in zip(indexes[bad].tolist(), widths[bad].tolist()):
+                results[i] = _error(start + i, f"Line {start + i}: raw width {width:g} mm does not fit "
+                                               f"the {MAX_ROLL_WIDTH} mm roll")
+            if bad.any():
+                indexes = indexes[~bad]
+                args = [arg[~bad] for arg in args]
+        if not len(indexes):
+            continue
+        # Sizes too big for the sen columns (inf or past int64) price to junk
+        with np.errstate(over="ignore", invalid="ignore"):
+            prices = [np.broadcast_to(value, indexes.shape) for value in quote(*args)]
+        bad = ~np.logical_and.reduce([np.isfinite(value) & (np.abs(value) < MAX_PRICE) for value in prices[:3]])
+        for i in indexes[bad].tolist():
+            results[i] = _error(start + i, f"Line {start + i}: price is too large")
+        if bad.any():
+            indexes = indexes[~bad]
+            prices = [value[~bad] for value in prices]
+        prices = zip(*(value.tolist() for value in prices))
+        for i, row in zip(indexes.tolist(), prices):
+            results[i] = (start + i,) + row + (None,)
+    return results
+
+# ==================== INPUT ====================
+def _parquet():
+    # pyarrow is only needed for Parquet files
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ValueError("Parquet files need pyarrow (pip install pyarrow)") from None
+    return pyarrow, pyarrow.parquet
+
+def _format(path, fmt):
+    fmt = fmt or os.path.splitext(os.fspath(path))[1].lstrip(".").lower()
+    fmt = {"pq": "parquet"}.get(fmt, fmt)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown RFQ format {fmt!r} (expected one of {', '.join(FORMATS)})")
+    return fmt
+
+def _text(value):
+    # Parquet values as the text parse_row takes; whole floats (an integer
+    # column with gaps, as pandas writes it) are written as integers
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def _read(stack, path, fmt, chunk_size):
+    # (columns, input schema or None, chunks of (original rows, text rows))
+    if fmt == "csv":
+        reader = csv.reader(stack.enter_context(open(path, newline="")))
+        columns = next(reader, [])
+
+        def chunks():
+            while True:
+                rows = list(itertools.islice(reader, chunk_size))
+                if not rows:
+                    return
+                rows = [row + [""] * (len(columns) - len(row)) if len(row) < len(columns) else row[:len(columns)]
+                        for row in rows]
+                yield rows, rows
+        return columns, None, chunks()
+
+    _, parquet = _parquet()
+    source = parquet.ParquetFile(path)
+    columns = source.schema_arrow.names
+
+    def chunks():
+        for batch in source.iter_batches(batch_size=chunk_size):
+            rows = list(zip(*(column.to_pylist() for column in batch.columns)))
+            yield rows, [[_text(value) for value in row] for row in rows]
+    return columns, source.schema_arrow, chunks()
+
+# ==================== OUTPUT ====================
+def _csv_writer(stack, path, columns, schema):
+    writer = csv.writer(stack.enter_context(open(path, "w", newline="")))
+    writer.writerow(columns)
+    return writer.writerows
+
+def _parquet_writer(stack, path, columns, schema):
+    pyarrow, parquet = _parquet()
+    fields = [schema.field(column) if schema is not None else pyarrow.field(column, pyarrow.string())
+              for column in columns[:-len(RESULT_FIELDS)]]
+    fields += [pyarrow.field("line", pyarrow.int64())]
+    fields += [pyarrow.field(field, pyarrow.float64()) for field in QUOTE_FIELDS[:3]]
+    fields += [pyarrow.field(field, pyarrow.int64()) for field in QUOTE_FIELDS[3:]]
+    fields += [pyarrow.field("error", pyarrow.string())]
+    schema = pyarrow.schema(fields)
+    writer = parquet.ParquetWriter(path, schema)
+    stack.callback(writer.close)
+
+    def write(rows):
+        writer.write_table(pyarrow.Table.from_arrays(
+            [pyarrow.array(values, type=field.type) for values, field in zip(zip(*rows), schema)], schema=schema))
+    return write
+
+WRITERS = {"csv": _csv_writer, "parquet": _parquet_writer}
+
+# ==================== PIPELINE ====================
+def quote_file(source, target, source_format=None, target_format=None, chunk_size=CHUNK_SIZE, workers=None):
+    # Prices every line of an RFQ file (CSV or Parquet, by format or the
+    # extension) into target: the input columns, then RESULT_FIELDS. Lines
+    # are read, priced and written a chunk at a time in file order, with up
+    # to two chunks per worker process in flight, so memory stays bounded
+    # whatever the file size. Bad lines are written with their error and the
+    # run carries on. Returns {"rows", "quoted", "errors"}.
+    source_format, target_format = _format(source, source_format), _format(target, target_format)
+    workers = workers or os.cpu_count() or 1
+    summary = {"rows": 0, "quoted": 0, "errors": 0}
+    with contextlib.ExitStack() as stack:
+        columns, schema, chunks = _read(stack, source, source_format, chunk_size)
+        if "product" not in columns:
+            raise ValueError("RFQ file has no product column")
+        kept = [i for i, column in enumerate(columns) if column not in RESULT_FIELDS]
+        write = WRITERS[target_format](stack, target, [columns[i] for i in kept] + list(RESULT_FIELDS), schema)
+
+        def emit(rows, results):
+            if len(kept) == len(columns):
+                write([(*row, *result) for row, result in zip(rows, results)])
+            else:
+                write([tuple(row[i] for i in kept) + result for row, result in zip(rows, results)])
+            errors = sum(result[-1] is not None for result in results)
+            summary["rows"] += len(results)
+            summary["errors"] += errors
+            summary["quoted"] += len(results) - errors
+
+        start = 2 if source_format == "csv" else 1  # file line, or row number
+        if workers == 1:
+            for rows, text in chunks:
+                emit(rows, quote_chunk(columns, start, text))
+                start += len(rows)
+            return summary
+        executor = stack.enter_context(ProcessPoolExecutor(max_workers=workers))
+        pending = collections.deque()
+        for rows, text in chunks:
+            pending.append((rows, executor.submit(quote_chunk, columns, start, text)))
+            start += len(rows)
+            if len(pending) >= 2 * workers:
+                rows, future = pending.popleft()
+                emit(rows, future.result())
+        while pending:
+            rows, future = pending.popleft()
+            emit(rows, future.result())
+    return summary
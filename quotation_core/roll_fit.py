@@ -0,0 +1,152 @@
+import math
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+from . import metrics
+
+# ==================== CONSTANTS ====================
+MAX_ROLL_WIDTH = 2200
+# Trim allowances used by the calculators (carton_box: 25 up to 0.77 grammage, else 28)
+TRIM_ALLOWANCES = (25, 28)
+ROLL_WIDTH_STEP = 50
+
+TABLE_MAGIC = b"RFIT"
+TABLE_VERSION = 1
+TABLE_FILENAME = f"roll_fit_{MAX_ROLL_WIDTH}_v{TABLE_VERSION}.bin"
+
+# ==================== DIRECT CALCULATION ====================
+def compute_roll_fit(raw_width, trim_allowance):
+    # The roll-fitting step of calculate_standard_box / calculate_pizza_box
+    if raw_width <= 0:
+        raise ValueError(f"Raw width must be positive, got {raw_width} mm")
+    pieces_per_roll = math.floor(MAX_ROLL_WIDTH / raw_width)
+    if pieces_per_roll == 0:
+        raise ValueError(f"Raw width {raw_width} mm is wider than the {MAX_ROLL_WIDTH} mm roll (zero UPS)")
+    total_used_width = raw_width * pieces_per_roll
+    rounded_roll_width = math.ceil((total_used_width + trim_allowance) / ROLL_WIDTH_STEP) * ROLL_WIDTH_STEP
+    effective_width_per_piece_m = round(rounded_roll_width / pieces_per_roll / 1000, 3)
+    return pieces_per_roll, rounded_roll_width, effective_width_per_piece_m
+
+# ==================== TABLE ====================
+# One row per integer raw width 1..MAX_ROLL_WIDTH and trim allowance, stored as
+# unsigned 16-bit columns: UPS, rounded roll width (mm) and effective width per
+# piece in whole mm (the calculators round it to 3 dp in metres, i.e. to the mm).
+def build_table():
+    table = {}
+    for trim_allowance in TRIM_ALLOWANCES:
+        ups = array("H", [0])
+        roll_widths = array("H", [0])
+        effective_mm = array("H", [0])
+        for raw_width in range(1, MAX_ROLL_WIDTH + 1):
+            pieces, rounded, effective_m = compute_roll_fit(raw_width, trim_allowance)
+            ups.append(pieces)
+            roll_widths.append(rounded)
+            effective_mm.append(round(effective_m * 1000))
+        table[trim_allowance] = (ups, roll_widths, effective_mm)
+    return table
+
+def _header():
+    return struct.pack("<4sHHH", TABLE_MAGIC, TABLE_VERSION, MAX_ROLL_WIDTH, len(TRIM_ALLOWANCES)) + \
+        struct.pack(f"<{len(TRIM_ALLOWANCES)}H", *TRIM_ALLOWANCES)
+
+def default_cache_dir():
+    # $QUOTATION_CORE_CACHE, else quotation_core under $XDG_CACHE_HOME (when
+    # absolute, as the XDG spec asks) or ~/.cache
+    cache_dir = os.environ.get("QUOTATION_CORE_CACHE")
+    if cache_dir:
+        return cache_dir
+    base = os.environ.get("XDG_CACHE_HOME", "")
+    if not os.path.isabs(base):
+        base = os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "quotation_core")
+
+def default_table_path():
+    return os.path.join(default_cache_dir(), TABLE_FILENAME)
+
+def save_table(table, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_header())
+            for trim_allowance in TRIM_ALLOWANCES:
+                for column in table[trim_allowance]:
+                    if sys.byteorder == "big":
+                        column = array("H", column)
+                        column.byteswap()
+                    column.tofile(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def read_table(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    header = _header()
+    rows = MAX_ROLL_WIDTH + 1
+    if not data.startswith(header) or len(data) != len(header) + len(TRIM_ALLOWANCES) * 3 * rows * 2:
+        return None
+    table = {}
+    offset = len(header)
+    for trim_allowance in TRIM_ALLOWANCES:
+        columns = []
+        for _ in range(3):
+            column = array("H")
+            column.frombytes(data[offset:offset + rows * 2])
+            if sys.byteorder == "big":
+                column.byteswap()
+            columns.append(column)
+            offset += rows * 2
+        table[trim_allowance] = tuple(columns)
+    return table
+
+_TABLE = None
+
+def load_table(path=None):
+    # Read the persisted table, or build it once and try to persist it. The
+    # first roll_fit call loads it; where the cache can't be written (a
+    # read-only home, no home at all) the built table is just kept in memory.
+    global _TABLE
+    if _TABLE is not None and path is None:
+        return _TABLE
+    path = path or default_table_path()
+    table = None
+    try:
+        table = read_table(path)
+    except OSError:
+        pass
+    if table is None:
+        table = build_table()
+        try:
+            save_table(table, path)
+        except OSError:
+            pass
+    _TABLE = table
+    return table
+
+# ==================== LOOKUP ====================
+# [table lookups, direct calculations], counted only with metrics on
+_lookups = [0, 0]
+metrics.register_cache("roll_fit_table", lambda: tuple(_lookups))
+
+def roll_fit(raw_width, trim_allowance):
+    # Returns (pieces_per_roll, rounded_roll_width, effective_width_per_piece_m).
+    # Integer widths with a tabulated trim are an index lookup; anything else
+    # (fractional widths, other trims) is computed directly.
+    if raw_width > MAX_ROLL_WIDTH:
+        raise ValueError(f"Raw width {raw_width} mm is wider than the {MAX_ROLL_WIDTH} mm roll (zero UPS)")
+    table = _TABLE or load_table()
+    columns = table.get(trim_allowance)
+    if columns is None or raw_width < 1 or raw_width != int(raw_width):
+        if metrics.enabled():
+            _lookups[1] += 1
+        return compute_roll_fit(raw_width, trim_allowance)
+    if metrics.enabled():
+        _lookups[0] += 1
+    index = int(raw_width)
+    ups, roll_widths, effective_mm = columns
+    return ups[index], roll_widths[index], effective_mm[index] / 1000
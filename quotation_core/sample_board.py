@@ -0,0 +1,13 @@
+from .metrics import instrument
+from .money import prices_sen, sample_board_area_um2, sen_to_rm
+from .packing import BOARD_LENGTH, BOARD_WIDTH, boards_needed as count_boards, pack_board
+
+@instrument
+def calculate_sample_board(L, W, UPS, G, C, S, Q, A, board_L=BOARD_LENGTH, board_W=BOARD_WIDTH):
+    # Priced per piece (UPS 1) under the sen rounding policy in money.py
+    cost_sen, price_sen, total_sen = prices_sen(sample_board_area_um2(L, W, 1), G, C, S, Q, A)
+    # Pieces that physically fit on the board, rotations included
+    packing = pack_board(L, W, board_L, board_W)
+    ups_per_board = packing["ups"]
+    boards_needed = count_boards(Q, ups_per_board)
+    return sen_to_rm(cost_sen), sen_to_rm(price_sen), sen_to_rm(total_sen), ups_per_board, boards_needed, packing["waste_percent"]
@@ -0,0 +1,49 @@
+from .graph import Graph
+from .products import PRICING_ARGUMENTS, PRODUCT_TYPES
+
+# ==================== SCREEN GRAPHS ====================
+# Dependency graphs behind the quotation screens in carton_quotation_app.py,
+# compiled from the product definitions (products.py), so they give exactly
+# what the calculators give. A product's calculator is split where screen
+# changes reach it:
+#  geometry: the blank, roll fit and areas, from the size inputs
+#  piece: the calculator outputs of one piece (float and sen prices,
+#    formula), from the geometry, grammage, tonnage and adjustment
+#  unit_sen and money: (cost_sen, unit_price_sen) and the displayed
+#    (cost_sen, unit_price_sen, total_sen)
+# so a quantity change only redoes the total and a tonnage change keeps the
+# roll fit.
+PRICING_INPUTS = tuple(name for name, _ in PRICING_ARGUMENTS)
+PIECE_INPUTS = ("grammage", "costing", "selling", "adjustment")
+
+def build_product_graph(command):
+    product = PRODUCT_TYPES[command]
+    sizes = tuple(name for name, _ in product.arguments)
+    geometry = tuple(dict.fromkeys(product.geometry + ("area_m2", "area_um2")))
+    piece = tuple(name for name in product.outputs if name != "total") + ("cost_sen", "unit_price_sen")
+    geometry_kernel = product.scalar(geometry, "screen_geometry", arguments=sizes)
+    piece_kernel = product.scalar(piece, "screen_piece", arguments=geometry + PIECE_INPUTS)
+
+    graph = Graph()
+    for name in sizes + PRICING_INPUTS:
+        graph.add_input(name)
+    graph.add_node("geometry", sizes, geometry_kernel)
+    graph.add_node("piece", ("geometry",) + PIECE_INPUTS,
+                   lambda values, *pricing: dict(zip(piece, piece_kernel(*values, *pricing))))
+    graph.add_node("unit_sen", ("piece",), lambda outputs: (outputs["cost_sen"], outputs["unit_price_sen"]))
+    graph.add_node("money", ("unit_sen", "quantity"), lambda unit, quantity: unit + (unit[1] * int(quantity),))
+    return graph
+
+def piece_outputs(graph):
+    # The calculator outputs of one piece without the totals, plus the unit
+    # sen prices: what QuoteStore.quote stores for a new spec
+    return dict(graph.get("piece"))
+
+def build_function_graph(func, arg_names):
+    # Whole-function node for screens with no cheap partial recompute (nesting):
+    # the result is still cached until one of its inputs changes.
+    graph = Graph()
+    for name in arg_names:
+        graph.add_input(name)
+    graph.add_node("result", arg_names, func)
+    return graph
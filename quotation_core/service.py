@@ -0,0 +1,310 @@
+import asyncio
+import json
+import math
+
+import numpy as np
+
+from .batch import BATCH_CALCULATORS, MONEY_BATCH_CALCULATORS
+from .calculations import MAX_ROLL_WIDTH, calculate_design_nesting_layer_pad, calculate_nesting
+from . import metrics
+from .cli import COMMANDS, MONEY_OUTPUTS
+from .products import PRICING_ARGUMENTS, PRODUCT_TYPES
+
+# ==================== CONSTANTS ====================
+MAX_BATCH = 512
+MAX_DELAY = 0.002  # seconds a batch waits for more requests
+MAX_BODY = 64 * 1024
+MAX_INT = 2 ** 63  # whole-number fields are priced as int64
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 422: "Unprocessable Entity", 500: "Internal Server Error"}
+
+class QuoteError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+# ==================== REQUEST PARSING ====================
+def _finite(value):
+    # json.loads takes NaN and Infinity, and ints too big for a float
+    try:
+        return math.isfinite(value)
+    except OverflowError:
+        return False
+
+def parse_quote(command, payload):
+    # Validates a JSON object against the calculator arguments used by the CLI
+    if not isinstance(payload, dict):
+        raise QuoteError(400, "Request body must be a JSON object")
+    _, arguments, _ = COMMANDS[command]
+    values = {}
+    for argument, kind in arguments:
+        if argument not in payload:
+            if kind is bool:
+                values[argument] = False
+                continue
+            raise QuoteError(400, f"Missing field {argument!r}")
+        value = payload[argument]
+        if kind is bool:
+            if not isinstance(value, bool):
+                raise QuoteError(400, f"Field {argument!r} must be true or false")
+        elif isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise QuoteError(400, f"Field {argument!r} must be a number")
+        elif not _finite(value):
+            raise QuoteError(400, f"Field {argument!r} must be a finite number")
+        elif kind is int and value != int(value):
+            raise QuoteError(400, f"Field {argument!r} must be a whole number")
+        elif kind is int and not -MAX_INT <= value < MAX_INT:
+            raise QuoteError(400, f"Field {argument!r} is too large")
+        values[argument] = kind(value)
+    return values
+
+# ==================== BATCH HANDLERS ====================
+# Each handler takes a list of parsed requests and returns one result dict,
+# or a QuoteError for that request only, per item.
+def _roll_error(width):
+    # The roll_fit errors, found before the batch runs
+    if width <= 0:
+        return QuoteError(422, f"Raw width must be positive, got {width} mm")
+    if width > MAX_ROLL_WIDTH:
+        return QuoteError(422, f"Raw width {width} mm is wider than the {MAX_ROLL_WIDTH} mm roll (zero UPS)")
+    return None
+
+def _roll_errors(items, raw_width):
+    return [_roll_error(raw_width(item)) for item in items]
+
+def _run_batch(items, arguments, func, outputs, sen_func, raw_width=None):
+    # Float outputs from func plus the fixed-point prices from sen_func, which
+    # match what run_command gives for a single quote
+    errors = _roll_errors(items, raw_width) if raw_width else [None] * len(items)
+    valid = [item for item, error in zip(items, errors) if error is None]
+    rows = []
+    if valid:
+        # Whole-number columns (quantity) stay int64 so total_sen is exact
+        columns = [np.array([item[argument] for item in valid], dtype=np.int64 if kind is int else np.float64)
+                   for argument, kind in arguments]
+        values = [column.tolist() for column in func(*columns)]
+        prices = [column.tolist() for column in sen_func(*columns)[:len(MONEY_OUTPUTS)]]
+        rows = [dict(zip(outputs, row), **dict(zip(MONEY_OUTPUTS, money))) for row, money in zip(zip(*values), zip(*prices))]
+    rows = iter(rows)
+    return [error if error is not None else next(rows) for error in errors]
+
+def _product_handler(product):
+    # Batch handler for a product type; products that fit a roll check each
+    # item's raw width first, so one bad item doesn't fail the batch
+    arguments = product.arguments + PRICING_ARGUMENTS
+    raw_width = None
+    if "raw_width" in dict(product.steps):
+        kernel = product.scalar(("raw_width",))
+        raw_width = lambda item: kernel(*(item[argument] for argument, _ in arguments))[0]
+
+    def handler(items):
+        return _run_batch(items, arguments, BATCH_CALCULATORS[product.name], product.batch_outputs,
+                          MONEY_BATCH_CALCULATORS[product.name], raw_width)
+    return handler
+
+def _scalar_handler(func, command):
+    _, arguments, outputs = COMMANDS[command]
+
+    def handler(items):
+        results = []
+        for item in items:
+            try:
+                results.append(dict(zip(outputs, func(*(item[argument] for argument, _ in arguments)))))
+            except (ValueError, ZeroDivisionError) as exc:
+                results.append(QuoteError(422, str(exc) or type(exc).__name__))
+        return results
+    return handler
+
+HANDLERS = {name: _product_handler(product) for name, product in PRODUCT_TYPES.items()}
+HANDLERS.update({
+    "nesting": _scalar_handler(calculate_nesting, "nesting"),
+    "design-nesting": _scalar_handler(calculate_design_nesting_layer_pad, "design-nesting"),
+})
+
+# ==================== MICRO-BATCHING ====================
+class MicroBatcher:
+    # Collects requests arriving within max_delay of the first one (up to
+    # max_batch) and runs them through the handler as one batch. The queue
+    # and worker task belong to the event loop that submitted; a batcher
+    # used from a new loop (another asyncio.run) starts a fresh worker there.
+    def __init__(self, handler, max_batch=MAX_BATCH, max_delay=MAX_DELAY):
+        self.handler = handler
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.batches = 0
+        self._loop = None
+        self._queue = None
+        self._task = None
+
+    async def submit(self, item):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._loop is not loop or self._task.done():
+            # The old loop's worker (if any) died with its loop
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._run())
+        future = loop.create_future()
+        self._queue.put_nowait((item, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            self.batches += 1
+            try:
+                results = self.handler([item for item, _ in batch])
+            except Exception as exc:
+                results = [exc] * len(batch)
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    async def close(self):
+        if self._task is not None and self._loop is asyncio.get_running_loop():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._loop = self._queue = self._task = None
+
+# ==================== SERVICE ====================
+class QuoteService:
+    # POST /quote/<calculator> with a JSON object of the calculator's inputs
+    # (same names as the CLI options); GET /health; the metrics paths of
+    # metrics.handle_request, answered in plain text.
+    def __init__(self, max_batch=MAX_BATCH, max_delay=MAX_DELAY):
+        self.batchers = {name: MicroBatcher(handler, max_batch, max_delay) for name, handler in HANDLERS.items()}
+        self._server = None
+
+    async def handle(self, method, path, body):
+        # Returns (status, payload); shared by the HTTP server and LocalClient.
+        # payload is a str for the plain text metrics paths.
+        status, payload = await self._route(method, path, body)
+        if metrics.enabled():
+            known = status != 404 or path.startswith("/quote/")
+            metrics.inc(metrics.SERVICE_REQUESTS, (("path", path if known else "other"), ("status", str(status))))
+        return status, payload
+
+    async def _route(self, method, path, body):
+        text = metrics.handle_request(method, path)
+        if text is not None:
+            return text
+        try:
+            if path == "/health":
+                if method != "GET":
+                    raise QuoteError(405, "Use GET")
+                return 200, {"status": "ok"}
+            prefix, _, command = path.partition("/quote/")
+            if prefix or command not in self.batchers:
+                raise QuoteError(404, f"Unknown path {path}")
+            if method != "POST":
+                raise QuoteError(405, "Use POST")
+            try:
+                payload = json.loads(body or b"null")
+            except ValueError:
+                raise QuoteError(400, "Request body is not valid JSON")
+            result = await self.batchers[command].submit(parse_quote(command, payload))
+            return 200, result
+        except QuoteError as exc:
+            return exc.status, {"error": str(exc)}
+        except Exception as exc:
+            return 500, {"error": f"{type(exc).__name__}: {exc}"}
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                parts = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if len(parts) < 2:
+                    status, payload = 400, {"error": "Malformed request line"}
+                elif length < 0:
+                    status, payload = 400, {"error": "Bad Content-Length"}
+                elif length > MAX_BODY:
+                    status, payload = 413, {"error": "Request body too large"}
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    status, payload = await self.handle(parts[0].upper(), parts[1], body)
+                if isinstance(payload, str):
+                    data, content_type = payload.encode(), "text/plain; version=0.0.4; charset=utf-8"
+                else:
+                    data, content_type = json.dumps(payload).encode(), "application/json"
+                # The unread body of a bad or oversized request ends the connection
+                keep_alive = headers.get("connection", "").lower() != "close" and status != 413 and length >= 0
+                writer.write(
+                    f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+                    f"Content-Type: {content_type}\r\nContent-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=8080):
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        return self._server
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for batcher in self.batchers.values():
+            await batcher.close()
+
+class LocalClient:
+    # In-process stand-in for an HTTP client: goes through the same routing,
+    # validation and micro-batching as the server, without sockets.
+    def __init__(self, service=None):
+        self.service = service or QuoteService()
+
+    async def post(self, path, payload):
+        return await self.service.handle("POST", path, json.dumps(payload).encode())
+
+    async def get(self, path):
+        return await self.service.handle("GET", path, b"")
+
+async def serve(host="127.0.0.1", port=8080, max_batch=MAX_BATCH, max_delay=MAX_DELAY):
+    service = QuoteService(max_batch, max_delay)
+    server = await service.start(host, port)
+    metrics.profile_from_env()
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
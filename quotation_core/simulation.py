@@ -0,0 +1,128 @@
+import csv
+import itertools
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .cli import parse_row
+from .products import PRICING_ARGUMENTS, PRODUCT_TYPES
+
+# ==================== CONSTANTS ====================
+MONTHS = 12
+SCENARIOS = 100000
+CHUNK_SIZE = 25000  # scenarios per worker task; fixed so a seed gives the same results on any core count
+VOLATILITY = 0.25  # annual volatility of the costing tonnage
+CORRELATION = 0.8  # between the tonnage moves of different grammages
+PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+
+# ==================== CONTRACT LINES ====================
+# A contract line is a dict with "product" (a product type), the product's
+# size arguments and its pricing arguments; quantity is the line's pieces over
+# the whole contract, called off evenly each month.
+def read_contract(f):
+    # Typed contract lines from a CSV with a product column, each product's
+    # size columns and the pricing columns
+    for line, row in enumerate(csv.DictReader(f), 2):
+        product = (row.get("product") or "").strip()
+        if product not in PRODUCT_TYPES:
+            raise ValueError(f"Line {line}: unknown product {product!r}")
+        arguments = list(PRODUCT_TYPES[product].arguments + PRICING_ARGUMENTS)
+        yield dict(parse_row(row, arguments, line), product=product)
+
+def _line_prices(product):
+    return PRODUCT_TYPES[product].scalar(("cost", "unit_price"))
+
+def contract_exposure(lines, months=MONTHS):
+    # (grammages, cost per month of each grammage at today's costing tonnage,
+    # revenue, revenue at 0% adjustment). Selling tonnage is fixed by the
+    # contract, so revenue does not move; costs scale with the tonnage.
+    costs = {}
+    revenue = base_revenue = 0.0
+    for number, line in enumerate(lines, 1):
+        product = PRODUCT_TYPES[line["product"]]
+        if line["adjustment"] <= -100:
+            # The 0% revenue is found by dividing the adjustment back out
+            raise ValueError(f"Contract line {number}: adjustment must be above -100, got {line['adjustment']:g}")
+        try:
+            cost, unit_price = _line_prices(line["product"])(*(line[name] for name in product.argument_names))
+        except (ValueError, ZeroDivisionError) as exc:
+            raise ValueError(f"Contract line {number}: {exc}") from None
+        costs[line["grammage"]] = costs.get(line["grammage"], 0.0) + cost * line["quantity"]
+        revenue += unit_price * line["quantity"]
+        base_revenue += unit_price / (1 + line["adjustment"] / 100) * line["quantity"]
+    if not costs:
+        raise ValueError("Contract has no lines")
+    if not revenue or not base_revenue:
+        # Margin % and the break-even adjustment divide by them
+        raise ValueError("Contract has no revenue")
+    grammages = sorted(costs)
+    return grammages, np.array([costs[g] / months for g in grammages]), revenue, base_revenue
+
+# ==================== SIMULATION ====================
+def _simulate_chunk(seed, scenarios, monthly_cost, months, volatility, drift, correlation):
+    # Total contract cost of each scenario. Each grammage's costing tonnage
+    # follows a geometric Brownian motion in monthly steps, month 1 at today's
+    # tonnage; the grammages share a common shock with the given correlation.
+    rng = np.random.default_rng(seed)
+    steps = months - 1
+    shocks = rng.standard_normal((scenarios, steps, len(monthly_cost)))
+    if len(monthly_cost) > 1:
+        common = rng.standard_normal((scenarios, steps, 1))
+        shocks = math.sqrt(correlation) * common + math.sqrt(1 - correlation) * shocks
+    dt = 1 / 12
+    log_moves = (drift - volatility ** 2 / 2) * dt + volatility * math.sqrt(dt) * shocks
+    # Tonnage of month m relative to today, summed over the months
+    ratio_sum = 1 + np.exp(np.cumsum(log_moves, axis=1)).sum(axis=1)
+    return ratio_sum @ monthly_cost
+
+def simulate_contract(lines, scenarios=SCENARIOS, months=MONTHS, volatility=VOLATILITY, drift=0.0,
+                      correlation=CORRELATION, seed=None, workers=None, chunk_size=CHUNK_SIZE,
+                      percentiles=PERCENTILES):
+    # Margin (revenue - cost, RM) of a contract's product mix over scenarios
+    # of monthly costing tonnage paths. volatility and drift are annual and may
+    # be a {grammage: value} mapping. Reports margin percentiles, the chance of
+    # a loss and the break-even adjustment %: the single adjustment on every
+    # line at which a scenario's margin is zero, so pricing at its 95th
+    # percentile covers 95% of scenarios. Chunks run on all cores.
+    if scenarios < 1 or months < 1:
+        raise ValueError("Scenarios and months must be positive")
+    if not 0 <= correlation <= 1:
+        raise ValueError("Correlation must be between 0 and 1")
+    grammages, monthly_cost, revenue, base_revenue = contract_exposure(lines, months)
+    if isinstance(volatility, dict) or isinstance(drift, dict):
+        volatilities = [volatility[g] if isinstance(volatility, dict) else volatility for g in grammages]
+        drifts = [drift[g] if isinstance(drift, dict) else drift for g in grammages]
+        volatility, drift = np.array(volatilities), np.array(drifts)
+    seeds = np.random.SeedSequence(seed).spawn(math.ceil(scenarios / chunk_size))
+    sizes = [min(chunk_size, scenarios - start) for start in range(0, scenarios, chunk_size)]
+    workers = workers or os.cpu_count() or 1
+    args = (months, volatility, drift, correlation)
+    if workers > 1 and len(sizes) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(sizes))) as executor:
+            costs = list(executor.map(_simulate_chunk, seeds, sizes, itertools.repeat(monthly_cost),
+                                      *(itertools.repeat(arg) for arg in args)))
+    else:
+        costs = [_simulate_chunk(chunk_seed, size, monthly_cost, *args) for chunk_seed, size in zip(seeds, sizes)]
+    cost = np.concatenate(costs)
+    margin = revenue - cost
+    break_even = (cost / base_revenue - 1) * 100
+
+    def spread(values):
+        return {f"p{p}": round(float(value), 4) for p, value in zip(percentiles, np.percentile(values, percentiles))}
+
+    today_cost = float(monthly_cost.sum() * months)
+    return {
+        "scenarios": scenarios,
+        "months": months,
+        "grammages": grammages,
+        "revenue": round(revenue, 4),
+        "cost_today": round(today_cost, 4),
+        "margin_today": round(revenue - today_cost, 4),
+        "margin_mean": round(float(margin.mean()), 4),
+        "margin": spread(margin),
+        "margin_percent": spread(margin / revenue * 100),
+        "loss_probability": float((margin < 0).mean()),
+        "break_even_adjustment_percent": spread(break_even),
+    }
@@ -0,0 +1,89 @@
+import csv
+import os
+
+import numpy as np
+
+from .cli import parse_row
+from .store import default_store_path
+
+# ==================== CONSTANTS ====================
+CATALOG_FILENAME = "stock_cartons.csv"
+CATALOG_ARGUMENTS = [("code", str), ("length", float), ("width", float), ("height", float)]
+# Cartons checked by the first NumPy pass of a query; each further pass
+# checks twice as many, so small products stop after one short pass
+FIRST_PASS = 512
+SUGGESTIONS = 5
+
+def default_catalog_path():
+    # $QUOTATION_CORE_STOCK, or stock_cartons.csv next to the quote store
+    return os.environ.get("QUOTATION_CORE_STOCK") or os.path.join(os.path.dirname(default_store_path()), CATALOG_FILENAME)
+
+# ==================== INDEX ====================
+class StockIndex:
+    # Stock cartons by internal size (mm), for "smallest stock cartons that
+    # hold this" lookups. Cartons are sorted by volume, so a query only scans
+    # the volume range from the required volume up (to the void limit) and
+    # the first fits found are the ones with the least void. Each carton
+    # keeps its sizes sorted (any face down) and its sorted footprint and
+    # height (upright), one contiguous array per key.
+    def __init__(self, cartons):
+        # cartons: iterable of (code, length, width, height)
+        cartons = sorted(cartons, key=lambda carton: (carton[1] * carton[2] * carton[3], carton[0]))
+        sizes = np.array([carton[1:] for carton in cartons], dtype=np.float64).reshape(-1, 3)
+        if len(sizes) and not (sizes > 0).all():
+            raise ValueError("Stock carton sizes must be positive")
+        self.codes = [carton[0] for carton in cartons]
+        self.sizes = sizes
+        self.volumes = sizes.prod(axis=1)
+        # Rows: three sizes descending, then footprint descending and height
+        self.keys = np.ascontiguousarray(
+            np.column_stack((-np.sort(-sizes, axis=1), -np.sort(-sizes[:, :2], axis=1), sizes[:, 2])).T)
+
+    @classmethod
+    def from_csv(cls, f):
+        # Index of a CSV with code, length, width and height (internal, mm) columns
+        rows = (parse_row(row, CATALOG_ARGUMENTS, line) for line, row in enumerate(csv.DictReader(f), 2))
+        return cls([(row["code"], row["length"], row["width"], row["height"]) for row in rows])
+
+    def __len__(self):
+        return len(self.codes)
+
+    def fits(self, length, width, height, limit=SUGGESTIONS, upright=False, max_void_percent=None):
+        # The limit smallest-void stock cartons whose internal size holds
+        # length x width x height, as dicts with code, length, width, height
+        # and void_percent (of the carton volume). With upright the height
+        # must stay vertical; otherwise the carton may be turned any way.
+        if length <= 0 or width <= 0 or height <= 0:
+            raise ValueError("Required size must be positive")
+        if upright:
+            keys = self.keys[3:]
+            need = (max(length, width), min(length, width), height)
+        else:
+            keys = self.keys[:3]
+            need = sorted((length, width, height), reverse=True)
+        need = [size - 1e-9 for size in need]
+        volume = length * width * height
+        start = int(np.searchsorted(self.volumes, volume - 1e-6))
+        stop = len(self.volumes)
+        if max_void_percent is not None:
+            # void < max_void_percent means volume < required / (1 - max_void_percent / 100)
+            stop = int(np.searchsorted(self.volumes, volume / (1 - min(max_void_percent, 99.999) / 100), "right"))
+        found = []
+        first, size = start, FIRST_PASS
+        while first < stop and len(found) < limit:
+            last = min(first + size, stop)
+            hits = np.flatnonzero((keys[0, first:last] >= need[0]) & (keys[1, first:last] >= need[1]) &
+                                  (keys[2, first:last] >= need[2]))
+            found.extend((first + hits[:limit - len(found)]).tolist())
+            first, size = last, size * 2
+        return [{
+            "code": self.codes[i],
+            "length": float(self.sizes[i, 0]),
+            "width": float(self.sizes[i, 1]),
+            "height": float(self.sizes[i, 2]),
+            "void_percent": round(float(1 - volume / self.volumes[i]) * 100, 2),
+        } for i in found]
+
+def load_stock_index(path=None):
+    with open(path or default_catalog_path(), newline="") as f:
+        return StockIndex.from_csv(f)
@@ -0,0 +1,518 @@
+import collections
+import datetime
+import json
+import os
+import sqlite3
+import threading
+
+from . import metrics
+from .cli import COMMANDS, MONEY_OUTPUTS, run_command
+from .products import PRODUCT_TYPES
+from .roll_fit import default_cache_dir
+
+# ==================== CONSTANTS ====================
+STORE_FILENAME = "quotes.sqlite3"
+CACHE_SIZE = 4096
+SCHEMA_VERSION = 1
+# Rows per "IN (...)" lookup, under SQLite's bound-parameter limit
+LOOKUP_CHUNK = 500
+# Specs repriced per pass of a reprice
+REPRICE_CHUNK = 50000
+# SQLite page cache for a reprice (KiB), so adding to the spec key index stays in memory
+REPRICE_CACHE_KIB = 262144
+# One row per quote a reprice changes, as reprice() reports them
+REPRICE_FIELDS = (
+    "quote_id", "created_at", "customer", "product", "grammage", "quantity",
+    "old_costing", "new_costing", "old_selling", "new_selling",
+    "old_unit_price_sen", "new_unit_price_sen", "old_total_sen", "new_total_sen",
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS specs (
+    id INTEGER PRIMARY KEY,
+    spec_key TEXT NOT NULL UNIQUE,
+    product TEXT NOT NULL,
+    sizes TEXT NOT NULL,
+    grammage REAL NOT NULL,
+    costing REAL NOT NULL,
+    selling REAL NOT NULL,
+    adjustment REAL NOT NULL,
+    paper_length_m REAL NOT NULL,
+    effective_width_m REAL NOT NULL,
+    ups INTEGER NOT NULL,
+    area_m2 REAL NOT NULL,
+    area_um2 INTEGER NOT NULL,
+    cost REAL NOT NULL,
+    unit_price REAL NOT NULL,
+    cost_sen INTEGER NOT NULL,
+    unit_price_sen INTEGER NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS specs_product ON specs (product, grammage);
+CREATE TABLE IF NOT EXISTS quotes (
+    id INTEGER PRIMARY KEY,
+    spec_id INTEGER NOT NULL REFERENCES specs (id),
+    customer TEXT,
+    quantity INTEGER NOT NULL,
+    total REAL NOT NULL,
+    total_sen INTEGER NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS quotes_spec ON quotes (spec_id);
+CREATE INDEX IF NOT EXISTS quotes_customer ON quotes (customer, created_at);
+CREATE INDEX IF NOT EXISTS quotes_created ON quotes (created_at);
+CREATE TABLE IF NOT EXISTS settings (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO settings (name, value) VALUES ('generation', 0);
+CREATE TABLE IF NOT EXISTS repricings (
+    id INTEGER PRIMARY KEY,
+    tonnage TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS repriced_quotes (
+    repricing_id INTEGER NOT NULL REFERENCES repricings (id),
+    quote_id INTEGER NOT NULL REFERENCES quotes (id),
+    spec_id INTEGER NOT NULL REFERENCES specs (id),
+    total REAL NOT NULL,
+    total_sen INTEGER NOT NULL,
+    PRIMARY KEY (repricing_id, quote_id)
+);
+"""
+# A specs row, as _spec_row builds it; a spec another process inserted first keeps its row
+INSERT_SPEC = ("INSERT OR IGNORE INTO specs (spec_key, product, sizes, grammage, costing, selling, adjustment, "
+               "paper_length_m, effective_width_m, ups, area_m2, area_um2, cost, unit_price, cost_sen, unit_price_sen, "
+               "created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+
+# ==================== GEOMETRY ====================
+# (paper_length_m, effective_width_m, ups, area_m2, area_um2) of one piece,
+# with area_m2 the factor the calculators multiply by grammage and tonnage and
+# area_um2 the one the fixed-point prices use (money.py), so a stored quote
+# can be repriced without recomputing its layout. Compiled from the product
+# definitions (products.py), like the calculators.
+def _geometry(product):
+    arguments = [argument for argument, _ in product.arguments]
+    kernel = product.scalar(product.geometry + ("area_m2", "area_um2"), arguments=arguments)
+    return lambda values: kernel(*(values[argument] for argument in arguments))
+
+GEOMETRY = {name: _geometry(product) for name, product in PRODUCT_TYPES.items()}
+# Size arguments, which a spec keeps as JSON; the pricing inputs and prices
+# are columns, so a reprice never has to rewrite JSON
+SIZES = {name: tuple(argument for argument, _ in product.arguments) for name, product in PRODUCT_TYPES.items()}
+
+# The outputs other than the prices (formula text, layout) of a stored spec,
+# from its geometry and pricing columns
+def _extras(product):
+    extras = tuple(output for output in product.outputs if output not in ("cost", "unit_price", "total"))
+    if not extras:
+        return extras, None
+    return extras, product.scalar(extras, arguments=product.geometry + ("grammage", "costing", "selling", "adjustment"))
+
+EXTRAS = {name: _extras(product) for name, product in PRODUCT_TYPES.items()}
+
+def _outputs(product, grammage, costing, selling, adjustment, length, width, ups, cost, unit_price, cost_sen,
+             unit_price_sen):
+    # run_command outputs of one piece of a stored spec
+    outputs = {"cost": cost, "unit_price": unit_price, "cost_sen": cost_sen, "unit_price_sen": unit_price_sen}
+    extras, kernel = EXTRAS[product]
+    if kernel is not None:
+        outputs.update(zip(extras, kernel(length, width, ups, grammage, costing, selling, adjustment)))
+    return outputs
+
+# ==================== SPEC KEYS ====================
+def normalize_inputs(command, values):
+    # Calculator inputs other than quantity, coerced to the CLI argument types
+    # so 500 and 500.0 give the same spec
+    if command not in GEOMETRY:
+        raise ValueError(f"Quotes for {command!r} are not stored")
+    _, arguments, _ = COMMANDS[command]
+    return {argument: kind(values[argument]) for argument, kind in arguments if argument != "quantity"}
+
+def normalize_quantity(value):
+    # Whole pieces; a fraction is an error rather than cut off
+    try:
+        quantity = int(value)
+    except (TypeError, ValueError, OverflowError):
+        quantity = None
+    if quantity is None or (not isinstance(value, str) and quantity != value):
+        raise ValueError(f"bad quantity {str(value)!r}")
+    return quantity
+
+def sizes_json(command, inputs):
+    return json.dumps({argument: inputs[argument] for argument in SIZES[command]})
+
+def spec_key(command, inputs):
+    return json_spec_key(command, sizes_json(command, inputs), inputs["grammage"], inputs["costing"],
+                         inputs["selling"], inputs["adjustment"])
+
+def json_spec_key(command, sizes, grammage, costing, selling, adjustment):
+    # "<command> <sizes JSON> <grammage> <costing> <selling> <adjustment>",
+    # the sizes as the sizes column holds them, so a reprice can build the
+    # key of a repriced spec from its columns
+    return f"{command} {sizes} {grammage!r} {costing!r} {selling!r} {adjustment!r}"
+
+def _timestamp(value=None):
+    # ISO 8601 text in UTC, so date ranges are plain string comparisons
+    if value is None:
+        value = datetime.datetime.now(datetime.timezone.utc)
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return value.isoformat(timespec="seconds")
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return str(value)
+
+def _fetch_in(conn, sql, values):
+    # Rows of sql with its "IN ({})" filled in for values, a lookup chunk at a time
+    for start in range(0, len(values), LOOKUP_CHUNK):
+        chunk = values[start:start + LOOKUP_CHUNK]
+        yield from conn.execute(sql.format(",".join("?" * len(chunk))), chunk)
+
+def default_store_path():
+    return os.path.join(default_cache_dir(), STORE_FILENAME)
+
+# ==================== STORE ====================
+class QuoteStore:
+    # Every priced quote (carton-box, pizza-box, layer-pad, sample-board) with
+    # its inputs and outputs, in one SQLite file in WAL mode so Streamlit
+    # sessions and worker processes can read while one of them writes.
+    # Quantity only scales the total, so outputs are stored once per spec and
+    # the quotes table holds the quantity, customer and date of each quote.
+    # Specs and quotes are never rewritten: a reprice (reprice()) adds the
+    # repriced specs and one repriced_quotes row per quote and tonnage table
+    # version (repricings), so history() can show a quote as recorded or as
+    # any repricing left it. A process-local LRU of specs sits in front of the
+    # database; a job that has to rewrite specs bumps the generation setting,
+    # which makes every process drop its cache before its next quote.
+    def __init__(self, path=None, cache_size=CACHE_SIZE):
+        self.path = path or default_store_path()
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        if metrics.enabled():
+            metrics.register_cache("quote_store", lambda store: (store.hits, store.misses), owner=self)
+        self._generation = None
+        self._cache = collections.OrderedDict()
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < SCHEMA_VERSION:
+            self._conn.executescript(SCHEMA)
+            self._conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    def _transaction(self, mode="IMMEDIATE"):
+        # Write transaction, or with mode "DEFERRED" a read one: a consistent
+        # snapshot that doesn't take the database write lock
+        return _Transaction(self._conn, self._lock, mode)
+
+    # ---------- spec cache ----------
+    def _check_generation(self):
+        # True (and the cache dropped) when specs were rewritten since the last check
+        generation = self._conn.execute("SELECT value FROM settings WHERE name = 'generation'").fetchone()[0]
+        if generation == self._generation:
+            return False
+        self._cache.clear()
+        self._generation = generation
+        return True
+
+    def _bump_generation(self):
+        self._conn.execute("UPDATE settings SET value = value + 1 WHERE name = 'generation'")
+        self._cache.clear()
+
+    def _cache_get(self, key):
+        spec = self._cache.get(key)
+        if spec is not None:
+            self._cache.move_to_end(key)
+        return spec
+
+    def _cache_put(self, key, spec):
+        self._cache[key] = spec
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _load_specs(self, keys):
+        # {spec_key: (spec_id, outputs)} for the keys already in the database
+        rows = _fetch_in(
+            self._conn, "SELECT spec_key, id, product, grammage, costing, selling, adjustment, paper_length_m, "
+            "effective_width_m, ups, cost, unit_price, cost_sen, unit_price_sen FROM specs WHERE spec_key IN ({})",
+            list(keys)
+        )
+        return {key: (spec_id, _outputs(*columns)) for key, spec_id, *columns in rows}
+
+    def _spec_row(self, command, key, inputs, created_at, price=None):
+        # specs row for a new spec, priced by price or the calculator for one piece
+        result = price(inputs) if price is not None else run_command(command, dict(inputs, quantity=1))
+        paper_length_m, effective_width_m, ups, area_m2, area_um2 = GEOMETRY[command](inputs)
+        return (key, command, sizes_json(command, inputs), inputs["grammage"], inputs["costing"], inputs["selling"],
+                inputs["adjustment"], paper_length_m, effective_width_m, ups, area_m2, area_um2, result["cost"],
+                result["unit_price"], result["cost_sen"], result["unit_price_sen"], created_at)
+
+    def _insert_specs(self, rows):
+        # {spec_key: (spec_id, outputs)} of new _spec_row rows; a spec another
+        # process inserted first keeps its row
+        self._conn.executemany(INSERT_SPEC, rows)
+        return self._load_specs(row[0] for row in rows)
+
+    # ---------- quoting ----------
+    def quote(self, command, values, customer=None, created_at=None, record=True, price=None):
+        # Outputs of the calculator for values (as run_command returns them),
+        # answered from the store when the spec has been priced before. Only a
+        # new spec is priced: by price(inputs without quantity), returning the
+        # run_command outputs of one piece, or else by the calculator.
+        return self.quote_many(command, [values], customer, created_at, record, price)[0]
+
+    def quote_many(self, command, rows, customer=None, created_at=None, record=True, price=None):
+        # Bulk version of quote, each new spec priced once. Known specs are
+        # looked up in a read transaction; the write lock is only taken to
+        # insert new specs and the quote rows.
+        _, _, outputs = COMMANDS[command]
+        outputs = outputs + MONEY_OUTPUTS
+        inputs_list = [normalize_inputs(command, values) for values in rows]
+        keys = [spec_key(command, inputs) for inputs in inputs_list]
+        quantities = [normalize_quantity(values["quantity"]) for values in rows]
+        created_at = _timestamp(created_at)
+        with self._lock:
+            with self._transaction("DEFERRED"):
+                # A spec rewrite in another process drops the cache, recording or not
+                self._check_generation()
+                specs = {}
+                for key in keys:
+                    spec = self._cache_get(key)
+                    if spec is not None:
+                        specs[key] = spec
+                self.hits += sum(key in specs for key in keys)
+                missing = {key: inputs for key, inputs in zip(keys, inputs_list) if key not in specs}
+                loaded = self._load_specs(missing)
+            specs.update(loaded)
+            # Priced outside any transaction
+            new_rows = [self._spec_row(command, key, inputs, created_at, price)
+                        for key, inputs in missing.items() if key not in loaded]
+            self.misses += len(new_rows)
+            if record or new_rows:
+                with self._transaction():
+                    if self._check_generation():
+                        # Specs were rewritten since the read: look them all up again
+                        loaded = self._load_specs(set(keys))
+                        specs.update(loaded)
+                        new_rows = [row for row in new_rows if row[0] not in loaded]
+                    if new_rows:
+                        inserted = self._insert_specs(new_rows)
+                        loaded.update(inserted)
+                        specs.update(inserted)
+                    results = self._results(keys, quantities, specs, outputs)
+                    if record:
+                        self._conn.executemany(
+                            "INSERT INTO quotes (spec_id, customer, quantity, total, total_sen, created_at) "
+                            "VALUES (?, ?, ?, ?, ?, ?)",
+                            [(specs[key][0], customer, quantity, result["total"], result["total_sen"], created_at)
+                             for key, quantity, result in zip(keys, quantities, results)]
+                        )
+            else:
+                results = self._results(keys, quantities, specs, outputs)
+            # Cached only once committed, so a rolled-back spec id is never served
+            for key, spec in loaded.items():
+                self._cache_put(key, spec)
+        return results
+
+    @staticmethod
+    def _results(keys, quantities, specs, outputs):
+        results = []
+        for key, quantity in zip(keys, quantities):
+            stored = specs[key][1]
+            result = dict(stored, total=stored["unit_price"] * quantity, total_sen=stored["unit_price_sen"] * quantity)
+            results.append({name: result[name] for name in outputs})
+        return results
+
+    # ---------- history ----------
+    def history(self, customer=None, since=None, until=None, product=None, limit=None, repricing=None):
+        # Recorded quotes, newest first; since is inclusive and until exclusive
+        # (dates or datetimes, compared in UTC). With repricing (an id from
+        # repricings()), the spec and totals that repricing gave each quote,
+        # the recorded ones for the quotes it left alone.
+        clauses = []
+        params = []
+        if repricing is not None:
+            params.append(int(repricing))
+        if customer is not None:
+            clauses.append("q.customer = ?")
+            params.append(customer)
+        if since is not None:
+            clauses.append("q.created_at >= ?")
+            params.append(_timestamp(since))
+        if until is not None:
+            clauses.append("q.created_at < ?")
+            params.append(_timestamp(until))
+        if product is not None:
+            clauses.append("s.product = ?")
+            params.append(product)
+        if repricing is None:
+            sql = ("SELECT q.id, q.created_at, q.customer, s.product, s.sizes, s.grammage, s.costing, s.selling, "
+                   "s.adjustment, q.quantity, s.cost, s.unit_price, q.total, s.cost_sen, s.unit_price_sen, q.total_sen FROM quotes q JOIN specs s ON s.id = q.spec_id")
+        else:
+            sql = ("SELECT q.id, q.created_at, q.customer, s.product, s.sizes, s.grammage, s.costing, s.selling, "
+                   "s.adjustment, q.quantity, s.cost, s.unit_price, COALESCE(r.total, q.total), s.cost_sen, s.unit_price_sen, COALESCE(r.total_sen, q.total_sen) "
+                   "FROM quotes q LEFT JOIN repriced_quotes r ON r.quote_id = q.id AND r.repricing_id = ? "
+                   "JOIN specs s ON s.id = COALESCE(r.spec_id, q.spec_id)")
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY q.created_at DESC, q.id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [{
+            "id": quote_id, "created_at": created, "customer": who, "product": product_name,
+            "inputs": dict(json.loads(sizes), grammage=grammage, costing=costing, selling=selling, adjustment=adjustment),
+            "quantity": quantity, "cost": cost, "unit_price": unit_price, "total": total,
+            "cost_sen": cost_sen, "unit_price_sen": unit_price_sen, "total_sen": total_sen,
+        } for (quote_id, created, who, product_name, sizes, grammage, costing, selling, adjustment, quantity, cost,
+               unit_price, total, cost_sen, unit_price_sen, total_sen) in rows]
+
+    # ---------- repricing ----------
+    def reprice(self, tonnage, price, chunk_size=REPRICE_CHUNK, report=None, dry_run=False):
+        # Applies tonnage ({grammage: (costing, selling)}) to the specs of the
+        # recorded quotes on its grammages, without changing the history: the
+        # run is a new repricings row, each changed spec gets a new spec with
+        # the new tonnage (or the existing spec with those inputs) and each of
+        # its quotes a repriced_quotes row with the new spec and totals. Specs
+        # keep their stored geometry; price(area_m2, area_um2, grammage,
+        # costing, selling, adjustment) gets a chunk of them as lists and
+        # returns their cost, unit_price, cost_sen and unit_price_sen lists.
+        # report(rows) gets the REPRICE_FIELDS row of each changed quote.
+        # Runs in one transaction; returns a summary of the changes.
+        summary = {"repricing": None, "specs_repriced": 0, "specs_existing": 0, "quotes_repriced": 0,
+                   "old_total_sen": 0, "new_total_sen": 0}
+        table = sorted((float(grammage), float(costing), float(selling)) for grammage, (costing, selling) in tonnage.items())
+        if not table:
+            return summary
+        # Specs already on the new tonnage (this run's among them) are skipped,
+        # and so are specs no quote was recorded on. CROSS JOIN keeps specs
+        # the outer loop, so each pass reads on from the last id.
+        sql = (f"WITH tonnage (grammage, costing, selling) AS (VALUES {', '.join(['(?, ?, ?)'] * len(table))}) "
+               "SELECT s.id, s.product, s.sizes, s.grammage, s.adjustment, s.area_m2, s.area_um2, t.costing, t.selling "
+               "FROM specs s CROSS JOIN tonnage t "
+               "WHERE s.id > ? AND t.grammage = s.grammage AND (s.costing != t.costing OR s.selling != t.selling) "
+               "AND EXISTS (SELECT 1 FROM quotes q WHERE q.spec_id = s.id) ORDER BY s.id LIMIT ?")
+        params = [value for row in table for value in row]
+        created_at = _timestamp()
+        with self._lock:
+            cache_pages = self._conn.execute("PRAGMA cache_size").fetchone()[0]
+            self._conn.execute(f"PRAGMA cache_size=-{REPRICE_CACHE_KIB}")
+            try:
+                self._conn.execute(
+                    "CREATE TEMP TABLE IF NOT EXISTS repricing (spec_id INTEGER PRIMARY KEY, spec_key TEXT NOT NULL, "
+                    "costing REAL, selling REAL, cost REAL, unit_price REAL, cost_sen INTEGER, unit_price_sen INTEGER, "
+                    "new_id INTEGER)"
+                )
+                with self._transaction():
+                    if not dry_run:
+                        summary["repricing"] = self._conn.execute(
+                            "INSERT INTO repricings (tonnage, created_at) VALUES (?, ?)",
+                            (json.dumps({repr(grammage): [costing, selling] for grammage, costing, selling in table}),
+                             created_at)
+                        ).lastrowid
+                    last_id = 0
+                    while True:
+                        rows = self._conn.execute(sql, params + [last_id, chunk_size]).fetchall()
+                        if not rows:
+                            break
+                        last_id = rows[-1][0]
+                        self._reprice_chunk(rows, price, created_at, report, dry_run, summary)
+            finally:
+                self._conn.execute("DROP TABLE IF EXISTS temp.repricing")
+                self._conn.execute(f"PRAGMA cache_size={cache_pages}")
+        return summary
+
+    def _reprice_chunk(self, rows, price, created_at, report, dry_run, summary):
+        # The chunk's new prices go to a scratch table, so the spec lookups,
+        # the new specs and the quote totals are each one statement
+        spec_ids, products, sizes, grammage, adjustment, area_m2, area_um2, costing, selling = zip(*rows)
+        prices = price(area_m2, area_um2, grammage, costing, selling, adjustment)
+        keys = map(json_spec_key, products, sizes, grammage, costing, selling, adjustment)
+        conn = self._conn
+        conn.execute("DELETE FROM temp.repricing")
+        conn.executemany("INSERT INTO temp.repricing (spec_id, spec_key, costing, selling, cost, unit_price, cost_sen, "
+                         "unit_price_sen) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                         zip(spec_ids, keys, costing, selling, *prices))
+        find_specs = "UPDATE temp.repricing SET new_id = (SELECT id FROM specs WHERE specs.spec_key = repricing.spec_key)"
+        summary["specs_repriced"] += len(rows)
+        if dry_run:
+            conn.execute(find_specs)
+            summary["specs_existing"] += conn.execute(
+                "SELECT COUNT(*) FROM temp.repricing WHERE new_id IS NOT NULL").fetchone()[0]
+        else:
+            # The rows not inserted are specs that were already there
+            summary["specs_existing"] += len(rows) - conn.execute(
+                "INSERT OR IGNORE INTO specs (spec_key, product, sizes, grammage, costing, selling, adjustment, "
+                "paper_length_m, effective_width_m, ups, area_m2, area_um2, cost, unit_price, cost_sen, unit_price_sen, "
+                "created_at) SELECT r.spec_key, s.product, s.sizes, s.grammage, r.costing, r.selling, s.adjustment, "
+                "s.paper_length_m, s.effective_width_m, s.ups, s.area_m2, s.area_um2, r.cost, r.unit_price, r.cost_sen, "
+                "r.unit_price_sen, ? FROM temp.repricing r JOIN specs s ON s.id = r.spec_id ORDER BY r.spec_id",
+                (created_at,)
+            ).rowcount
+            conn.execute(find_specs)
+            conn.execute(
+                "INSERT INTO repriced_quotes (repricing_id, quote_id, spec_id, total, total_sen) "
+                "SELECT ?, q.id, r.new_id, r.unit_price * q.quantity, r.unit_price_sen * q.quantity "
+                "FROM temp.repricing r JOIN quotes q ON q.spec_id = r.spec_id", (summary["repricing"],)
+            )
+        quotes, old_total_sen, new_total_sen = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(q.total_sen), 0), COALESCE(SUM(r.unit_price_sen * q.quantity), 0) "
+            "FROM temp.repricing r JOIN quotes q ON q.spec_id = r.spec_id"
+        ).fetchone()
+        summary["quotes_repriced"] += quotes
+        summary["old_total_sen"] += old_total_sen
+        summary["new_total_sen"] += new_total_sen
+        if report is not None:
+            report(conn.execute(
+                "SELECT q.id, q.created_at, COALESCE(q.customer, ''), s.product, s.grammage, q.quantity, s.costing, "
+                "r.costing, s.selling, r.selling, s.unit_price_sen, r.unit_price_sen, q.total_sen, "
+                "r.unit_price_sen * q.quantity FROM temp.repricing r JOIN specs s ON s.id = r.spec_id "
+                "JOIN quotes q ON q.spec_id = r.spec_id ORDER BY q.id"
+            ))
+
+    def repricings(self):
+        # Tonnage tables applied to the store, oldest first, as dicts with id,
+        # created_at and tonnage ({grammage: [costing, selling]})
+        with self._lock:
+            rows = self._conn.execute("SELECT id, created_at, tonnage FROM repricings ORDER BY id").fetchall()
+        return [{"id": repricing_id, "created_at": created,
+                 "tonnage": {float(grammage): value for grammage, value in json.loads(tonnage).items()}}
+                for repricing_id, created, tonnage in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+            self._cache.clear()
+
+class _Transaction:
+    # BEGIN <mode> ... COMMIT under the store lock; rolls back on error
+    def __init__(self, conn, lock, mode="IMMEDIATE"):
+        self.conn = conn
+        self.lock = lock
+        self.mode = mode
+
+    def __enter__(self):
+        self.lock.acquire()
+        try:
+            self.conn.execute(f"BEGIN {self.mode}")
+        except BaseException:
+            self.lock.release()
+            raise
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.lock.release()
+        return False
@@ -0,0 +1,149 @@
+import heapq
+import itertools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from .calculations import calculate_nesting
+from .money import (
+    SEN_PER_RM, calculate_layer_pad_sen, calculate_nesting_piece_sen, calculate_standard_box_sen, sen_to_rm
+)
+
+# ==================== CANDIDATES ====================
+def arrangements(target_qty):
+    # Every qty_L x qty_W x qty_H whose product is exactly target_qty
+    for qty_L in range(1, target_qty + 1):
+        if target_qty % qty_L:
+            continue
+        rest = target_qty // qty_L
+        for qty_W in range(1, rest + 1):
+            if rest % qty_W == 0:
+                yield qty_L, qty_W, rest // qty_W
+
+def enumerate_candidates(product_L, product_W, product_H, target_qty, layer_pad_extra=(0, 1, 2)):
+    # Each product orientation x arrangement x layer pad count. Tiers are
+    # separated by qty_H - 1 pads; layer_pad_extra adds top and bottom pads.
+    orientations = sorted(set(itertools.permutations((product_L, product_W, product_H))))
+    for orientation in orientations:
+        for qty_L, qty_W, qty_H in arrangements(target_qty):
+            for extra in layer_pad_extra:
+                layer_qty = qty_H - 1 + extra
+                if layer_qty >= 0:
+                    yield orientation, qty_L, qty_W, qty_H, layer_qty
+
+# ==================== PRICING ====================
+def build_carton(orientation, qty_L, qty_W, qty_H, layer_qty, bubble, thickness, allowance, layer_thick):
+    # calculate_nesting sizes one tier of qty_L x qty_W products; the sweep
+    # stacks qty_H tiers in the carton, separated by layer pads.
+    product_L, product_W, product_H = orientation
+    int_L, int_W, int_H, ext_L, ext_W, _, nesting_long, nesting_short = calculate_nesting(
+        product_L, product_W, product_H, bubble, thickness, allowance, qty_L, qty_W, qty_H, layer_thick, layer_qty
+    )
+    ext_H = int_H * qty_H + 20 + (layer_thick * layer_qty)
+    return int_L, int_W, int_H, ext_L, ext_W, ext_H, nesting_long, nesting_short
+
+def carton_cost_bound(ext_L, ext_W, ext_H, grammage, costing):
+    # Lower bound on the carton cost (RM): blank area without trim and with
+    # the 3 dp rounding of paper length and effective width taken downwards,
+    # less the half sen the cost may be rounded down by
+    paper_length = (ext_L + ext_W) * 2 + 30 - 0.5
+    raw_width = ext_W + ext_H + 4 - 0.5
+    return paper_length / 1000 * raw_width / 1000 * grammage * costing - 0.5 / SEN_PER_RM
+
+def price_design(candidate, params):
+    orientation, qty_L, qty_W, qty_H, layer_qty = candidate
+    int_L, int_W, int_H, ext_L, ext_W, ext_H, nesting_long, nesting_short = build_carton(
+        orientation, qty_L, qty_W, qty_H, layer_qty,
+        params["bubble"], params["thickness"], params["allowance"], params["layer_thick"]
+    )
+    # Every piece is priced in sen, rounded once per piece, and the design
+    # totals are those sen times the piece counts (the money.py policy)
+    pricing = (params["grammage"], params["costing"], params["selling"], 1, params["adjustment"])
+    try:
+        carton_cost, carton_price = calculate_standard_box_sen(ext_L, ext_W, ext_H, *pricing)[:2]
+        long_cost, long_price = calculate_nesting_piece_sen(nesting_long[0], nesting_long[1], *pricing)[:2]
+        short_cost, short_price = calculate_nesting_piece_sen(nesting_short[0], nesting_short[1], *pricing)[:2]
+        # Pads are cut from the roll like the app's layer-pad quotes
+        pad_cost, pad_price = calculate_layer_pad_sen(int_L, int_W, *pricing)[:2]
+    except ValueError:
+        return None
+    # Per tier: qty_W + 1 long and qty_L + 1 short nesting strips
+    long_qty = (qty_W + 1) * qty_H
+    short_qty = (qty_L + 1) * qty_H
+
+    total_cost = carton_cost + long_cost * long_qty + short_cost * short_qty + pad_cost * layer_qty
+    total_price = carton_price + long_price * long_qty + short_price * short_qty + pad_price * layer_qty
+    target_qty = qty_L * qty_W * qty_H
+    return {
+        "orientation": orientation,
+        "qty_L": qty_L, "qty_W": qty_W, "qty_H": qty_H,
+        "layer_qty": layer_qty,
+        "external_size": (ext_L, ext_W, ext_H),
+        "internal_size": (int_L, int_W, int_H * qty_H),
+        "nesting_long": nesting_long, "nesting_long_qty": long_qty,
+        "nesting_short": nesting_short, "nesting_short_qty": short_qty,
+        "carton_cost": sen_to_rm(carton_cost),
+        "carton_cost_sen": carton_cost,
+        "total_cost": sen_to_rm(total_cost),
+        "total_price": sen_to_rm(total_price),
+        "total_cost_sen": total_cost,
+        "total_price_sen": total_price,
+        "cost_per_unit": sen_to_rm(total_cost) / target_qty,
+        "price_per_unit": sen_to_rm(total_price) / target_qty,
+    }
+
+def _price_chunk(chunk, params):
+    return [result for result in (price_design(candidate, params) for candidate in chunk) if result is not None]
+
+# ==================== SWEEP ====================
+def sweep_designs(product_L, product_W, product_H, bubble, thickness, allowance, target_qty, layer_thick,
+                  grammage, costing, selling, adjustment, top=10, workers=None, chunk_size=2000, layer_pad_extra=(0, 1, 2)):
+    # Cheapest carton + nesting + layer pad designs for target_qty products,
+    # ranked by cost per unit. Candidates are priced in order of their carton
+    # cost bound in waves of chunks; after each wave every candidate whose
+    # bound is already above the top-th best cost is dominated and dropped.
+    # Workers are spawned, not forked: a fork of a threaded caller (the
+    # Streamlit server) can inherit held locks and hang.
+    params = {
+        "bubble": bubble, "thickness": thickness, "allowance": allowance, "layer_thick": layer_thick,
+        "grammage": grammage, "costing": costing, "selling": selling, "adjustment": adjustment,
+    }
+    bounded = []
+    for candidate in enumerate_candidates(product_L, product_W, product_H, target_qty, layer_pad_extra):
+        carton = build_carton(*candidate, bubble, thickness, allowance, layer_thick)
+        bound = carton_cost_bound(carton[3], carton[4], carton[5], grammage, costing) / target_qty
+        bounded.append((bound, candidate))
+    bounded.sort(key=lambda item: item[0])
+
+    workers = workers or os.cpu_count() or 1
+    wave_size = chunk_size * workers
+    best = []  # max-heap on cost_per_unit of the current top results
+    counter = itertools.count()
+    executor = None
+    if workers > 1 and len(bounded) > chunk_size:
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        start = 0
+        while start < len(bounded):
+            cutoff = -best[0][0] if len(best) == top else float("inf")
+            if bounded[start][0] > cutoff:
+                break
+            wave = [candidate for bound, candidate in bounded[start:start + wave_size] if bound <= cutoff]
+            start += wave_size
+            chunks = [wave[i:i + chunk_size] for i in range(0, len(wave), chunk_size)]
+            if executor is None:
+                priced = [_price_chunk(chunk, params) for chunk in chunks]
+            else:
+                priced = executor.map(_price_chunk, chunks, itertools.repeat(params))
+            for results in priced:
+                for result in results:
+                    entry = (-result["cost_per_unit"], next(counter), result)
+                    if len(best) < top:
+                        heapq.heappush(best, entry)
+                    elif entry[0] > best[0][0]:
+                        heapq.heapreplace(best, entry)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return [result for _, _, result in sorted(best, key=lambda entry: (-entry[0], entry[1]))]
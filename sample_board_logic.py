@@ -1,18 +1,7 @@
-
 import streamlit as st
-import math
 
-def calculate_sample_board(L, W, UPS, G, C, S, Q, A):
-    length_m = L / 1000
-    width_m = W / 1000
-    cost_per_piece = length_m * width_m * G * C
-    selling_price = length_m * width_m * G * S * (1 + A / 100)
-    total_price = selling_price * Q
-    board_area = 1.05 * 0.75  # Fixed board size
-    piece_area = length_m * width_m
-    ups_per_board = math.floor(board_area / piece_area)
-    boards_needed = math.ceil(Q / ups_per_board)
-    return cost_per_piece, selling_price, total_price, ups_per_board, boards_needed
+from quotation_core.money import PRICING_NOTE
+from quotation_core.sample_board import calculate_sample_board
 
 st.title("Sample Board Calculator")
 
@@ -24,11 +13,20 @@ C = st.number_input("Costing Tonnage", value=2.7)
 S = st.number_input("Selling Tonnage", value=3.4)
 Q = st.number_input("Quantity", value=100)
 A = st.number_input("Adjustment %", value=0.0)
+board_L = st.number_input("Board Length (mm)", value=1050.0)
+board_W = st.number_input("Board Width (mm)", value=750.0)
 
 if st.button("Calculate Sample Board"):
-    cp, sp, tp, ups_calc, boards_needed = calculate_sample_board(L, W, UPS, G, C, S, Q, A)
-    st.write(f"Cost per Piece: RM {cp:.4f}")
-    st.write(f"Selling Price per Piece: RM {sp:.4f}")
-    st.write(f"Total Price: RM {tp:.2f}")
-    st.write(f"UPS per Board: {ups_calc}")
-    st.write(f"Boards Needed: {boards_needed}")
+    try:
+        cp, sp, tp, ups_calc, boards_needed, waste = calculate_sample_board(L, W, UPS, G, C, S, Q, A, board_L, board_W)
+    except ValueError as exc:
+        # The piece does not fit on the board
+        st.write(str(exc))
+    else:
+        st.write(f"Cost per Piece: RM {cp:.2f}")
+        st.write(f"Selling Price per Piece: RM {sp:.2f}")
+        st.write(f"Total Price: RM {tp:.2f}")
+        st.caption(PRICING_NOTE)
+        st.write(f"UPS per Board: {ups_calc}")
+        st.write(f"Boards Needed: {boards_needed}")
+        st.write(f"Board Waste: {waste:.1f}%")
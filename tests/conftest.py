@@ -0,0 +1,36 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    # Quote stores, roll fit tables and catalogs go to a scratch directory
+    monkeypatch.setenv("QUOTATION_CORE_CACHE", str(tmp_path / "cache"))
+    return tmp_path / "cache"
+
+def random_specs(product, count, seed=1):
+    # count argument dicts for a product type, sizes that fit the roll
+    rng = random.Random(seed)
+    sizes = {
+        "carton-box": lambda: {"length": rng.randint(100, 700), "width": rng.randint(80, 500),
+                               "height": rng.randint(60, 500)},
+        "pizza-box": lambda: {"length": rng.randint(150, 900), "width": rng.randint(100, 800)},
+        "layer-pad": lambda: {"length": rng.randint(150, 1000), "width": rng.randint(100, 800)},
+        "sample-board": lambda: {"length": rng.randint(100, 600), "width": rng.randint(100, 500),
+                                 "ups": rng.randint(1, 8)},
+        "nesting-piece": lambda: {"length": rng.randint(100, 900), "height": rng.randint(20, 400)},
+    }[product]
+    specs = []
+    for _ in range(count):
+        spec = {name: float(value) if name != "ups" else value for name, value in sizes().items()}
+        if rng.random() < 0.3:
+            spec = {name: value + 0.5 if name != "ups" else value for name, value in spec.items()}
+        spec.update(grammage=rng.choice((0.6, 0.775, 0.84, 1.1)), costing=round(rng.uniform(2.3, 3.2), 2),
+                    selling=round(rng.uniform(3.0, 4.0), 2), quantity=rng.choice((1, 100, 2500)),
+                    adjustment=rng.choice((0.0, 2.5, -3.0)))
+        specs.append(spec)
+    return specs
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from conftest import random_specs
+from quotation_core.batch import BATCH_CALCULATORS, MONEY_BATCH_CALCULATORS
+from quotation_core.calculations import CALCULATORS
+from quotation_core.money import MONEY_CALCULATORS
+from quotation_core.products import PRODUCT_TYPES
+
+@pytest.mark.parametrize("product", list(PRODUCT_TYPES))
+def test_batch_matches_scalar(product):
+    specs = random_specs(product, 500)
+    names = PRODUCT_TYPES[product].argument_names
+    arrays = [np.array([spec[name] for spec in specs], dtype=np.float64) for name in names]
+    batch = BATCH_CALCULATORS[product](*arrays)
+    steps = PRODUCT_TYPES[product].scalar(PRODUCT_TYPES[product].batch_outputs)
+    for i, spec in enumerate(specs):
+        args = [spec[name] for name in names]
+        row = tuple(float(column[i]) for column in batch)
+        assert row[:3] == CALCULATORS[product](*args)[:3]
+        # The layout outputs too, not just the prices
+        assert row == tuple(map(float, steps(*args)))
+
+@pytest.mark.parametrize("product", list(PRODUCT_TYPES))
+def test_sen_batch_matches_scalar(product):
+    specs = random_specs(product, 500, seed=2)
+    names = PRODUCT_TYPES[product].argument_names
+    arrays = [np.array([spec[name] for spec in specs], dtype=np.float64) for name in names]
+    batch = MONEY_BATCH_CALCULATORS[product](*arrays)
+    for i, spec in enumerate(specs):
+        scalar = MONEY_CALCULATORS[product](*(spec[name] for name in names))
+        assert tuple(int(column[i]) for column in batch) == scalar
+
+def test_batch_broadcasts_scalars():
+    cost, _, total, *_ = BATCH_CALCULATORS["carton-box"](np.array([300.0, 400.0]), 200.0, 150.0, 0.84, 2.7, 3.4,
+                                                          np.array([10.0, 20.0]), 0.0)
+    assert cost.shape == total.shape == (2,)
+
+def test_batch_rejects_non_positive_raw_widths():
+    # Raw width is width + 4 mm; a negative one would fit a negative number of pieces
+    with pytest.raises(ValueError, match="Raw width must be positive, got -100 mm in row 1"):
+        BATCH_CALCULATORS["layer-pad"](np.array([300.0, 300.0]), np.array([200.0, -104.0]), 0.84, 2.7, 3.4,
+                                       100.0, 0.0)
+
+def test_batch_rejects_zero_ups():
+    with pytest.raises(ValueError):
+        BATCH_CALCULATORS["carton-box"](np.array([300.0]), np.array([2000.0]), np.array([900.0]), 0.84, 2.7, 3.4,
+                                        100.0, 0.0)
@@ -0,0 +1,44 @@
+import os
+
+from benchmarks import run
+from benchmarks.run import best_of, compare, summarize, temporary_cache
+
+def result(p50_us):
+    return {"throughput": 1e6 / p50_us, "p50_us": p50_us, "p95_us": p50_us * 2, "p99_us": p50_us * 10,
+            "mean_us": p50_us}
+
+def test_gate_needs_the_threshold_and_the_floor():
+    baseline = {"fast": result(1.0), "slow": result(1000.0)}
+    # +50% on a 1 us call is under the 1 us floor; +10% on 1 ms is under the threshold
+    assert compare({"fast": result(1.5), "slow": result(1100.0)}, baseline, 0.25) == []
+    regressions = compare({"fast": result(2.5), "slow": result(1300.0)}, baseline, 0.25)
+    assert [regression.split(":")[0] for regression in regressions] == ["fast", "slow"]
+    # Tail latency alone never fails the gate
+    assert compare({"slow": dict(result(1000.0), p99_us=1e9)}, baseline, 0.25) == []
+    assert compare({"new": result(5.0)}, baseline, 0.25) == []
+
+def test_best_of_keeps_the_fastest_round():
+    rounds = iter([summarize([3e-6, 5e-6], 2), summarize([1e-6, 9e-6], 2), summarize([2e-6, 2e-6], 2)])
+    best = best_of(lambda: next(rounds), 3)
+    assert best["p50_us"] == 1.0
+    assert best["throughput"] == summarize([2e-6, 2e-6], 2)["throughput"]
+
+def test_temporary_cache_restores_the_environment(cache_dir):
+    with temporary_cache() as scratch:
+        assert os.environ["QUOTATION_CORE_CACHE"] == scratch
+        assert os.path.isdir(scratch)
+    assert os.environ["QUOTATION_CORE_CACHE"] == str(cache_dir)
+    assert not os.path.exists(scratch)
+
+def test_a_benchmark_gets_the_same_specs_alone(monkeypatch):
+    # --only skips the other benchmarks; that must not change the workload
+    seen = []
+    monkeypatch.setattr(run, "bench_single", lambda func, specs: seen.append(specs))
+    for _, bench in run.single_quote_benchmarks(20):
+        bench()
+    everything = dict(zip([name for name, _ in run.single_quote_benchmarks(20)], seen))
+    seen.clear()
+    benches = dict(run.single_quote_benchmarks(20))
+    benches["single.nesting"]()
+    benches["single.nesting"]()
+    assert seen == [everything["single.nesting"]] * 2
@@ -0,0 +1,29 @@
+import json
+import os
+import subprocess
+import sys
+
+from quotation_core.cli import main
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_core_imports_without_streamlit_or_numpy():
+    # streamlit is made unimportable; the core must not need it, nor NumPy
+    code = ("import sys; sys.modules['streamlit'] = None; import quotation_core, quotation_core.cli; "
+            "assert 'numpy' not in sys.modules; print(quotation_core.calculate_standard_box(300, 200, 150, 0.84, "
+            "2.7, 3.4, 100, 0)[0])")
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert float(result.stdout) > 0
+
+def test_command_prints_prices(capsys):
+    assert main(["carton-box", "--length", "300", "--width", "200", "--height", "150", "--grammage", "0.84",
+                 "--costing", "2.7", "--selling", "3.4", "--quantity", "100", "--adjustment", "0"]) == 0
+    result = json.loads(capsys.readouterr().out)
+    assert result["total_sen"] == result["unit_price_sen"] * 100
+    assert set(result) >= {"cost", "unit_price", "total", "formula", "cost_sen"}
+
+def test_command_error_is_json(capsys):
+    assert main(["carton-box", "--length", "300", "--width", "2000", "--height", "900", "--grammage", "0.84",
+                 "--costing", "2.7", "--selling", "3.4", "--quantity", "100", "--adjustment", "0"]) == 1
+    assert "error" in json.loads(capsys.readouterr().out)
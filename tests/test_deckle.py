@@ -0,0 +1,44 @@
+import math
+
+import pytest
+
+from quotation_core.deckle import plan_deckle
+
+ORDERS = [("A", 612.5, 1530.0, 400), ("B", 455.0, 1210.0, 900), ("C", 612.0, 980.0, 250), ("D", 301.0, 2040.0, 1200),
+          ("E", 777.0, 1500.0, 80)]
+
+def test_runs_meet_every_order():
+    plan = plan_deckle(ORDERS)
+    demand = {}
+    for _, raw_width, paper_length, quantity in ORDERS:
+        lane = math.ceil(raw_width)
+        demand[lane] = demand.get(lane, 0) + quantity * paper_length / 1000
+    produced = {}
+    for run in plan["runs"]:
+        assert run["used_width"] + 25 <= run["roll_width"]
+        assert run["used_width"] == sum(width * lanes for width, lanes in run["lanes"])
+        for width, lanes in run["lanes"]:
+            produced[width] = produced.get(width, 0) + lanes * run["run_length_m"]
+    assert produced == pytest.approx(demand)
+    assert set(plan["orders"]) == {order[0] for order in ORDERS}
+    assert plan["unplaced"] == []
+
+def test_combined_trim_is_no_worse_than_single_orders():
+    plan = plan_deckle(ORDERS)
+    for result in plan["orders"].values():
+        assert result["effective_width_m"] <= result["single_effective_width_m"] + 1e-9
+
+def test_too_wide_orders_are_unplaced():
+    plan = plan_deckle([("wide", 2500.0, 1000.0, 10), ("ok", 500.0, 1000.0, 10)])
+    assert plan["unplaced"] == ["wide"]
+    assert list(plan["orders"]) == ["ok"]
+
+def test_no_usable_roll():
+    with pytest.raises(ValueError):
+        plan_deckle(ORDERS, roll_widths=[20])
+
+def test_non_positive_quantities_are_rejected():
+    with pytest.raises(ValueError, match="Order B: quantity must be positive"):
+        plan_deckle([("A", 500.0, 1000.0, 10), ("B", 500.0, 1000.0, -10)])
+    with pytest.raises(ValueError, match="Order A: quantity must be positive"):
+        plan_deckle([("A", 500.0, 1000.0, 0)])
@@ -0,0 +1,88 @@
+import csv
+import io
+import os
+import stat
+
+import numpy as np
+import pytest
+
+from conftest import random_specs
+from quotation_core.cli import run_command
+from quotation_core.export import default_columns, export_quotes, export_rows, quote_rows
+
+openpyxl = pytest.importorskip("openpyxl")
+
+def test_quote_rows_match_run_command():
+    specs = random_specs("carton-box", 300)
+    columns = default_columns("carton-box")
+    for spec, row in zip(specs, quote_rows("carton-box", specs, chunk_size=64)):
+        expected = dict(spec, **run_command("carton-box", spec))
+        assert row == tuple(expected[column] for column in columns)
+
+def test_quote_rows_take_arrays():
+    rows = list(quote_rows("layer-pad", {"length": np.array([500.0, 600.0]), "width": 400.0, "grammage": 0.84,
+                                         "costing": 2.7, "selling": 3.4, "quantity": 10, "adjustment": 0.0},
+                           ["length", "total_sen"]))
+    assert [row[0] for row in rows] == [500.0, 600.0]
+
+def test_csv_and_xlsx_hold_the_rows(tmp_path):
+    specs = random_specs("pizza-box", 50)
+    columns = ["length", "width", "quantity", "unit_price", "unit_price_sen", "total_sen"]
+    expected = list(quote_rows("pizza-box", specs, columns))
+    assert export_quotes("pizza-box", specs, tmp_path / "quotes.csv", columns) == 50
+    with open(tmp_path / "quotes.csv", newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == columns
+    assert rows[1:] == [[str(value) for value in row] for row in expected]
+    assert export_quotes("pizza-box", specs, tmp_path / "quotes.xlsx", columns, title="Pizza: Q1") == 50
+    sheet = openpyxl.load_workbook(tmp_path / "quotes.xlsx").active
+    assert sheet.title == "Pizza Q1"
+    assert sheet.freeze_panes == "A2"
+    rows = list(sheet.iter_rows(values_only=True))
+    assert rows[0] == tuple(columns)
+    # openpyxl writes floats to 16 significant digits; the sen stay exact
+    for row, expected_row in zip(rows[1:], expected):
+        assert row == pytest.approx(expected_row, rel=1e-15)
+        assert row[-2:] == expected_row[-2:]
+    assert len(rows) == len(expected) + 1
+
+def test_xlsx_cells_excel_cannot_hold_become_text():
+    stream = io.BytesIO()
+    export_rows([(float("nan"), "a\x00b", None)], ["x", "y", "z"], stream, "xlsx")
+    assert list(openpyxl.load_workbook(stream).active.iter_rows(min_row=2, values_only=True)) == [("nan", "ab", None)]
+
+def test_pdf(tmp_path):
+    assert export_quotes("sample-board", random_specs("sample-board", 500), tmp_path / "quotes.pdf") == 500
+    data = (tmp_path / "quotes.pdf").read_bytes()
+    assert data.startswith(b"%PDF-1.4") and data.endswith(b"%%EOF\n")
+    assert data.count(b"/Type /Page ") > 1
+
+@pytest.mark.parametrize("fmt", ["csv", "xlsx", "pdf"])
+def test_bad_spec_leaves_the_target_alone(tmp_path, fmt):
+    target = tmp_path / f"quotes.{fmt}"
+    target.write_bytes(b"previous")
+    specs = random_specs("carton-box", 30) + [dict(random_specs("carton-box", 1)[0], width=2000.0, height=900.0)]
+    with pytest.raises(ValueError, match="Spec 31"):
+        export_quotes("carton-box", specs, target, chunk_size=8)
+    assert target.read_bytes() == b"previous"
+    assert sorted(path.name for path in tmp_path.iterdir()) == [target.name]
+
+@pytest.mark.skipif(os.name != "posix", reason="POSIX permission bits")
+def test_exports_get_normal_file_modes(tmp_path):
+    old_umask = os.umask(0o022)
+    try:
+        export_quotes("carton-box", random_specs("carton-box", 3), tmp_path / "new.csv")
+        kept = tmp_path / "kept.csv"
+        kept.write_bytes(b"previous")
+        kept.chmod(0o640)
+        export_quotes("carton-box", random_specs("carton-box", 3), kept)
+    finally:
+        os.umask(old_umask)
+    assert stat.S_IMODE((tmp_path / "new.csv").stat().st_mode) == 0o644
+    assert stat.S_IMODE(kept.stat().st_mode) == 0o640
+
+def test_unknown_format_and_columns(tmp_path):
+    with pytest.raises(ValueError, match="Unknown export format"):
+        export_rows([], ["a"], tmp_path / "quotes.txt")
+    with pytest.raises(ValueError, match="Unknown column"):
+        list(quote_rows("carton-box", [], ["nope"]))
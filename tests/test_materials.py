@@ -0,0 +1,90 @@
+import io
+import math
+
+import pytest
+
+from conftest import random_specs
+from quotation_core.materials import aggregate_materials, grammage_totals, read_orders, write_materials
+from quotation_core.products import PRODUCT_TYPES
+
+MEASURE = ("ups", "paper_length_m", "roll_width_mm", "area_m2")
+
+def orders(count, seed=1):
+    lines = []
+    for product in ("carton-box", "pizza-box", "layer-pad", "nesting-piece"):
+        for spec in random_specs(product, count, seed):
+            line = {name: spec[name] for name, _ in PRODUCT_TYPES[product].arguments}
+            line.update(product=product, grammage=spec["grammage"], quantity=spec["quantity"])
+            lines.append(line)
+    return lines
+
+def test_totals_match_line_by_line():
+    lines = orders(100)
+    expected = {}
+    for line in lines:
+        product = PRODUCT_TYPES[line["product"]]
+        ups, length, roll_width, area = product.scalar(MEASURE, arguments=[n for n, _ in product.arguments])(
+            *(line[name] for name, _ in product.arguments))
+        sheets = math.ceil(line["quantity"] / ups)
+        total = expected.setdefault((line["grammage"], roll_width), [0, 0, 0, 0.0, 0.0])
+        total[0] += 1
+        total[1] += line["quantity"]
+        total[2] += sheets
+        total[3] += sheets * length
+        total[4] += line["quantity"] * area
+    rows = aggregate_materials(lines)
+    assert [(row["grammage"], row["roll_width_mm"]) for row in rows] == sorted(expected)
+    for row in rows:
+        lines_, pieces, sheets, metres, net = expected[row["grammage"], row["roll_width_mm"]]
+        assert (row["lines"], row["pieces"], row["sheets"]) == (lines_, pieces, sheets)
+        assert row["roll_metres"] == pytest.approx(metres, abs=1e-3)
+        assert row["area_m2"] == pytest.approx(metres * row["roll_width_mm"] / 1000, abs=2e-3)
+        assert row["net_area_m2"] == pytest.approx(net, abs=1e-3)
+        assert row["tonnes"] == pytest.approx(row["area_m2"] * row["grammage"] / 1000, abs=1e-3)
+
+def test_chunk_size_does_not_change_totals():
+    lines = orders(50, seed=3)
+    chunked, whole = aggregate_materials(lines, chunk_size=7), aggregate_materials(iter(lines))
+    assert len(chunked) == len(whole)
+    for a, b in zip(chunked, whole):
+        # Float sums only differ in the order they were added
+        assert a == pytest.approx(b, abs=2e-3)
+
+def test_grammage_totals():
+    rows = aggregate_materials(orders(30))
+    totals = grammage_totals(rows)
+    assert [row["grammage"] for row in totals] == sorted({row["grammage"] for row in rows})
+    assert sum(row["pieces"] for row in totals) == sum(row["pieces"] for row in rows)
+
+def test_nesting_lines_expand():
+    line = {"product": "nesting", "grammage": 0.84, "quantity": 10, "product_L": 100.0, "product_W": 80.0,
+            "product_H": 120.0, "bubble": False, "thickness": 3.0, "allowance": 5.0, "qty_L": 3, "qty_W": 2,
+            "qty_H": 2, "layer_thick": 3.0, "layer_qty": 2}
+    rows = aggregate_materials([line])
+    # Carton, long and short partitions (which may share a roll width) and pads
+    assert sum(row["lines"] for row in rows) == 4
+    assert sum(row["pieces"] for row in rows) == 10 + 10 * 3 + 10 * 4 + 10 * 2
+
+def test_bad_orders():
+    with pytest.raises(ValueError, match="Line 2: unknown product"):
+        list(read_orders(io.StringIO("product,length,width,grammage,quantity\nlid,1,1,0.84,1\n")))
+    with pytest.raises(ValueError, match="Order 2: layer-pad raw width"):
+        aggregate_materials([{"product": "layer-pad", "length": 300.0, "width": 200.0, "grammage": 0.84, "quantity": 1},
+                             {"product": "layer-pad", "length": 300.0, "width": 5000.0, "grammage": 0.84,
+                              "quantity": 1}])
+    with pytest.raises(ValueError, match="Line 3: quantity must be positive"):
+        list(read_orders(io.StringIO("product,length,width,grammage,quantity\n"
+                                     "layer-pad,300,200,0.84,5\nlayer-pad,300,200,0.84,-5\n")))
+    with pytest.raises(ValueError, match="Order 1: quantity must be positive"):
+        aggregate_materials([{"product": "layer-pad", "length": 300.0, "width": 200.0, "grammage": 0.84,
+                              "quantity": 0}])
+
+def test_csv_round_trip():
+    text = ("product,length,width,height,grammage,quantity\n"
+            "carton-box,300,200,150,0.84,100\n"
+            "layer-pad,300,200,,0.84,50\n")
+    rows = aggregate_materials(read_orders(io.StringIO(text)))
+    out = io.StringIO()
+    write_materials(rows, out)
+    assert out.getvalue().splitlines()[0].startswith("grammage,roll_width_mm,lines,pieces")
+    assert sum(row["pieces"] for row in rows) == 150
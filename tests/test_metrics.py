@@ -0,0 +1,82 @@
+import os
+import subprocess
+import sys
+import urllib.request
+
+import pytest
+
+from quotation_core import metrics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture
+def metrics_on():
+    was = metrics.enabled()
+    metrics.set_enabled(True)
+    metrics.reset()
+    yield
+    metrics.set_enabled(was)
+    metrics.reset()
+
+def test_instrument_records_calls_and_errors(metrics_on):
+    @metrics.instrument
+    def calculate_thing(value):
+        if value < 0:
+            raise ValueError("negative")
+        return value
+
+    for value in range(5):
+        calculate_thing(value)
+    with pytest.raises(ValueError):
+        calculate_thing(-1)
+    text = metrics.render()
+    assert 'quotation_call_seconds_count{function="test_metrics.calculate_thing"} 6' in text
+    assert 'quotation_call_errors_total{function="test_metrics.calculate_thing",error="ValueError"} 1' in text
+    # Switched off, the wrapper stops recording
+    metrics.set_enabled(False)
+    calculate_thing(1)
+    assert 'calculate_thing"} 6' in metrics.render()
+
+def test_functions_decorated_while_off_are_not_wrapped():
+    was = metrics.enabled()
+    metrics.set_enabled(False)
+    try:
+        def calculate_thing():
+            pass
+        assert metrics.instrument(calculate_thing) is calculate_thing
+    finally:
+        metrics.set_enabled(was)
+
+def test_cache_ratio_and_dropped_owners(metrics_on):
+    class Cache:
+        hits, misses = 3, 1
+    cache = Cache()
+    metrics.register_cache("test_cache", lambda owner: (owner.hits, owner.misses), owner=cache)
+    text = metrics.render()
+    assert 'quotation_cache_requests_total{cache="test_cache",result="hit"} 3' in text
+    assert 'quotation_cache_hit_ratio{cache="test_cache"} 0.75' in text
+    del cache
+    assert "test_cache" not in metrics.render()
+
+def test_endpoint(metrics_on):
+    server = metrics.start_http_server(0)
+    try:
+        # Loopback unless a host is asked for
+        assert server.server_address[0] == "127.0.0.1"
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        with urllib.request.urlopen(url + "/metrics") as response:
+            assert response.status == 200
+            assert "# TYPE quotation_call_seconds histogram" in response.read().decode()
+        metrics.set_enabled(False)
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(url + "/metrics")
+        assert error.value.code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_http_server_is_imported_lazily():
+    code = "import sys, quotation_core, quotation_core.calculations; assert 'http.server' not in sys.modules"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True,
+                            env=dict(os.environ, QUOTATION_CORE_METRICS="1"))
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,46 @@
+import pytest
+
+from conftest import random_specs
+from quotation_core.carton_box import calculate_carton_box_price
+from quotation_core.layer_pad import calculate_layer_pad_price
+from quotation_core.money import (
+    MONEY_CALCULATORS, calculate_carton_box_price_sen, calculate_layer_pad_price_sen, calculate_pizza_box_price_sen,
+    format_rm, round_sen
+)
+from quotation_core.pizza_box import calculate_pizza_box_price
+from quotation_core.products import CARTON_BOX_PAGE, LAYER_PAD_PAGE, PIZZA_BOX_PAGE, PRODUCT_TYPES
+
+PAGES = [
+    ("carton-box", CARTON_BOX_PAGE, calculate_carton_box_price, calculate_carton_box_price_sen),
+    ("pizza-box", PIZZA_BOX_PAGE, calculate_pizza_box_price, calculate_pizza_box_price_sen),
+    ("layer-pad", LAYER_PAD_PAGE, calculate_layer_pad_price, calculate_layer_pad_price_sen),
+]
+
+def test_round_sen_rounds_halves_up():
+    assert [round_sen(value) for value in (0.125, 0.124999, 0.5, -0.125, 2.675)] == [13, 12, 50, -12, 268]
+
+def test_format_rm():
+    assert [format_rm(sen) for sen in (0, 5, 123456, -99, -123456)] == ["0.00", "0.05", "1,234.56", "-0.99",
+                                                                       "-1,234.56"]
+
+@pytest.mark.parametrize("product", list(PRODUCT_TYPES))
+def test_sen_prices_are_the_float_prices_rounded_once(product):
+    product_type = PRODUCT_TYPES[product]
+    prices = product_type.scalar(("cost", "unit_price", "cost_sen", "unit_price_sen", "total_sen"))
+    for spec in random_specs(product, 500):
+        cost, unit_price, cost_sen, unit_price_sen, total_sen = prices(*(spec[name] for name in
+                                                                         product_type.argument_names))
+        assert (cost_sen, unit_price_sen) == (round_sen(cost), round_sen(unit_price))
+        assert total_sen == unit_price_sen * int(spec["quantity"])
+        assert MONEY_CALCULATORS[product](*(spec[name] for name in product_type.argument_names))[:3] == \
+            (cost_sen, unit_price_sen, total_sen)
+
+@pytest.mark.parametrize("product, page, page_price, page_sen", PAGES)
+def test_pages_show_their_sen_prices(product, page, page_price, page_sen):
+    floats = page.scalar(("cost", "unit_price"))
+    for spec in random_specs(product, 500):
+        args = [spec[name] for name in page.argument_names]
+        cost_sen, unit_price_sen, total_sen = page_sen(*args)[:3]
+        assert page_price(*args)[:3] == (cost_sen / 100, unit_price_sen / 100, total_sen / 100)
+        assert (cost_sen, unit_price_sen) == tuple(round_sen(value) for value in floats(*args))
+        assert total_sen == unit_price_sen * int(spec["quantity"])
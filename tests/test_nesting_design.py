@@ -0,0 +1,48 @@
+import math
+import random
+
+from quotation_core.fit_search import search_fit
+from quotation_core.nesting_design import calculate_nesting_design, nesting_layer_plan
+
+def test_search_beats_or_matches_the_plain_grid():
+    rng = random.Random(3)
+    for _ in range(300):
+        carton = [rng.uniform(150, 800) for _ in range(3)]
+        item = [rng.uniform(20, 300) for _ in range(3)]
+        grid = math.prod(math.floor(c / i) for c, i in zip(carton, item))
+        search = search_fit(*carton, *item)
+        assert grid <= search["total_fit"] <= search["volume_bound"]
+        assert sum(layer["packed"][2] * layer["layers"] for layer in search["layers"]) <= carton[2] + 1e-9
+        assert sum(layer["per_layer"] * layer["layers"] for layer in search["layers"]) == search["total_fit"]
+        for layer in search["layers"]:
+            # packed is the way round the layer's first block stands
+            assert layer["packed"][:2] == layer["blocks"][0][:2]
+            assert sorted(layer["packed"]) == sorted(item)
+
+def test_nesting_follows_the_searched_layers():
+    rng = random.Random(4)
+    thickness = 3.0
+    for _ in range(300):
+        product = [rng.uniform(20, 300) for _ in range(3)]
+        carton = [rng.uniform(150, 900) for _ in range(3)]
+        result = calculate_nesting_design(*product, False, thickness, 30, 10, *carton, 1.0, True)
+        assert len(result) == 18
+        fit_H, total_fit, int_H = result[10], result[11], result[14]
+        layer_plan = nesting_layer_plan(*product, False, thickness, *carton, True)
+        if not fit_H:
+            continue
+        assert sum(layer["layers"] for layer in layer_plan) == fit_H
+        assert sum(layer["per_layer"] * layer["layers"] for layer in layer_plan) == total_fit
+        assert result[7] == fit_H + 1
+        # Layers, their nesting slack and the pads fill the carton height
+        used = sum(layer["nesting_height"] * layer["layers"] for layer in layer_plan) + (fit_H + 1) * thickness
+        assert abs(used - int_H) <= 0.005 * fit_H + 1e-6
+
+def test_without_search_every_layer_is_the_same():
+    result = calculate_nesting_design(150, 120, 60, True, 3.0, 30, 10, 600, 500, 300, 1.0)
+    fit_L, fit_W, fit_H = result[8:11]
+    assert nesting_layer_plan(150, 120, 60, True, 3.0, 600, 500, 300) == [{"packed": (160, 130, 70), "per_layer": fit_L * fit_W, "layers": fit_H,
+                           "nesting_height": result[6]}]
+
+def test_nothing_fits_has_no_layers():
+    assert nesting_layer_plan(150, 120, 600, True, 3.0, 600, 500, 300) == []
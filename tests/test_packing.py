@@ -0,0 +1,43 @@
+import math
+import random
+
+import pytest
+
+from quotation_core.packing import boards_needed, pack_board
+
+EPSILON = 1e-6
+
+def assert_valid_layout(layout, piece, board):
+    # Every placement is the piece either way round, on the board, and no two overlap
+    for x, y, length, width in layout:
+        assert sorted((length, width)) == pytest.approx(sorted(piece))
+        assert x >= -EPSILON and y >= -EPSILON
+        assert x + length <= board[0] + EPSILON and y + width <= board[1] + EPSILON
+    for i, (x1, y1, l1, w1) in enumerate(layout):
+        for x2, y2, l2, w2 in layout[i + 1:]:
+            assert x1 + l1 <= x2 + EPSILON or x2 + l2 <= x1 + EPSILON or \
+                y1 + w1 <= y2 + EPSILON or y2 + w2 <= y1 + EPSILON
+
+def test_layouts_fit_without_overlap():
+    rng = random.Random(8)
+    for _ in range(150):
+        piece = (rng.uniform(40, 500), rng.uniform(40, 400))
+        board = (rng.choice((1050, 1200)), rng.choice((750, 900)))
+        packed = pack_board(*piece, *board)
+        assert packed["ups"] == len(packed["layout"])
+        assert_valid_layout(packed["layout"], piece, board)
+        grid = max(math.floor(board[0] / p) * math.floor(board[1] / q) for p, q in (piece, piece[::-1]))
+        assert packed["ups"] >= grid
+
+def test_mixed_orientation_beats_the_grid():
+    # Either grid fits 4; two of them turned leave room for a fifth
+    packed = pack_board(400, 300, 1000, 700)
+    assert packed["ups"] == 5
+    assert_valid_layout(packed["layout"], (400, 300), (1000, 700))
+
+def test_boards_needed():
+    assert boards_needed(100, 8) == 13
+    with pytest.raises(ValueError):
+        boards_needed(100, 0)
+    with pytest.raises(ValueError):
+        pack_board(0, 100)
@@ -0,0 +1,52 @@
+import random
+
+import pytest
+
+from quotation_core.pallet import PALLETS, layer_pattern, plan_pallet
+from test_packing import assert_valid_layout
+
+def test_layers_fit_without_overlap():
+    rng = random.Random(18)
+    for _ in range(100):
+        carton = (rng.randint(150, 700), rng.randint(120, 500))
+        pallet = PALLETS[rng.choice(list(PALLETS))]
+        layer = layer_pattern(*carton, *pallet)
+        assert layer["per_layer"] == len(layer["layout"])
+        assert_valid_layout(layer["layout"], carton, pallet)
+        assert layer["per_layer"] <= pallet[0] * pallet[1] // (carton[0] * carton[1])
+
+def test_pinwheel():
+    # Neither a block nor a guillotine cut fits 30 of these
+    layer = layer_pattern(210, 180, 1200, 1000)
+    assert (layer["pattern"], layer["per_layer"]) == ("pinwheel", 30)
+    assert_valid_layout(layer["layout"], (210, 180), (1200, 1000))
+
+def test_simplest_pattern_wins_ties():
+    assert layer_pattern(300, 200, 1200, 1000)["pattern"] == "block"
+
+def test_height_and_weight_limits():
+    load = plan_pallet(400, 300, 250, 12)
+    assert (load["per_layer"], load["layers"], load["cartons"], load["limited_by"]) == (10, 6, 60, "height")
+    load = plan_pallet(400, 300, 250, 30)
+    assert (load["cartons"], load["layers"], load["limited_by"]) == (33, 4, "weight")
+    assert load["load_weight"] <= 1000
+
+def test_turned_cartons_and_every_pallet():
+    upright = plan_pallet(300, 200, 900)
+    turned = plan_pallet(300, 200, 900, upright=False)
+    assert turned["cartons"] >= upright["cartons"]
+    best = plan_pallet(330, 250, 150, pallet=None)
+    assert all(best["cartons"] >= plan_pallet(330, 250, 150, pallet=name)["cartons"] for name in PALLETS)
+    assert plan_pallet(330, 250, 150, pallet=(1000, 1000))["pallet"] == "1000x1000"
+
+def test_bad_loads():
+    with pytest.raises(ValueError, match="Unknown pallet"):
+        plan_pallet(300, 200, 150, pallet="1x1")
+    with pytest.raises(ValueError, match="taller"):
+        plan_pallet(300, 200, 1600)
+    with pytest.raises(ValueError, match="does not fit"):
+        plan_pallet(1300, 200, 150)
+    with pytest.raises(ValueError, match="heavier"):
+        plan_pallet(300, 200, 150, 1200)
+    with pytest.raises(ValueError, match="positive"):
+        layer_pattern(0, 200, 1200, 1000)
@@ -0,0 +1,71 @@
+import linecache
+import pickle
+
+import numpy as np
+import pytest
+
+from conftest import random_specs
+from quotation_core.calculations import calculate_standard_box
+from quotation_core.products import CARTON_BOX, PRODUCT_TYPES, SAMPLE_BOARD, ProductType
+
+@pytest.mark.parametrize("product", list(PRODUCT_TYPES.values()), ids=str)
+def test_definitions_compile(product):
+    product.check()
+
+def test_kernels_compile_on_first_call():
+    kernel = CARTON_BOX.scalar(("area_m2",), "carton_area_lazy")
+    assert kernel is CARTON_BOX.scalar(("area_m2",), "carton_area_lazy")
+    assert "<carton-box carton_area_lazy>" not in linecache.cache
+    stub = kernel.__code__
+    area, = kernel(300.0, 200.0, 150.0, 0.84, 2.7, 3.4, 100, 0.0)
+    assert kernel.__code__ is not stub
+    assert "<carton-box carton_area_lazy>" in linecache.cache
+    assert kernel(300.0, 200.0, 150.0, 0.84, 2.7, 3.4, 100, 0.0) == (area,)
+
+def test_calculators_pickle_by_name():
+    assert pickle.loads(pickle.dumps(calculate_standard_box)) is calculate_standard_box
+
+def test_vector_matches_scalar():
+    outputs = ("cost", "unit_price", "total", "ups")
+    scalar, vector = CARTON_BOX.scalar(outputs), CARTON_BOX.vector(outputs)
+    specs = random_specs("carton-box", 200)
+    arrays = [np.array([spec[name] for spec in specs]) for name in CARTON_BOX.argument_names]
+    columns = vector(*arrays)
+    assert columns[-1].dtype == np.int64
+    for i, spec in enumerate(specs):
+        assert tuple(column[i].item() for column in columns) == scalar(*(spec[name] for name in CARTON_BOX.argument_names))
+
+def test_steps_passed_as_arguments_are_not_recomputed():
+    cost = CARTON_BOX.scalar(("cost",), arguments=("area_m2", "grammage", "costing", "adjustment"))
+    full = CARTON_BOX.scalar(("area_m2", "cost"))
+    area, expected = full(300.0, 200.0, 150.0, 0.84, 2.7, 3.4, 100, 0.0)
+    assert cost(area, 0.84, 2.7, 0.0) == (expected,)
+    assert cost(2 * area, 0.84, 2.7, 0.0)[0] == pytest.approx(2 * expected)
+    with pytest.raises(ValueError, match="needs argument"):
+        CARTON_BOX.scalar(("cost",), "short", arguments=("area_m2",))(0.06)
+
+def test_unknown_outputs_and_steps():
+    with pytest.raises(ValueError, match="unknown output"):
+        CARTON_BOX.scalar(("volume",))
+    with pytest.raises(ValueError, match="has no step"):
+        CARTON_BOX.variant("x", "", "calculate_x", volume="1")
+
+def test_bad_definitions():
+    arguments, steps = [("length", float), ("width", float)], [("area_m2", "length * width"),
+                                                               ("area_um2", "area_m2")]
+    with pytest.raises(ValueError, match="missing step"):
+        ProductType("x", "", "calculate_x", arguments, steps[:1], ("cost",), (), (), ())
+    with pytest.raises(ValueError, match="bad or repeated step"):
+        ProductType("x", "", "calculate_x", arguments, [("length", "1")] + steps, ("cost",), (), (), ())
+    # Expressions are only checked when a kernel is built
+    bad = ProductType("x", "", "calculate_x", arguments, [("area_m2", "length *")] + steps[1:],
+                      ("cost",), (), (), ())
+    with pytest.raises(ValueError, match="syntax error"):
+        bad.check()
+    with pytest.raises(ValueError):
+        bad.scalar(("cost",))(1.0, 1.0, 0.84, 2.7, 3.4, 1, 0.0)
+
+def test_int_arguments_stay_exact():
+    _, _, total_sen = SAMPLE_BOARD.scalar(("cost_sen", "unit_price_sen", "total_sen"))(
+        300.0, 200.0, 4, 0.84, 2.7, 3.4, 10 ** 15, 0.0)
+    assert isinstance(total_sen, int) and total_sen % 10 ** 15 == 0
@@ -0,0 +1,87 @@
+import csv
+import io
+import json
+
+import pytest
+
+from conftest import random_specs
+from quotation_core.cli import main, run_command
+from quotation_core.reprice import REPORT_FIELDS, reprice_quotes
+from quotation_core.store import QuoteStore
+
+TONNAGE = {0.84: (2.9, 3.7), 1.1: (2.7, 3.45)}
+
+@pytest.fixture
+def store(tmp_path):
+    store = QuoteStore(str(tmp_path / "quotes.sqlite3"))
+    for product in ("carton-box", "pizza-box", "layer-pad", "sample-board"):
+        store.quote_many(product, random_specs(product, 200), customer="acme")
+    yield store
+    store.close()
+
+def test_reprice_gives_fresh_quote_prices_and_keeps_history(store):
+    before = store.history()
+    specs = store._conn.execute("SELECT * FROM specs").fetchall()
+    report = io.StringIO()
+    summary = reprice_quotes(store, TONNAGE, report=report)
+    # The recorded quotes and specs are untouched
+    assert store.history() == before
+    assert store._conn.execute(f"SELECT * FROM specs WHERE id <= {len(specs)}").fetchall() == specs
+    repriced = 0
+    for old, new in zip(before, store.history(repricing=summary["repricing"])):
+        assert old["id"] == new["id"]
+        values = dict(old["inputs"], quantity=old["quantity"])
+        if values["grammage"] in TONNAGE:
+            values["costing"], values["selling"] = TONNAGE[values["grammage"]]
+            repriced += 1
+        fresh = run_command(old["product"], values)
+        assert new["inputs"] == {name: value for name, value in values.items() if name != "quantity"}
+        assert (new["unit_price_sen"], new["total_sen"], new["total"]) == \
+            (fresh["unit_price_sen"], fresh["total_sen"], fresh["total"])
+    assert summary["quotes_repriced"] == repriced > 0
+    rows = list(csv.DictReader(io.StringIO(report.getvalue())))
+    assert len(rows) == repriced and list(rows[0]) == list(REPORT_FIELDS)
+    assert summary["new_total_sen"] == sum(int(row["new_total_sen"]) for row in rows)
+
+def test_repriced_specs_serve_new_quotes(store):
+    reprice_quotes(store, TONNAGE)
+    quote = store.history(repricing=store.repricings()[-1]["id"], product="carton-box")[0]
+    misses = store.misses
+    values = dict(quote["inputs"], quantity=quote["quantity"])
+    assert store.quote("carton-box", values, record=False) == run_command("carton-box", values)
+    assert store.misses == misses
+
+def test_repricing_twice_reuses_the_specs(store):
+    first = reprice_quotes(store, TONNAGE)
+    specs = store._conn.execute("SELECT COUNT(*) FROM specs").fetchone()[0]
+    second = reprice_quotes(store, TONNAGE)
+    assert second["specs_existing"] == second["specs_repriced"] == first["specs_repriced"]
+    assert store._conn.execute("SELECT COUNT(*) FROM specs").fetchone()[0] == specs
+    assert second["new_total_sen"] == first["new_total_sen"]
+    assert [repricing["tonnage"] for repricing in store.repricings()] == [
+        {grammage: list(prices) for grammage, prices in TONNAGE.items()}] * 2
+
+def test_dry_run_changes_nothing(store):
+    specs = store._conn.execute("SELECT COUNT(*) FROM specs").fetchone()[0]
+    summary = reprice_quotes(store, TONNAGE, dry_run=True)
+    assert summary["quotes_repriced"] > 0
+    assert store.repricings() == []
+    assert store._conn.execute("SELECT COUNT(*) FROM specs").fetchone()[0] == specs
+
+def test_cli_reprice(store, tmp_path, capsys):
+    table = tmp_path / "tonnage.csv"
+    table.write_text("grammage,costing,selling\n0.6,2.5,3.0\n")
+    assert main(["reprice", "--store", store.path, "--tonnage", str(table)]) == 0
+    assert json.loads(capsys.readouterr().out)["quotes_repriced"] > 0
+
+def test_only_quoted_specs_are_repriced(store):
+    quoted = store._conn.execute("SELECT COUNT(DISTINCT spec_id) FROM quotes q JOIN specs s ON s.id = q.spec_id "
+                                 "WHERE s.grammage = 0.84").fetchone()[0]
+    # Priced but never quoted
+    store.quote_many("carton-box", [dict(spec, grammage=0.84) for spec in random_specs("carton-box", 50, seed=9)],
+                     record=False)
+    reprice_quotes(store, TONNAGE)
+    # The first run's specs have no quotes of their own, so a second table
+    # reprices the recorded quotes' specs again and nothing else
+    summary = reprice_quotes(store, {0.84: (3.0, 3.9)})
+    assert summary["specs_repriced"] == quoted
@@ -0,0 +1,114 @@
+import csv
+
+import pytest
+
+from conftest import random_specs
+from quotation_core.cli import run_command
+from quotation_core.products import PRODUCT_TYPES
+from quotation_core.rfq import QUOTE_FIELDS, RESULT_FIELDS, quote_file
+
+COLUMNS = ["ref", "product", "length", "width", "height", "ups", "grammage", "costing", "selling", "quantity",
+           "adjustment"]
+# Bad lines and the error each one gets
+BAD = [
+    ({"product": "lid"}, "unknown product 'lid'"),
+    ({"product": "carton-box", "length": "nan"}, "length must be a finite number"),
+    ({"product": "carton-box", "width": "inf"}, "width must be a finite number"),
+    ({"product": "carton-box", "quantity": "1" + "0" * 400}, "quantity is too large"),
+    ({"product": "sample-board", "ups": "0"}, "ups must be positive"),
+    ({"product": "carton-box", "height": "-5"}, "height must be positive"),
+    ({"product": "carton-box", "grammage": ""}, "missing grammage"),
+    ({"product": "carton-box", "quantity": "many"}, "bad quantity 'many'"),
+    ({"product": "carton-box", "quantity": "-5"}, "quantity must be positive"),
+    ({"product": "layer-pad", "selling": "0"}, "selling must be positive"),
+    ({"product": "carton-box", "adjustment": "-100"}, "adjustment must be above -100"),
+    ({"product": "carton-box", "width": "3000"}, "does not fit the 2200 mm roll"),
+    ({"product": "sample-board", "length": "1e150", "width": "1e150"}, "price is too large"),
+]
+
+def write_rfq(path, seed=1):
+    # Good lines of every product with the bad ones spread between them;
+    # returns {line: expected error or good row}
+    rows, expected = [], {}
+    good = [dict(spec, product=product) for product in PRODUCT_TYPES for spec in random_specs(product, 40, seed)]
+    base = {"product": "carton-box", "length": "300", "width": "200", "height": "150", "ups": "2",
+            "grammage": "0.84", "costing": "2.7", "selling": "3.4", "quantity": "100", "adjustment": "0"}
+    bad = iter(BAD)
+    for i, spec in enumerate(good):
+        rows.append({column: spec.get(column, "") for column in COLUMNS})
+        expected[len(rows) + 1] = spec
+        if i % 15 == 0:
+            change, error = next(bad, (None, None))
+            if change is not None:
+                rows.append(dict(base, **change))
+                expected[len(rows) + 1] = error
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, COLUMNS)
+        writer.writeheader()
+        for n, row in enumerate(rows):
+            writer.writerow(dict(row, ref=f"R{n}"))
+    return expected
+
+def read_output(path):
+    with open(path, newline="") as f:
+        return list(csv.DictReader(f))
+
+def test_good_lines_match_the_calculators_and_bad_lines_say_why(tmp_path):
+    expected = write_rfq(tmp_path / "rfq.csv")
+    summary = quote_file(tmp_path / "rfq.csv", tmp_path / "out.csv", chunk_size=37, workers=1)
+    rows = read_output(tmp_path / "out.csv")
+    assert list(rows[0]) == COLUMNS + list(RESULT_FIELDS)
+    assert summary == {"rows": len(expected), "quoted": len(expected) - len(BAD), "errors": len(BAD)}
+    for row in rows:
+        want = expected[int(row["line"])]
+        if isinstance(want, str):
+            assert want in row["error"] and row["error"].startswith(f"Line {row['line']}: ")
+            assert not any(row[field] for field in QUOTE_FIELDS)
+        else:
+            assert row["error"] == ""
+            result = run_command(row["product"], want)
+            assert [float(row[field]) for field in QUOTE_FIELDS[:3]] == [result[field] for field in QUOTE_FIELDS[:3]]
+            assert [int(row[field]) for field in QUOTE_FIELDS[3:]] == [result[field] for field in QUOTE_FIELDS[3:]]
+
+def test_workers_give_the_same_file(tmp_path):
+    write_rfq(tmp_path / "rfq.csv", seed=5)
+    one = quote_file(tmp_path / "rfq.csv", tmp_path / "one.csv", chunk_size=50, workers=1)
+    many = quote_file(tmp_path / "rfq.csv", tmp_path / "many.csv", chunk_size=50, workers=2)
+    assert one == many
+    assert (tmp_path / "one.csv").read_bytes() == (tmp_path / "many.csv").read_bytes()
+
+def test_result_columns_in_the_input_are_replaced(tmp_path):
+    (tmp_path / "rfq.csv").write_text("product,length,width,grammage,costing,selling,quantity,adjustment,error\n"
+                                      "layer-pad,300,200,0.84,2.7,3.4,10,0,old\n"
+                                      "layer-pad,300,200,0.84,2.7,3.4,10\n")
+    quote_file(tmp_path / "rfq.csv", tmp_path / "out.csv", workers=1)
+    rows = read_output(tmp_path / "out.csv")
+    assert rows[0]["error"] == "" and rows[0]["total_sen"]
+    # A short row reads its missing columns as blank
+    assert rows[1]["error"] == "Line 3: missing adjustment"
+
+def test_large_quantities_match_the_cli(tmp_path):
+    # Past 2**53 a float quantity would round the sen total
+    spec = {"length": 300, "width": 200, "height": 150, "grammage": 0.84, "costing": 2.7, "selling": 3.4,
+            "quantity": 2 ** 53 + 1, "adjustment": 0}
+    (tmp_path / "rfq.csv").write_text(",".join(["product", *spec]) + "\n"
+                                      + ",".join(["carton-box", *map(str, spec.values())]) + "\n")
+    quote_file(tmp_path / "rfq.csv", tmp_path / "out.csv", workers=1)
+    row, = read_output(tmp_path / "out.csv")
+    assert int(row["total_sen"]) == run_command("carton-box", spec)["total_sen"]
+
+def test_bad_files(tmp_path):
+    (tmp_path / "rfq.csv").write_text("length,width\n300,200\n")
+    with pytest.raises(ValueError, match="no product column"):
+        quote_file(tmp_path / "rfq.csv", tmp_path / "out.csv", workers=1)
+    with pytest.raises(ValueError, match="Unknown RFQ format"):
+        quote_file(tmp_path / "rfq.csv", tmp_path / "out.json", workers=1)
+
+def test_parquet_round_trip(tmp_path):
+    pytest.importorskip("pyarrow")
+    write_rfq(tmp_path / "rfq.csv", seed=3)
+    quote_file(tmp_path / "rfq.csv", tmp_path / "out.parquet", workers=1)
+    quote_file(tmp_path / "out.parquet", tmp_path / "again.csv", workers=1)
+    rows = read_output(tmp_path / "again.csv")
+    assert all(row["line"] == str(n) for n, row in enumerate(rows, 1))
+    assert sum(bool(row["error"]) for row in rows) == len(BAD)
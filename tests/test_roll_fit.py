@@ -0,0 +1,41 @@
+import pytest
+
+from quotation_core import roll_fit
+from quotation_core.roll_fit import (
+    MAX_ROLL_WIDTH, TABLE_FILENAME, TRIM_ALLOWANCES, build_table, compute_roll_fit, default_table_path, load_table,
+    read_table
+)
+
+def test_table_matches_direct_calculation():
+    for trim in TRIM_ALLOWANCES:
+        for width in range(1, MAX_ROLL_WIDTH + 1):
+            assert roll_fit.roll_fit(width, trim) == compute_roll_fit(width, trim)
+
+def test_fractional_and_untabulated_widths_are_computed():
+    assert roll_fit.roll_fit(333.5, 25) == compute_roll_fit(333.5, 25)
+    assert roll_fit.roll_fit(333, 30) == compute_roll_fit(333, 30)
+    with pytest.raises(ValueError):
+        roll_fit.roll_fit(MAX_ROLL_WIDTH + 1, 25)
+
+def test_table_round_trips(tmp_path):
+    path = tmp_path / "table.bin"
+    table = load_table(str(path))
+    assert read_table(str(path)) == table
+    path.write_bytes(b"junk")
+    assert read_table(str(path)) is None
+
+def test_unwritable_cache_keeps_table_in_memory(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    table = load_table(str(blocker / "sub" / TABLE_FILENAME))
+    assert table == build_table()
+
+def test_cache_directory(monkeypatch, tmp_path):
+    monkeypatch.setenv("QUOTATION_CORE_CACHE", str(tmp_path / "override"))
+    assert default_table_path() == str(tmp_path / "override" / TABLE_FILENAME)
+    monkeypatch.delenv("QUOTATION_CORE_CACHE")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "xdg"))
+    assert default_table_path() == str(tmp_path / "xdg" / "quotation_core" / TABLE_FILENAME)
+    monkeypatch.setenv("XDG_CACHE_HOME", "relative")
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    assert default_table_path() == str(tmp_path / "home" / ".cache" / "quotation_core" / TABLE_FILENAME)
@@ -0,0 +1,47 @@
+import pytest
+
+from conftest import random_specs
+from quotation_core.cli import run_command
+from quotation_core.graph import Graph
+from quotation_core.screens import build_product_graph, piece_outputs
+
+SCREEN_PRODUCTS = ("carton-box", "pizza-box", "layer-pad", "sample-board")
+
+def test_graph_recomputes_only_downstream():
+    calls = []
+    graph = Graph().add_input("a").add_input("b")
+    graph.add_node("double", ("a",), lambda a: calls.append("double") or a * 2)
+    graph.add_node("sum", ("double", "b"), lambda double, b: calls.append("sum") or double + b)
+    graph.set_inputs(a=1, b=2)
+    assert graph.get("sum") == 4
+    graph.set_inputs(b=3)
+    assert graph.get("sum") == 5
+    graph.set_inputs(a=1)
+    assert graph.get("sum") == 5
+    assert calls == ["double", "sum", "sum"]
+    with pytest.raises(KeyError):
+        graph.set_inputs(sum=1)
+
+@pytest.mark.parametrize("product", SCREEN_PRODUCTS)
+def test_screen_graph_matches_calculator(product):
+    graph = build_product_graph(product)
+    for spec in random_specs(product, 200):
+        graph.set_inputs(**spec)
+        expected = run_command(product, spec)
+        outputs = piece_outputs(graph)
+        assert outputs == {name: value for name, value in expected.items() if name not in ("total", "total_sen")}
+        assert graph.get("money") == (expected["cost_sen"], expected["unit_price_sen"], expected["total_sen"])
+
+def test_quantity_change_only_redoes_the_total():
+    graph = build_product_graph("carton-box")
+    spec = random_specs("carton-box", 1)[0]
+    graph.set_inputs(**spec)
+    graph.get("money")
+    graph.set_inputs(quantity=spec["quantity"] + 1)
+    recomputed = graph.recomputed
+    graph.get("money")
+    assert graph.recomputed - recomputed == 1
+    graph.set_inputs(costing=spec["costing"] + 0.1)
+    recomputed = graph.recomputed
+    graph.get("money")
+    assert graph.recomputed - recomputed == 3  # piece, unit_sen and money; not the geometry
@@ -0,0 +1,125 @@
+import asyncio
+import json
+
+import pytest
+
+from conftest import random_specs
+from quotation_core.cli import run_command
+from quotation_core.service import LocalClient, QuoteError, QuoteService, parse_quote
+
+SPEC = {"length": 300, "width": 200, "height": 150, "grammage": 0.84, "costing": 2.7, "selling": 3.4,
+        "quantity": 100, "adjustment": 0}
+
+@pytest.mark.parametrize("change, message", [
+    ({"length": None}, "must be a number"),
+    ({"length": "300"}, "must be a number"),
+    ({"length": True}, "must be a number"),
+    ({"length": float("nan")}, "must be a finite number"),
+    ({"length": float("inf")}, "must be a finite number"),
+    ({"length": 10 ** 400}, "must be a finite number"),
+    ({"quantity": 2.5}, "must be a whole number"),
+])
+def test_parse_quote_rejects_bad_fields(change, message):
+    with pytest.raises(QuoteError, match=message) as error:
+        parse_quote("carton-box", dict(SPEC, **change))
+    assert error.value.status == 400
+
+def test_parse_quote_requires_fields_and_an_object():
+    with pytest.raises(QuoteError, match="Missing field 'height'"):
+        parse_quote("carton-box", {name: value for name, value in SPEC.items() if name != "height"})
+    with pytest.raises(QuoteError, match="JSON object"):
+        parse_quote("carton-box", [SPEC])
+
+def test_batched_quotes_match_run_command():
+    specs = random_specs("carton-box", 50)
+    bad = dict(specs[0], width=2000.0, height=900.0)
+
+    async def run():
+        client = LocalClient()
+        try:
+            return await asyncio.gather(*(client.post("/quote/carton-box", spec) for spec in specs + [bad]))
+        finally:
+            await client.service.close()
+    responses = asyncio.run(run())
+    for spec, (status, result) in zip(specs, responses):
+        assert status == 200
+        expected = run_command("carton-box", spec)
+        for name in ("cost", "unit_price", "total", "cost_sen", "unit_price_sen", "total_sen"):
+            assert result[name] == expected[name]
+    assert responses[-1][0] == 422
+
+@pytest.mark.parametrize("product", ["carton-box", "sample-board"])
+def test_large_quantities_match_the_cli(product):
+    # Past 2 ** 53 a float quantity would round total_sen
+    specs = [dict(spec, quantity=quantity) for spec, quantity in
+             zip(random_specs(product, 3), (10 ** 15 + 1, 2 ** 53 + 1, 2 ** 62 // 10 ** 6 + 7))]
+
+    async def run():
+        client = LocalClient()
+        try:
+            return await asyncio.gather(*(client.post(f"/quote/{product}", spec) for spec in specs))
+        finally:
+            await client.service.close()
+    for spec, (status, result) in zip(specs, asyncio.run(run())):
+        assert status == 200
+        assert result["total_sen"] == run_command(product, spec)["total_sen"]
+    with pytest.raises(QuoteError, match="too large"):
+        parse_quote(product, dict(specs[0], quantity=2 ** 63))
+
+def test_non_finite_json_is_rejected():
+    body = json.dumps(dict(SPEC, length="NaN")).replace('"NaN"', "NaN").encode()
+
+    async def run():
+        service = QuoteService()
+        try:
+            return await service.handle("POST", "/quote/carton-box", body)
+        finally:
+            await service.close()
+    status, payload = asyncio.run(run())
+    assert status == 400 and "finite" in payload["error"]
+
+def test_service_survives_a_new_event_loop():
+    # Streamlit and tests run each call in a fresh loop; the batchers follow it
+    service = QuoteService()
+    for _ in range(2):
+        status, _ = asyncio.run(service.handle("POST", "/quote/carton-box", json.dumps(SPEC).encode()))
+        assert status == 200
+    asyncio.run(service.close())
+
+def test_routing_errors():
+    async def run():
+        client = LocalClient()
+        try:
+            return [await client.get("/quote/carton-box"), await client.post("/nope", SPEC),
+                    await client.get("/health")]
+        finally:
+            await client.service.close()
+    (wrong_method, _), (unknown, _), (health, payload) = asyncio.run(run())
+    assert (wrong_method, unknown, health, payload) == (405, 404, 200, {"status": "ok"})
+
+def test_non_positive_raw_width_is_its_own_error():
+    async def run():
+        client = LocalClient()
+        try:
+            return await client.post("/quote/layer-pad", dict(SPEC, width=-104))
+        finally:
+            await client.service.close()
+    status, payload = asyncio.run(run())
+    assert status == 422 and payload["error"] == "Raw width must be positive, got -100.0 mm"
+
+@pytest.mark.parametrize("length", ["-5", "many"])
+def test_bad_content_length(length):
+    async def run():
+        service = QuoteService()
+        server = await service.start("127.0.0.1", 0)
+        try:
+            reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+            writer.write(f"POST /quote/carton-box HTTP/1.1\r\nContent-Length: {length}\r\n\r\n".encode())
+            response = await reader.read()
+            writer.close()
+            return response
+        finally:
+            await service.close()
+    response = asyncio.run(run())
+    assert response.startswith(b"HTTP/1.1 400 Bad Request\r\n")
+    assert b"Connection: close" in response and response.endswith(b'{"error": "Bad Content-Length"}')
@@ -0,0 +1,54 @@
+import io
+
+import pytest
+
+from quotation_core.simulation import contract_exposure, read_contract, simulate_contract
+
+CONTRACT = ("product,length,width,height,grammage,costing,selling,quantity,adjustment\n"
+            "carton-box,300,200,150,0.84,2.7,3.4,12000,0\n"
+            "layer-pad,300,200,,1.1,2.7,3.4,6000,2.5\n")
+
+def lines():
+    return list(read_contract(io.StringIO(CONTRACT)))
+
+def test_exposure():
+    grammages, monthly_cost, revenue, base_revenue = contract_exposure(lines())
+    assert grammages == [0.84, 1.1]
+    assert monthly_cost.shape == (2,) and (monthly_cost > 0).all()
+    assert revenue > base_revenue > monthly_cost.sum() * 12
+
+def test_seed_fixes_the_result_on_any_core_count():
+    one = simulate_contract(lines(), scenarios=3000, seed=7, workers=1, chunk_size=1000)
+    many = simulate_contract(lines(), scenarios=3000, seed=7, workers=2, chunk_size=1000)
+    assert one == many
+    assert simulate_contract(lines(), scenarios=3000, seed=8, workers=1, chunk_size=1000) != one
+
+def test_no_volatility_is_today():
+    result = simulate_contract(lines(), scenarios=10, volatility=0.0, seed=1, workers=1)
+    assert result["margin"]["p1"] == result["margin"]["p99"] == pytest.approx(result["margin_today"])
+    assert result["loss_probability"] == 0.0
+
+def test_margin_spread():
+    result = simulate_contract(lines(), scenarios=20000, seed=3, workers=1, volatility={0.84: 0.3, 1.1: 0.1})
+    percentiles = list(result["margin"].values())
+    assert percentiles == sorted(percentiles)
+    # Rising tonnage needs a higher adjustment to break even
+    assert result["break_even_adjustment_percent"]["p95"] > result["break_even_adjustment_percent"]["p5"]
+
+def test_bad_input():
+    with pytest.raises(ValueError, match="unknown product"):
+        list(read_contract(io.StringIO("product,length\nlid,1\n")))
+    with pytest.raises(ValueError, match="no lines"):
+        simulate_contract([])
+    with pytest.raises(ValueError, match="positive"):
+        simulate_contract(lines(), scenarios=0)
+    with pytest.raises(ValueError, match="Correlation"):
+        simulate_contract(lines(), correlation=1.5)
+    with pytest.raises(ValueError, match="Contract line 1"):
+        simulate_contract([dict(lines()[0], width=5000.0)], scenarios=10)
+    with pytest.raises(ValueError, match="Contract line 2: adjustment must be above -100"):
+        simulate_contract([lines()[0], dict(lines()[1], adjustment=-100.0)], scenarios=10)
+    with pytest.raises(ValueError, match="no revenue"):
+        simulate_contract([dict(line, quantity=0) for line in lines()], scenarios=10)
+    with pytest.raises(ValueError, match="no revenue"):
+        contract_exposure([dict(line, selling=0.0) for line in lines()])
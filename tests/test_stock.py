@@ -0,0 +1,65 @@
+import io
+import random
+
+import pytest
+
+from quotation_core.stock import StockIndex, load_stock_index
+
+def brute_force(cartons, size, upright, max_void_percent=None):
+    need = sorted(size, reverse=True)
+    found = []
+    for code, length, width, height in cartons:
+        if upright:
+            fits = (max(length, width) >= max(size[:2]) and min(length, width) >= min(size[:2])
+                    and height >= size[2])
+        else:
+            fits = all(a >= b for a, b in zip(sorted((length, width, height), reverse=True), need))
+        void = (1 - size[0] * size[1] * size[2] / (length * width * height)) * 100
+        if fits and (max_void_percent is None or void < max_void_percent + 1e-9):
+            found.append((length * width * height, code))
+    return [code for _, code in sorted(found)]
+
+def catalog(count=3000, seed=20):
+    rng = random.Random(seed)
+    return [(f"S{i:05d}", rng.randint(100, 800), rng.randint(100, 600), rng.randint(50, 600)) for i in range(count)]
+
+@pytest.mark.parametrize("upright", [False, True])
+def test_fits_match_brute_force(upright):
+    cartons = catalog()
+    index = StockIndex(cartons)
+    rng = random.Random(2)
+    for _ in range(100):
+        size = (rng.randint(80, 600), rng.randint(80, 500), rng.randint(40, 500))
+        found = index.fits(*size, limit=8, upright=upright)
+        assert [row["code"] for row in found] == brute_force(cartons, size, upright)[:8]
+        voids = [row["void_percent"] for row in found]
+        assert voids == sorted(voids)
+
+def test_max_void_percent():
+    cartons = catalog(500)
+    index = StockIndex(cartons)
+    found = index.fits(200, 150, 100, limit=500, max_void_percent=60)
+    assert [row["code"] for row in found] == brute_force(cartons, (200, 150, 100), False, 60)
+    assert all(row["void_percent"] <= 60 for row in found)
+
+def test_upright_keeps_the_height():
+    index = StockIndex([("FLAT", 400, 300, 100), ("TALL", 400, 300, 450)])
+    assert [row["code"] for row in index.fits(300, 100, 400)] == ["FLAT", "TALL"]
+    assert [row["code"] for row in index.fits(300, 100, 400, upright=True)] == ["TALL"]
+
+def test_catalog_file(tmp_path, monkeypatch):
+    path = tmp_path / "stock.csv"
+    path.write_text("code,length,width,height\nA,300,200,150\nB,400,300,200\n")
+    monkeypatch.setenv("QUOTATION_CORE_STOCK", str(path))
+    index = load_stock_index()
+    assert len(index) == 2
+    assert index.fits(350, 250, 150)[0] == {"code": "B", "length": 400.0, "width": 300.0, "height": 200.0,
+                                            "void_percent": 45.31}
+
+def test_bad_sizes():
+    with pytest.raises(ValueError, match="positive"):
+        StockIndex([("A", 300, 0, 150)])
+    with pytest.raises(ValueError, match="positive"):
+        StockIndex([]).fits(0, 1, 1)
+    with pytest.raises(ValueError, match="Line 2"):
+        StockIndex.from_csv(io.StringIO("code,length,width,height\nA,,200,150\n"))
@@ -0,0 +1,77 @@
+import threading
+
+import pytest
+
+from conftest import random_specs
+from quotation_core.cli import run_command
+from quotation_core.store import QuoteStore, default_store_path, normalize_inputs
+
+SPEC = {"length": 300.0, "width": 200.0, "height": 150.0, "grammage": 0.84, "costing": 2.7, "selling": 3.4,
+        "quantity": 100, "adjustment": 0.0}
+
+@pytest.fixture
+def store(tmp_path):
+    store = QuoteStore(str(tmp_path / "quotes.sqlite3"))
+    yield store
+    store.close()
+
+def count(store, table):
+    return store._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+def test_quotes_match_the_calculators(store):
+    for product in ("carton-box", "pizza-box", "layer-pad", "sample-board"):
+        for spec in random_specs(product, 30):
+            assert store.quote(product, spec) == run_command(product, spec)
+
+def test_specs_are_stored_once(store):
+    first = store.quote("carton-box", SPEC, customer="acme")
+    again = store.quote("carton-box", dict(SPEC, length=300, quantity=250), customer="acme")
+    assert again["unit_price_sen"] == first["unit_price_sen"]
+    assert again["total_sen"] == first["unit_price_sen"] * 250
+    assert (count(store, "specs"), count(store, "quotes")) == (1, 2)
+    assert (store.hits, store.misses) == (1, 1)
+    # A fresh process finds the spec in the database rather than repricing it
+    other = QuoteStore(store.path)
+    other.quote("carton-box", SPEC)
+    assert (other.hits, other.misses, count(store, "specs")) == (0, 0, 1)
+    other.close()
+
+def test_unrecorded_quotes_leave_no_quote_rows(store):
+    store.quote_many("carton-box", random_specs("carton-box", 20), record=False)
+    assert (count(store, "specs"), count(store, "quotes")) == (20, 0)
+
+def test_price_hook_only_prices_new_specs(store):
+    calls = []
+
+    def price(inputs):
+        calls.append(inputs)
+        return run_command("carton-box", dict(inputs, quantity=1))
+    store.quote("carton-box", SPEC, price=price)
+    store.quote("carton-box", SPEC, price=price)
+    assert calls == [normalize_inputs("carton-box", SPEC)]
+
+def test_history_filters(store):
+    store.quote("carton-box", SPEC, customer="acme", created_at="2026-01-05T10:00:00")
+    store.quote("layer-pad", {**SPEC, "length": 500.0, "width": 400.0}, customer="acme",
+                created_at="2026-02-05T10:00:00")
+    store.quote("carton-box", SPEC, customer="other", created_at="2026-03-05T10:00:00")
+    assert [quote["product"] for quote in store.history(customer="acme")] == ["layer-pad", "carton-box"]
+    assert len(store.history(since="2026-02-01", until="2026-03-01")) == 1
+    assert [quote["customer"] for quote in store.history(product="carton-box", limit=1)] == ["other"]
+
+def test_concurrent_quotes_share_one_spec(store):
+    threads = [threading.Thread(target=store.quote, args=("carton-box", SPEC)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert (count(store, "specs"), count(store, "quotes")) == (1, 8)
+
+def test_default_path_follows_the_cache(cache_dir):
+    assert default_store_path() == str(cache_dir / "quotes.sqlite3")
+
+def test_fractional_quantities_are_rejected(store):
+    with pytest.raises(ValueError, match="bad quantity '100.7'"):
+        store.quote("carton-box", dict(SPEC, quantity=100.7))
+    assert store.quote("carton-box", dict(SPEC, quantity=100.0)) == run_command("carton-box", SPEC)
+    assert count(store, "quotes") == 1
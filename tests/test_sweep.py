@@ -0,0 +1,38 @@
+from quotation_core.money import calculate_layer_pad_sen, calculate_nesting_piece_sen, calculate_standard_box_sen
+from quotation_core.sweep import build_carton, enumerate_candidates, price_design, sweep_designs
+
+PRODUCT = (250.0, 120.0, 80.0)
+PRICING = (0.84, 2.7, 3.4, 0.0)
+PARAMS = {"bubble": True, "thickness": 3.0, "allowance": 40.0, "layer_thick": 3.0, "grammage": 0.84, "costing": 2.7,
+          "selling": 3.4, "adjustment": 0.0}
+
+def sweep(target, **options):
+    return sweep_designs(*PRODUCT, True, 3.0, 40.0, target, 3.0, *PRICING, **options)
+
+def test_pruned_sweep_matches_pricing_every_candidate():
+    for target in (1, 6, 12, 24):
+        designs = [price_design(candidate, PARAMS) for candidate in enumerate_candidates(*PRODUCT, target)]
+        expected = sorted(design["cost_per_unit"] for design in designs if design)[:5]
+        assert [design["cost_per_unit"] for design in sweep(target, top=5, workers=1)] == expected
+
+def test_designs_are_priced_in_sen():
+    design = sweep(12, top=1, workers=1)[0]
+    candidate = (design["orientation"], design["qty_L"], design["qty_W"], design["qty_H"], design["layer_qty"])
+    ext_L, ext_W, ext_H = build_carton(*candidate, True, 3.0, 40.0, 3.0)[3:6]
+    assert design["carton_cost_sen"] == calculate_standard_box_sen(ext_L, ext_W, ext_H, 0.84, 2.7, 3.4, 1, 0.0)[0]
+    assert isinstance(design["total_cost_sen"], int)
+    assert design["total_cost"] == design["total_cost_sen"] / 100
+
+def test_pads_are_priced_off_the_roll():
+    # The same sen as the layer-pad quotes in the app, roll fit included
+    design = sweep(12, top=1, workers=1)[0]
+    pricing = (0.84, 2.7, 3.4, 1, 0.0)
+    int_L, int_W = build_carton(design["orientation"], design["qty_L"], design["qty_W"], design["qty_H"],
+                                design["layer_qty"], True, 3.0, 40.0, 3.0)[:2]
+    pieces = (calculate_nesting_piece_sen(*design["nesting_long"], *pricing)[0] * design["nesting_long_qty"]
+              + calculate_nesting_piece_sen(*design["nesting_short"], *pricing)[0] * design["nesting_short_qty"])
+    pads = calculate_layer_pad_sen(int_L, int_W, *pricing)[0] * design["layer_qty"]
+    assert design["total_cost_sen"] == design["carton_cost_sen"] + pieces + pads
+
+def test_worker_processes_give_the_same_designs():
+    assert sweep(60, top=5, workers=2, chunk_size=50) == sweep(60, top=5, workers=1)